@@ -29,3 +29,24 @@ class ClientProxy(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     async def get_group_member_info(self, group_id: str, user_id: str) -> GroupMemberInfo:
         pass
+
+    def set_send_rate_limit(self, global_rate: float, global_burst: int, group_rate: float, group_burst: int) -> None:
+        """
+        设置发送频率限制, 不支持限流的ClientProxy可以忽略
+        Args:
+            global_rate: 所有消息合计每分钟最多发送的条数, 0为不限制
+            global_burst: 所有消息合计最多可以连续发送的条数
+            group_rate: 每个群聊每分钟最多发送的条数, 0为不限制
+            group_burst: 每个群聊最多可以连续发送的条数
+        """
+        pass
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        等待发送队列中的指令发送完毕, 最多等待timeout秒, 返回是否全部发送完毕; 没有发送队列的ClientProxy可以忽略
+        """
+        return True
+
+    def get_status_info(self) -> str:
+        """返回发送队列等运行状态的描述, 没有可以汇报的信息时返回空字符串"""
+        return ""
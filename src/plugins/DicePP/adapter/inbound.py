@@ -0,0 +1,136 @@
+"""
+接收队列, 将收到的消息按来源(群聊或私聊)分别排队处理
+同一来源的消息严格按照收到的顺序处理, 不同来源之间并发处理, 同时处理的消息数量有上限; 积压过多时丢弃新消息
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Tuple
+
+from utils.logger import dice_log
+
+INBOUND_WORKER_LIMIT = 8  # 最多同时处理多少个来源的消息
+INBOUND_QUEUE_LIMIT = 32  # 每个来源最多积压的消息数量, 超过后丢弃新消息
+INBOUND_TOTAL_LIMIT = 1024  # 所有来源合计最多积压的消息数量, 超过后丢弃新消息
+INBOUND_STAT_SIZE = 256  # 最多保留多少个来源的统计信息
+INBOUND_STAT_SHOW_NUM = 5  # 状态信息中列出的来源数量
+
+InboundItem = Tuple[float, Callable[[], Awaitable]]  # (收到的时间, 处理函数)
+
+
+class InboundPortStat:
+    """一个来源的统计信息, 时间单位为秒"""
+    def __init__(self):
+        self.count: int = 0
+        self.drop_count: int = 0
+        self.wait_total: float = 0  # 从收到消息到开始处理的时间
+        self.wait_max: float = 0
+        self.process_total: float = 0  # 处理消息的时间
+        self.process_max: float = 0
+
+
+class InboundDispatcher:
+    """
+    每个来源有一个先进先出的队列和一个负责处理的协程, 队列为空时协程结束
+    """
+    def __init__(self, worker_limit: int = INBOUND_WORKER_LIMIT, queue_limit: int = INBOUND_QUEUE_LIMIT,
+                 total_limit: int = INBOUND_TOTAL_LIMIT):
+        """
+        Args:
+            worker_limit: 最多同时处理多少个来源的消息
+            queue_limit: 每个来源最多积压的消息数量
+            total_limit: 所有来源合计最多积压的消息数量
+        """
+        self.queue_limit = queue_limit
+        self.total_limit = total_limit
+        self.semaphore = asyncio.Semaphore(worker_limit)
+        self.queues: Dict[str, Deque[InboundItem]] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+        self.total_depth: int = 0
+        # 统计信息
+        self.port_stats: "OrderedDict[str, InboundPortStat]" = OrderedDict()
+        self.receive_count: int = 0
+        self.process_count: int = 0
+        self.drop_count: int = 0
+        self.error_count: int = 0
+        self.max_depth: int = 0
+
+    def get_port_stat(self, port: str) -> InboundPortStat:
+        stat = self.port_stats.get(port)
+        if stat is None:
+            stat = self.port_stats[port] = InboundPortStat()
+            if len(self.port_stats) > INBOUND_STAT_SIZE:
+                self.port_stats.popitem(last=False)
+        else:
+            self.port_stats.move_to_end(port)
+        return stat
+
+    def submit(self, port: str, handler: Callable[[], Awaitable]) -> bool:
+        """
+        将一条消息的处理函数加入队列并立即返回, 因积压过多而丢弃时返回False
+        Args:
+            port: 消息来源, 如"group:群号"或"private:账号"
+            handler: 没有参数的异步函数
+        """
+        self.receive_count += 1
+        queue = self.queues.setdefault(port, deque())
+        if len(queue) >= self.queue_limit or self.total_depth >= self.total_limit:
+            self.drop_count += 1
+            self.get_port_stat(port).drop_count += 1
+            if not queue:
+                del self.queues[port]
+            dice_log(f"[Inbound] [Drop] {port} 积压{len(queue)}条消息, 合计积压{self.total_depth}条, 丢弃新消息")
+            return False
+        queue.append((time.monotonic(), handler))
+        self.total_depth += 1
+        self.max_depth = max(self.max_depth, len(queue))
+        if port not in self.workers:
+            self.workers[port] = asyncio.create_task(self.__work(port))
+        return True
+
+    async def __work(self, port: str) -> None:
+        queue = self.queues[port]
+        try:
+            while queue:
+                async with self.semaphore:
+                    receive_time, handler = queue.popleft()
+                    self.total_depth -= 1
+                    begin_time = time.monotonic()
+                    try:
+                        await handler()
+                        self.process_count += 1
+                    except Exception as e:
+                        self.error_count += 1
+                        dice_log(f"[Inbound] [Error] {port}: {e}")
+                    end_time = time.monotonic()
+                stat = self.get_port_stat(port)
+                stat.count += 1
+                stat.wait_total += begin_time - receive_time
+                stat.wait_max = max(stat.wait_max, begin_time - receive_time)
+                stat.process_total += end_time - begin_time
+                stat.process_max = max(stat.process_max, end_time - begin_time)
+        finally:
+            del self.workers[port]
+            self.total_depth -= len(queue)
+            del self.queues[port]
+
+    async def close(self) -> None:
+        """取消所有等待中的消息"""
+        workers = list(self.workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def get_status_info(self) -> str:
+        info = f"接收队列: {len(self.queues)}个来源, 积压{self.total_depth}条, 最大深度{self.max_depth}/{self.queue_limit}\n" \
+               f"收到{self.receive_count}条, 已处理{self.process_count}条, 丢弃{self.drop_count}条, 出错{self.error_count}条"
+        # 列出平均处理耗时最长的几个来源
+        port_list = sorted(((port, stat) for port, stat in self.port_stats.items() if stat.count),
+                           key=lambda item: -item[1].process_total / item[1].count)[:INBOUND_STAT_SHOW_NUM]
+        for port, stat in port_list:
+            depth = len(self.queues.get(port, ()))
+            info += f"\n  {port}: 积压{depth}条 处理{stat.count}条 丢弃{stat.drop_count}条 " \
+                    f"等待{stat.wait_total / stat.count * 1000:.0f}/{stat.wait_max * 1000:.0f}ms " \
+                    f"耗时{stat.process_total / stat.count * 1000:.0f}/{stat.process_max * 1000:.0f}ms"
+        return info
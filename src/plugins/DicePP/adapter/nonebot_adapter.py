@@ -3,6 +3,7 @@ NoneBot API https://v2.nonebot.dev/api/plugin.html
 """
 from typing import List, Dict, Optional, Any
 import asyncio
+import os
 from fastapi import FastAPI
 
 import nonebot
@@ -16,21 +17,24 @@ from nonebot.adapters.onebot.v11 import Message as CQMessage
 from nonebot.adapters.onebot.v11 import ActionFailed
 
 from core.bot import Bot as DicePPBot
+from core.config import DATA_PATH
 from core.communication import MessageMetaData, MessageSender, GroupMemberInfo, GroupInfo
 from core.communication import NoticeData, FriendAddNoticeData, GroupIncreaseNoticeData
 from core.communication import RequestData, FriendRequestData, JoinGroupRequestData, InviteGroupRequestData
 from core.command import BotCommandBase, BotSendMsgCommand, BotDelayCommand, BotLeaveGroupCommand, BotSendForwardMsgCommand, BotSendFileCommand
-from utils.logger import dice_log
+from utils.logger import dice_log, get_logger, start_log_writer, stop_log_writer, LazyStr
 
-from module.common.log_command import append_log_record, delete_log_record_by_message_id  # type: ignore
+from module.common.log_command import append_log_record, delete_log_record_by_message_id, flush_log_records_async  # type: ignore
 
 from adapter.client_proxy import ClientProxy
+from adapter.outbound import OutboundDispatcher
+from adapter.inbound import InboundDispatcher
 
-from module.fastapi import dpp_api
+from module.fastapi import get_dpp_api
 
 try:
     app: FastAPI = nonebot.get_app()
-    app.mount("/dpp", dpp_api)
+    app.mount("/dpp", get_dpp_api())
 except ValueError:
     dice_log("DPP API is not amounted because NoneBot has not been initialized")
 
@@ -39,6 +43,8 @@ notice_matcher = on_notice()
 request_matcher = on_request()
 
 all_bots: Dict[str, DicePPBot] = {}
+ADAPTER_LOGGER = get_logger("adapter")
+LOG_FILE_PATH = os.path.join(DATA_PATH, "Log", "dicepp.log")
 _group_folder_cache: Dict[str, Dict[str, Optional[str]]] = {}
 
 
@@ -62,10 +68,13 @@ def convert_group_member_info(nb_group_member_info: Dict) -> GroupMemberInfo:
 class NoneBotClientProxy(ClientProxy):
     def __init__(self, bot: NoneBot):
         self.bot = bot
+        self.outbound = OutboundDispatcher(self.process_bot_command)
+        self.inbound = InboundDispatcher()
 
     # noinspection PyBroadException
     async def process_bot_command(self, command: BotCommandBase):
-        dice_log(f"[OneBot] [BotCommand] {command}")
+        # 每条发出的指令都会记录, 以参数传入, 由日志线程格式化, 未启用INFO时不会格式化
+        ADAPTER_LOGGER.info("[OneBot] [BotCommand] %s", command)
         try:
             if isinstance(command, BotSendMsgCommand):
                 for target in command.targets:
@@ -73,7 +82,7 @@ class NoneBotClientProxy(ClientProxy):
                         await self.bot.send_group_msg(group_id=int(target.group_id), message=CQMessage(command.msg))
                         # 记录到群日志
                         try:
-                            append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), all_bots[self.bot.self_id].get_nickname(self.bot.self_id, target.group_id) or "Bot", command.msg)
+                            append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), None, command.msg)
                         except Exception:
                             pass
                     else:
@@ -87,7 +96,7 @@ class NoneBotClientProxy(ClientProxy):
                         # 合并转发中的每条子消息分别记录（保持原顺序）
                         try:
                             for sub_msg in command.msg:
-                                append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), all_bots[self.bot.self_id].get_nickname(self.bot.self_id, target.group_id) or "Bot", sub_msg)
+                                append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), None, sub_msg)
                         except Exception:
                             pass
                 except:
@@ -97,7 +106,7 @@ class NoneBotClientProxy(ClientProxy):
                             for msg in command.msg:
                                 await self.bot.send_group_msg(group_id=int(target.group_id), message=CQMessage(msg))
                                 try:
-                                    append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), all_bots[self.bot.self_id].get_nickname(self.bot.self_id, target.group_id) or "Bot", msg)
+                                    append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), None, msg)
                                 except Exception:
                                     pass
                     else:
@@ -107,6 +116,13 @@ class NoneBotClientProxy(ClientProxy):
                                 await self.bot.send_private_msg(user_id=int(target.user_id), message=CQMessage(msg))
             elif isinstance(command, BotSendFileCommand):
                 for target in command.targets:
+                    if not target.group_id:  # 私聊文件没有文件夹
+                        try:
+                            await self.bot.call_api("upload_private_file", user_id=int(target.user_id), file=command.file, name=command.display_name)
+                        except Exception as e:
+                            dice_log(f"[OneBot][Upload][PrivateFail] user={target.user_id} file={command.display_name} err={e}")
+                            await self.bot.send_private_msg(user_id=int(target.user_id), message="文件发送失败！")
+                        continue
                     display_name = command.display_name
                     folder_name = None
                     real_name = display_name
@@ -153,7 +169,7 @@ class NoneBotClientProxy(ClientProxy):
                                     dice_log(f"[OneBot][Upload][FallbackFail] group={target.group_id} file={real_name} err={e2}")
                         if primary_done:
                             try:
-                                append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), all_bots[self.bot.self_id].get_nickname(self.bot.self_id, target.group_id) or "Bot", f"[文件]{real_name}")
+                                append_log_record(all_bots[self.bot.self_id], target.group_id, str(self.bot.self_id), None, f"[文件]{real_name}")
                             except Exception:
                                 pass
                         else:
@@ -172,10 +188,19 @@ class NoneBotClientProxy(ClientProxy):
 
     async def process_bot_command_list(self, command_list: List[BotCommandBase]):
         if len(command_list) > 1:
-            log_str = "\n".join([str(command) for command in command_list])
-            dice_log(f"[Proxy Bot Command List]\n[{log_str}]")
-        for command in command_list:
-            await self.process_bot_command(command)
+            ADAPTER_LOGGER.info("[Proxy Bot Command List]\n[%s]",
+                                LazyStr(lambda: "\n".join([str(command) for command in command_list])))
+        # 加入发送队列后立即返回, 延迟指令只会推迟同一列表中后续指令的发送
+        self.outbound.submit(command_list)
+
+    def set_send_rate_limit(self, global_rate: float, global_burst: int, group_rate: float, group_burst: int) -> None:
+        self.outbound.set_rate_limit(global_rate / 60, global_burst, group_rate / 60, group_burst)
+
+    async def drain(self, timeout: float) -> bool:
+        return await self.outbound.drain(timeout)
+
+    def get_status_info(self) -> str:
+        return self.inbound.get_status_info() + "\n" + self.outbound.get_status_info()
 
     async def get_group_list(self) -> List[GroupInfo]:
         group_info_list: List[Dict] = await self.bot.get_group_list()
@@ -247,8 +272,14 @@ async def handle_command(bot: NoneBot, event: MessageEvent):
     except Exception:
         meta.message_id = None
 
-    # 让机器人处理信息
-    await all_bots[bot.self_id].process_message(plain_msg, meta)
+    # 让机器人处理信息, 按群聊或私聊排队, 同一来源的消息依次处理, 不同来源之间互不阻塞
+    dice_bot = all_bots[bot.self_id]
+    port = f"group:{group_id}" if group_id else f"private:{user_id}"
+    proxy = dice_bot.proxy
+    if isinstance(proxy, NoneBotClientProxy):
+        proxy.inbound.submit(port, lambda: dice_bot.process_message(plain_msg, meta))
+    else:
+        await dice_bot.process_message(plain_msg, meta)
 
 
 @notice_matcher.handle()
@@ -326,13 +357,16 @@ except ValueError:
     driver = None  # type: ignore
     dice_log("[NB Adapter] NoneBot has not been initialized (driver unavailable)")
 else:
+    # 运行时由后台线程写入日志, 同时保存到滚动的日志文件中
+    start_log_writer(LOG_FILE_PATH)
+    driver.on_shutdown(stop_log_writer)
+
     # 在Bot连接时调用
     @driver.on_bot_connect
     async def connect(bot: NoneBot) -> None:
         proxy = NoneBotClientProxy(bot)
         all_bots[bot.self_id] = DicePPBot(bot.self_id)
         all_bots[bot.self_id].set_client_proxy(proxy)
-        await all_bots[bot.self_id].delay_init_command()
         # 设定Bot自己的昵称，供日志使用
         try:
             all_bots[bot.self_id].update_nickname(bot.self_id, "origin", bot.self_id)
@@ -340,9 +374,16 @@ else:
         except Exception:
             pass
         dice_log(f"[NB Adapter] Bot {bot.self_id} Connected!")
+        # delay_init在线程池中执行, 等待期间已经可以处理消息, 数据还没读取完的指令会回复读取中的提示
+        await all_bots[bot.self_id].delay_init_command()
 
     @driver.on_bot_disconnect
     async def disconnect(bot: NoneBot) -> None:
+        proxy = all_bots[bot.self_id].proxy
+        if isinstance(proxy, NoneBotClientProxy):
+            await proxy.inbound.close()
+            await proxy.outbound.close()
+        await flush_log_records_async()
         await all_bots[bot.self_id].shutdown_async()
 
 # ================= Recall Sync Support ==================
@@ -0,0 +1,250 @@
+"""
+发送队列, 将BotCommand按目标(群聊或私聊)分别排队发送
+同一目标的指令严格按照提交顺序执行, 不同目标之间并发执行; BotDelayCommand不再阻塞当前协程, 而是推迟后续指令的执行时间
+全局与每个群聊各有一个令牌桶限制发送频率, 同一群聊中已经到了发送时间的纯文本消息会合并为一条发送
+"""
+
+import asyncio
+import copy
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from core.command import BotCommandBase, BotDelayCommand, BotLeaveGroupCommand, BotSendMsgCommand
+from core.communication import GroupMessagePort
+from utils.logger import dice_log
+
+OUTBOUND_QUEUE_LIMIT = 256  # 每个目标最多排队的指令数量, 超过后丢弃新的指令
+OUTBOUND_COALESCE_LENGTH = 1500  # 合并后的消息最大长度
+OUTBOUND_BUCKET_PRUNE_SIZE = 1024  # 群聊令牌桶数量超过该值时清理已经回满的令牌桶
+
+OutboundItem = Tuple[float, BotCommandBase]  # (最早执行时间, 指令)
+
+
+def split_command_by_target(command: BotCommandBase) -> List[Tuple[Optional[Hashable], BotCommandBase]]:
+    """将有多个目标的指令拆分为每个目标一条, 返回(目标, 指令)的列表, 无法确定目标的指令目标为None"""
+    if isinstance(command, BotLeaveGroupCommand):
+        return [(GroupMessagePort(command.target_group_id), command)]
+    targets = getattr(command, "targets", None)
+    if not targets:
+        return [(None, command)]
+    if len(targets) == 1:
+        return [(targets[0], command)]
+    result = []
+    for target in targets:
+        command_cur = copy.copy(command)
+        command_cur.targets = [target]
+        result.append((target, command_cur))
+    return result
+
+
+def is_coalescible(command: BotCommandBase) -> bool:
+    """只合并纯文本消息, 语音等CQ码需要单独发送"""
+    return isinstance(command, BotSendMsgCommand) and "[CQ:" not in command.msg
+
+
+class TokenBucket:
+    """
+    令牌桶, 每秒补充rate个令牌, 最多储存burst个, 每次发送消耗一个; rate为0代表不限制
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens: float = self.burst
+        self.update_time: float = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.update_time) * self.rate)
+        self.update_time = now
+
+    def get_wait_time(self, now: float) -> float:
+        """返回还需要等待多少秒才有可用的令牌"""
+        if not self.rate:
+            return 0
+        self.refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        if not self.rate:
+            return
+        self.refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self.refill(now)
+        return self.tokens >= self.burst
+
+
+class OutboundDispatcher:
+    """
+    每个目标有一个先进先出的队列和一个负责发送的协程, 队列为空时协程结束
+    """
+    def __init__(self, send_func: Callable[[BotCommandBase], Awaitable], queue_limit: int = OUTBOUND_QUEUE_LIMIT):
+        """
+        Args:
+            send_func: 实际执行单条指令的函数, 一般为ClientProxy.process_bot_command
+            queue_limit: 每个目标最多排队的指令数量
+        """
+        self.send_func = send_func
+        self.queue_limit = queue_limit
+        self.queues: Dict[Optional[Hashable], Deque[OutboundItem]] = {}
+        self.workers: Dict[Optional[Hashable], asyncio.Task] = {}
+        # 统计信息
+        self.submit_count: int = 0
+        self.send_count: int = 0
+        self.drop_count: int = 0
+        self.error_count: int = 0
+        self.max_depth: int = 0
+        self.max_lag: float = 0  # 实际发送时间比计划时间晚了多少秒
+        self.throttle_count: int = 0  # 因限流而需要等待的次数
+        self.coalesce_count: int = 0  # 被合并到其他消息中的消息数量
+        # 限流
+        self.global_bucket = TokenBucket(0, 1)
+        self.group_rate: float = 0
+        self.group_burst: int = 1
+        self.group_buckets: Dict[Hashable, TokenBucket] = {}
+
+    def set_rate_limit(self, global_rate: float, global_burst: int, group_rate: float, group_burst: int) -> None:
+        """
+        设置发送频率限制
+        Args:
+            global_rate: 所有消息合计每秒最多发送的条数, 0为不限制
+            global_burst: 所有消息合计最多可以连续发送的条数
+            group_rate: 每个群聊每秒最多发送的条数, 0为不限制
+            group_burst: 每个群聊最多可以连续发送的条数
+        """
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.group_rate, self.group_burst = group_rate, group_burst
+        self.group_buckets = {}
+
+    def get_group_bucket(self, target: Optional[Hashable]) -> Optional[TokenBucket]:
+        if not self.group_rate or not isinstance(target, GroupMessagePort):
+            return None
+        if target not in self.group_buckets:
+            if len(self.group_buckets) >= OUTBOUND_BUCKET_PRUNE_SIZE:
+                now = time.monotonic()
+                self.group_buckets = {port: bucket for port, bucket in self.group_buckets.items() if not bucket.is_full(now)}
+            self.group_buckets[target] = TokenBucket(self.group_rate, self.group_burst)
+        return self.group_buckets[target]
+
+    def submit(self, command_list: List[BotCommandBase]) -> int:
+        """
+        将指令加入发送队列并立即返回, 返回成功加入队列的指令数量
+        BotDelayCommand会推迟同一列表中之后所有指令的执行时间, 与依次执行时的间隔相同
+        """
+        due_time = time.monotonic()
+        accepted = 0
+        for command in command_list:
+            if isinstance(command, BotDelayCommand):
+                due_time += command.seconds
+                continue
+            for target, command_cur in split_command_by_target(command):
+                self.submit_count += 1
+                queue = self.queues.setdefault(target, deque())
+                if len(queue) >= self.queue_limit:
+                    self.drop_count += 1
+                    dice_log(f"[Outbound] [Drop] {target} 的发送队列已满({len(queue)}), 丢弃: {command_cur}")
+                    continue
+                queue.append((due_time, command_cur))
+                accepted += 1
+                self.max_depth = max(self.max_depth, len(queue))
+                if target not in self.workers:
+                    self.workers[target] = asyncio.create_task(self.__work(target))
+        return accepted
+
+    async def __work(self, target: Optional[Hashable]) -> None:
+        queue = self.queues[target]
+        try:
+            while queue:
+                due_time, command = queue[0]
+                wait_time = due_time - time.monotonic()
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+                await self.__wait_token(target)
+                queue.popleft()
+                self.max_lag = max(self.max_lag, time.monotonic() - due_time)
+                if isinstance(target, GroupMessagePort) and is_coalescible(command):
+                    command = self.__coalesce(queue, command)
+                try:
+                    await self.send_func(command)
+                    self.send_count += 1
+                except Exception as e:
+                    self.error_count += 1
+                    dice_log(f"[Outbound] [Error] {target}: {e}")
+        finally:
+            del self.workers[target]
+            if not queue:
+                del self.queues[target]
+
+    async def __wait_token(self, target: Optional[Hashable]) -> None:
+        """等待全局与目标群聊的令牌桶都有可用的令牌, 然后各消耗一个"""
+        group_bucket = self.get_group_bucket(target)
+        is_throttled = False
+        while True:
+            now = time.monotonic()
+            wait_time = self.global_bucket.get_wait_time(now)
+            if group_bucket:
+                wait_time = max(wait_time, group_bucket.get_wait_time(now))
+            if wait_time <= 0:
+                break
+            if not is_throttled:
+                is_throttled = True
+                self.throttle_count += 1
+            await asyncio.sleep(wait_time)
+        now = time.monotonic()
+        self.global_bucket.consume(now)
+        if group_bucket:
+            group_bucket.consume(now)
+
+    def __coalesce(self, queue: Deque[OutboundItem], command: BotSendMsgCommand) -> BotSendMsgCommand:
+        """将队列开头已经到了发送时间的纯文本消息合并到command中, 与process_message合并多行指令的结果相同"""
+        now = time.monotonic()
+        msg_list = [command.msg]
+        length = len(command.msg)
+        while queue:
+            due_time, command_next = queue[0]
+            if due_time > now or not is_coalescible(command_next):
+                break
+            length += len(command_next.msg) + 1
+            if length > OUTBOUND_COALESCE_LENGTH:
+                break
+            queue.popleft()
+            msg_list.append(command_next.msg)
+        if len(msg_list) == 1:
+            return command
+        self.coalesce_count += len(msg_list) - 1
+        return BotSendMsgCommand(command.bot_id, "\n".join(msg_list), command.targets)
+
+    def get_depth(self) -> int:
+        """所有队列中等待发送的指令总数"""
+        return sum(len(queue) for queue in self.queues.values())
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        等待队列中的指令全部发送完毕, 包括等待期间新加入的指令; 最多等待timeout秒
+        Returns:
+            是否全部发送完毕, 超时未发送的指令仍留在队列中
+        """
+        end_time = time.monotonic() + timeout
+        while self.workers:
+            wait_time = end_time - time.monotonic()
+            if wait_time <= 0:
+                break
+            await asyncio.wait(list(self.workers.values()), timeout=wait_time)
+        if self.queues:
+            dice_log(f"[Outbound] [Drain] 等待超时, 还有{self.get_depth()}条指令没有发送")
+            return False
+        return True
+
+    async def close(self) -> None:
+        """取消所有等待中的发送"""
+        workers = list(self.workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.queues.clear()
+
+    def get_status_info(self) -> str:
+        return f"发送队列: {len(self.queues)}个目标, 等待{self.get_depth()}条, 最大深度{self.max_depth}/{self.queue_limit}\n" \
+               f"提交{self.submit_count}条, 已发送{self.send_count}条, 丢弃{self.drop_count}条, 失败{self.error_count}条, " \
+               f"最大延迟{self.max_lag:.2f}秒, 限流{self.throttle_count}次, 合并{self.coalesce_count}条"
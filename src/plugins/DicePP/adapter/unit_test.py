@@ -0,0 +1,217 @@
+import unittest
+import asyncio
+import heapq
+import time
+from typing import Dict, List, Tuple
+from unittest import mock
+
+from adapter.outbound import OutboundDispatcher, TokenBucket, OUTBOUND_COALESCE_LENGTH
+from core.command import BotCommandBase, BotSendMsgCommand, BotDelayCommand
+from core.communication import GroupMessagePort, PrivateMessagePort
+
+real_sleep = asyncio.sleep
+
+
+class FakeClock:
+    """
+    代替time.monotonic与asyncio.sleep的时钟, 所有协程都在等待时直接跳到最早的唤醒时间, 测试结果与实际耗时无关
+    """
+    def __init__(self):
+        self.now: float = 1000.0
+        self.sleepers: List[Tuple[float, int, asyncio.Future]] = []
+        self.seq: int = 0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            await real_sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.seq += 1
+        heapq.heappush(self.sleepers, (self.now + seconds, self.seq, future))
+        await future
+
+    async def run_until_idle(self, dispatcher: OutboundDispatcher) -> None:
+        while True:
+            for _ in range(20):  # 让所有可以继续执行的协程执行到下一次等待
+                await real_sleep(0)
+            if not self.sleepers:
+                if not dispatcher.workers:
+                    return
+                continue
+            wake_time = self.sleepers[0][0]
+            self.now = max(self.now, wake_time)
+            while self.sleepers and self.sleepers[0][0] <= self.now:
+                future = heapq.heappop(self.sleepers)[2]
+                if not future.done():
+                    future.set_result(None)
+
+
+def group_msg(group_id: str, msg: str) -> BotSendMsgCommand:
+    return BotSendMsgCommand("bot", msg, [GroupMessagePort(group_id)])
+
+
+def private_msg(user_id: str, msg: str) -> BotSendMsgCommand:
+    return BotSendMsgCommand("bot", msg, [PrivateMessagePort(user_id)])
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.sent: List[Tuple[float, BotCommandBase]] = []
+        patch_time = mock.patch("adapter.outbound.time", self.clock)  # 只替换发送队列使用的时钟, 不影响事件循环
+        patch_sleep = mock.patch("adapter.outbound.asyncio.sleep", self.clock.sleep)
+        patch_time.start()
+        patch_sleep.start()
+        self.addCleanup(patch_time.stop)
+        self.addCleanup(patch_sleep.stop)
+
+    async def send(self, command: BotCommandBase) -> None:
+        self.sent.append((self.clock.now - 1000.0, command))
+
+    def run_dispatcher(self, rate_limit: Tuple[float, int, float, int], command_list: List[BotCommandBase],
+                       queue_limit: int = 256) -> OutboundDispatcher:
+        """提交指令并等待全部发送完毕, 发送时间记录为相对于开始时的秒数"""
+        dispatcher = OutboundDispatcher(self.send, queue_limit)
+
+        async def run():
+            dispatcher.set_rate_limit(*rate_limit)
+            dispatcher.submit(command_list)
+            await self.clock.run_until_idle(dispatcher)
+        asyncio.run(run())
+        return dispatcher
+
+    def get_send_time(self) -> Dict[str, List[float]]:
+        """每条消息的发送时间, 合并后的消息按合并后的内容记录"""
+        result = {}
+        for send_time, command in self.sent:
+            result.setdefault(command.msg, []).append(send_time)
+        return result
+
+    def test0_token_bucket(self):
+        print("开始测试令牌桶")
+        bucket = TokenBucket(2, 3)
+        bucket.update_time = 0
+        for _ in range(3):  # 可以连续发送burst条
+            self.assertEqual(bucket.get_wait_time(0), 0)
+            bucket.consume(0)
+        self.assertAlmostEqual(bucket.get_wait_time(0), 0.5)
+        self.assertAlmostEqual(bucket.get_wait_time(0.25), 0.25)  # 按时间补充令牌
+        self.assertEqual(bucket.get_wait_time(0.5), 0)
+        bucket.consume(0.5)
+        self.assertFalse(bucket.is_full(1))
+        self.assertTrue(bucket.is_full(100))
+        self.assertEqual(bucket.tokens, 3)  # 最多储存burst个令牌
+        unlimited = TokenBucket(0, 1)
+        for _ in range(10):
+            unlimited.consume(0)
+        self.assertEqual(unlimited.get_wait_time(0), 0)
+        print("令牌桶正确")
+
+    def test1_global_limit(self):
+        print("开始测试全局限流")
+        # 不同目标的私聊消息不会合并, 只受到全局的限制
+        dispatcher = self.run_dispatcher((1, 2, 0, 1), [private_msg(str(i), f"msg{i}") for i in range(5)])
+        self.assertEqual(sorted(send_time for send_time, _ in self.sent), [0, 0, 1, 2, 3])
+        self.assertEqual(dispatcher.send_count, 5)
+        self.assertEqual(dispatcher.throttle_count, 3)
+        print("全局限流正确")
+
+    def test2_group_limit(self):
+        print("开始测试群聊限流")
+        command_list = []
+        for i in range(3):  # 带CQ码的消息不会合并
+            command_list += [group_msg("A", f"A{i}[CQ:face,id=1]"), group_msg("B", f"B{i}[CQ:face,id=1]"),
+                             private_msg("C", f"C{i}[CQ:face,id=1]")]
+        self.run_dispatcher((0, 1, 0.5, 2), command_list)
+        send_time = self.get_send_time()
+        for group_id in ["A", "B"]:  # 每个群聊分别计算, 互不影响
+            self.assertEqual([send_time[f"{group_id}{i}[CQ:face,id=1]"][0] for i in range(3)], [0, 0, 2])
+        self.assertEqual([send_time[f"C{i}[CQ:face,id=1]"][0] for i in range(3)], [0, 0, 0])  # 私聊不受群聊限制
+        print("群聊限流正确")
+
+    def test3_both_limit(self):
+        print("开始测试同时限流")
+        command_list = [group_msg("A", f"A{i}[CQ:face,id=1]") for i in range(3)]
+        command_list += [group_msg("B", f"B{i}[CQ:face,id=1]") for i in range(3)]
+        self.run_dispatcher((1, 1, 0.5, 1), command_list)
+        send_time = sorted(send_time for send_time, _ in self.sent)
+        self.assertEqual(len(send_time), 6)
+        for time_prev, time_next in zip(send_time, send_time[1:]):  # 全局每秒最多一条
+            self.assertGreaterEqual(time_next - time_prev, 1 - 1e-9)
+        for group_id in ["A", "B"]:  # 每个群聊每两秒最多一条
+            group_time = sorted(send_time for send_time, command in self.sent if command.msg.startswith(group_id))
+            for time_prev, time_next in zip(group_time, group_time[1:]):
+                self.assertGreaterEqual(time_next - time_prev, 2 - 1e-9)
+        print("同时限流正确")
+
+    def test4_coalesce(self):
+        print("开始测试合并消息")
+        command_list = [group_msg("A", "1"), group_msg("A", "2"), group_msg("A", "[CQ:record,file=x]"),
+                        private_msg("C", "4"), private_msg("C", "5"), group_msg("A", "3"), BotDelayCommand("bot", 5),
+                        group_msg("A", "6")]
+        dispatcher = self.run_dispatcher((0, 1, 0, 1), command_list)
+        # 已经到了发送时间的纯文本消息合并发送, CQ码与延迟之后的消息不合并, 私聊不合并
+        self.assertEqual(self.get_send_time(), {"1\n2": [0], "[CQ:record,file=x]": [0], "3": [0], "4": [0],
+                                                "5": [0], "6": [5]})
+        self.assertEqual(dispatcher.coalesce_count, 1)
+        print("合并消息正确")
+
+    def test5_coalesce_throttled(self):
+        print("开始测试限流时合并消息")
+        # 限流期间到达发送时间的消息在下一次发送时合并
+        command_list = [group_msg("A", "1"), BotDelayCommand("bot", 0.5), group_msg("A", "2"),
+                        BotDelayCommand("bot", 0.5), group_msg("A", "3")]
+        self.run_dispatcher((0, 1, 0.5, 1), command_list)
+        self.assertEqual(self.get_send_time(), {"1": [0], "2\n3": [2]})
+        print("限流时合并消息正确")
+
+    def test6_coalesce_length(self):
+        print("开始测试合并消息长度")
+        long_msg = "x" * ((OUTBOUND_COALESCE_LENGTH - 1) // 2)
+        self.run_dispatcher((0, 1, 0, 1), [group_msg("A", long_msg) for _ in range(3)])
+        self.assertEqual([command.msg for _, command in self.sent], [f"{long_msg}\n{long_msg}", long_msg])
+        print("合并消息长度正确")
+
+    def test7_queue_limit(self):
+        print("开始测试队列上限")
+        dispatcher = OutboundDispatcher(self.send, queue_limit=2)
+
+        async def run():
+            accepted = dispatcher.submit([private_msg("C", str(i)) for i in range(4)])
+            await self.clock.run_until_idle(dispatcher)
+            return accepted
+        self.assertEqual(asyncio.run(run()), 2)
+        self.assertEqual([command.msg for _, command in self.sent], ["0", "1"])
+        self.assertEqual(dispatcher.drop_count, 2)
+        print("队列上限正确")
+
+    def test8_drain(self):
+        print("开始测试等待发送完毕")
+        dispatcher = OutboundDispatcher(self.send)
+
+        async def run():
+            dispatcher.set_rate_limit(0, 1, 0.5, 1)
+            dispatcher.submit([group_msg("A", "1"), group_msg("A", "[CQ:face,id=1]"), group_msg("A", "2")])
+            clock_task = asyncio.create_task(self.clock.run_until_idle(dispatcher))
+            drained = await dispatcher.drain(10)
+            await clock_task
+            return drained
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(self.get_send_time(), {"1": [0], "[CQ:face,id=1]": [2], "2": [4]})
+        self.assertEqual(dispatcher.queues, {})
+
+        async def run_timeout():
+            dispatcher.submit([BotDelayCommand("bot", 100), group_msg("A", "3")])
+            drained = await dispatcher.drain(0.05)  # 延迟的指令一直在等待时钟前进
+            await dispatcher.close()
+            return drained
+        with mock.patch("adapter.outbound.time", time):
+            self.assertFalse(asyncio.run(run_timeout()))
+        print("等待发送完毕正确")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
-from core.bot.macro import BotMacro, MACRO_COMMAND_SPLIT, MACRO_PARSE_LIMIT
-from core.bot.variable import BotVariable
+from core.bot.macro import BotMacro, BotMacroSet, BotMacroCache, MACRO_COMMAND_SPLIT, MACRO_PARSE_LIMIT
+from core.bot.variable import BotVariable, BotVariableCache, resolve_variables, substitute_variables
+from core.bot.context import MessageContext, get_message_context
+from core.bot.sweeper import get_expire_before_day
 
 from core.bot.dicebot import Bot
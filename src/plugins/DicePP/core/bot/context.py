@@ -0,0 +1,83 @@
+"""
+消息上下文, 一条消息处理期间所有指令共享, 避免各个指令重复读取同样的群配置与权限
+"""
+
+import copy
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, TYPE_CHECKING
+
+from core.communication import MessageMetaData
+
+if TYPE_CHECKING:
+    from core.bot import Bot
+
+
+class MessageContext:
+    """
+    在Bot.process_message开始时创建并挂在meta.context上
+    各项数据在第一次用到时才读取, 之后直接返回记住的结果; 对应的DataChunk被修改过后会重新读取
+    resolve记住的结果可能被多个指令共享, 取得后不要修改; get_data与DataManager.get_data一样返回深拷贝
+    """
+    def __init__(self, bot: "Bot", meta: MessageMetaData):
+        self.bot = bot
+        self.meta = meta
+        self.values: Dict[Hashable, Tuple[int, Any]] = {}  # key -> (读取时DataChunk的修改次数, 结果)
+
+    def resolve(self, key: Hashable, resolver: Callable[[], Any], target: str = "") -> Any:
+        """
+        返回key对应的结果, 第一次访问时调用resolver得到
+        Args:
+            key: 结果的名字, 不同的数据不要重名
+            resolver: 没有参数的函数, 抛出的异常会直接传递给调用方且不会被记住
+            target: 结果依赖的DataChunk, 该DataChunk被修改后会重新调用resolver; 为空代表一直有效
+        """
+        version = self.bot.data_manager.get_write_version(target) if target else 0
+        cached = self.values.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = resolver()
+        # resolver本身也可能修改数据(如写入默认值), 记录调用后的修改次数
+        version = self.bot.data_manager.get_write_version(target) if target else 0
+        self.values[key] = (version, value)
+        return value
+
+    def get_data(self, target: str, path: List[str],
+                 default_val: Optional[Any] = None, default_gen: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        与DataManager.get_data相同, 但同一条消息中相同路径只会读取一次
+        返回的是记住的结果的深拷贝, 调用方修改后不会影响其他指令
+        """
+        value = self.resolve(("data", target, *path),
+                             lambda: self.bot.data_manager.get_data(target, path, default_val, default_gen), target)
+        return copy.deepcopy(value)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """清除记住的结果, key为None时清除所有结果"""
+        if key is None:
+            self.values.clear()
+        else:
+            self.values.pop(key, None)
+
+    @property
+    def permission(self) -> int:
+        """4:骰主 3:骰管理 2:群主 1:群管理 0:普通人"""
+        return self.resolve("permission", self.__resolve_permission)
+
+    def __resolve_permission(self) -> int:
+        meta = self.meta
+        snapshot = self.bot.cfg_helper.snapshot
+        if meta.user_id in snapshot.master:
+            return 4
+        if meta.user_id in snapshot.admin:
+            return 3
+        if meta.sender.role == "owner":
+            return 2
+        if meta.sender.role == "admin":
+            return 1
+        return 0
+
+
+def get_message_context(bot: "Bot", meta: MessageMetaData) -> MessageContext:
+    """返回meta上的消息上下文, 不经过Bot.process_message直接调用指令时会新建一个"""
+    if meta.context is None:
+        meta.context = MessageContext(bot, meta)
+    return meta.context
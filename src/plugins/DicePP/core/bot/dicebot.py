@@ -1,28 +1,40 @@
 import os
+import time
 import asyncio
-import datetime
-import random
-from typing import List, Optional, Dict, Callable, Union, Set
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Callable, Union, Tuple
 from random import choice
 
-from utils.logger import dice_log, get_exception_info
-from utils.time import str_to_datetime, get_current_date_str, get_current_date_raw, int_to_datetime
-from core.localization import LocalizationManager, LOC_GROUP_ONLY_NOTICE, LOC_PERMISSION_DENIED_NOTICE, LOC_FRIEND_ADD_NOTICE, LOC_GROUP_EXPIRE_WARNING
+from utils.logger import dice_log, get_exception_info, get_logger, set_log_levels, stop_log_writer, LazyStr
+from utils.asset import ASSET_CACHE
+from utils.metrics import METRICS, METRIC_MESSAGE_TOTAL, METRIC_MESSAGE_PHASE, METRIC_COMMAND_MATCH, METRIC_COMMAND_PROCESS
+from utils.time import str_to_datetime, get_current_date_str, get_current_date_raw, get_current_day_ordinal
+from core.localization import LocalizationManager, LOC_GROUP_ONLY_NOTICE, LOC_PERMISSION_DENIED_NOTICE, LOC_FRIEND_ADD_NOTICE
+from core.localization import LOC_COMMAND_BUSY_NOTICE, LOC_COMMAND_TIMEOUT_NOTICE, LOC_COMMAND_LOADING_NOTICE
 from core.config import ConfigManager, CFG_COMMAND_SPLIT, CFG_MASTER, CFG_FRIEND_TOKEN, CFG_GROUP_INVITE
-from core.config import CFG_DATA_EXPIRE, CFG_USER_EXPIRE_DAY, CFG_GROUP_EXPIRE_DAY, CFG_GROUP_EXPIRE_WARNING,\
-    CFG_WHITE_LIST_GROUP, CFG_WHITE_LIST_USER, CFG_ADMIN, CFG_MASTER, preprocess_white_list
+from core.config import CFG_DATA_RESIDENT_ENTRY, CFG_DATA_RESIDENT_SIZE, CFG_STAT_HISTORY_KEEP_DAY, CFG_STAT_HISTORY_DOWNSAMPLE_DAY
+from core.config import CFG_SEND_RATE_GLOBAL, CFG_SEND_BURST_GLOBAL, CFG_SEND_RATE_GROUP, CFG_SEND_BURST_GROUP
+from core.config import CFG_IMAGE_FILE_URL, CFG_METRICS_ENABLE, CFG_LOG_LEVEL
 from core.config import BOT_DATA_PATH, CONFIG_PATH
 from core.communication import MessageMetaData, MessagePort, PrivateMessagePort, GroupMessagePort, preprocess_msg
+from core.communication import warm_up_preprocess
 from core.communication import RequestData, FriendRequestData, JoinGroupRequestData, InviteGroupRequestData
 from core.communication import NoticeData, FriendAddNoticeData, GroupIncreaseNoticeData
 from core.communication import GroupInfo
 from core.data import DC_META, DC_NICKNAME, DC_MACRO, DC_VARIABLE, DC_USER_DATA, DC_GROUP_DATA,\
-    DCK_META_STAT, DCK_USER_STAT, DCK_GROUP_STAT
+    DCK_META_STAT, DCK_GROUP_STAT
 from core.data import DataManager, DataManagerError
-from core.statistics import MetaStatInfo, GroupStatInfo, UserStatInfo
-
-from core.bot.macro import BotMacro, MACRO_PARSE_LIMIT
-from core.bot.variable import BotVariable
+from core.statistics import MetaStatInfo, GroupStatInfo, StatAggregator, StatHistory, STAT_HISTORY_FILE,\
+    ActivityIndex
+
+from core.bot.macro import BotMacro, BotMacroCache
+from core.bot.variable import BotVariable, BotVariableCache, substitute_variables
+from core.bot.context import MessageContext
+from core.bot.executor import CommandExecutor, CommandBusyError, COMMAND_EXECUTOR_TIMEOUT
+from core.bot.watcher import ConfigFileWatcher
+from core.bot.sweeper import DataSweeper, SWEEP_JOB_INDEX, SWEEP_JOB_ROLLOVER, SWEEP_JOB_EXPIRE
 import shutil
 
 # 日志清理相关常量
@@ -31,6 +43,12 @@ LOG_RETENTION_SECONDS = 24 * 3600  # 24小时
 
 NICKNAME_ERROR = "UNDEF_NAME"
 
+BOT_LOGGER = get_logger("core.bot")
+
+STARTUP_INFO_COMMAND_NUM = 5  # 启动汇报中列出初始化最慢的几个指令
+DELAY_INIT_WORKERS = 4  # 并行执行delay_init的线程数量
+SHUTDOWN_DRAIN_TIMEOUT = 10  # 关闭时最多等待多少秒让发送队列中的消息发送完毕
+
 
 # noinspection PyBroadException
 class Bot:
@@ -50,13 +68,24 @@ class Bot:
 
         self.data_manager = DataManager(self.data_path)
         self.fix_data()
+        self.stat_history = StatHistory(os.path.join(self.data_path, STAT_HISTORY_FILE))
+        self.stat_activity = ActivityIndex(self.stat_history)
+        self.stat_aggregator = StatAggregator(self.data_manager, self.stat_history, self.stat_activity)
+        self.sweeper = DataSweeper(self, self.stat_activity)
         self.hub_manager = HubManager(self)
         self.loc_helper = LocalizationManager(CONFIG_PATH, self.account)
         self.cfg_helper = ConfigManager(CONFIG_PATH, self.account)
+        self.config_watcher = ConfigFileWatcher()
 
         self.command_dict: Dict[str, command.UserCommandBase] = {}
+        self.command_init_time: Dict[str, float] = {}  # 指令名 -> 实例化与delay_init的耗时, 单位为秒
+        self.startup_time: Dict[str, float] = {}  # 启动阶段 -> 耗时, 单位为秒
+        self.macro_cache = BotMacroCache()
+        self.variable_cache = BotVariableCache()
+        self.command_executor = CommandExecutor()
 
         self.tick_task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None  # tick_loop所在的事件循环, 其他线程通过它回到事件循环上执行
         self.todo_tasks: Dict[Union[Callable, asyncio.Task], Dict] = {}
 
         self.start_up()
@@ -65,17 +94,33 @@ class Bot:
         from adapter import ClientProxy
         if isinstance(proxy, ClientProxy):
             self.proxy = proxy
+            self.apply_send_rate_config()
         else:
             raise TypeError("Incorrect Client Proxy!")
 
     def start_up(self):
+        begin_time = time.perf_counter()
         self.register_command()
+        begin_time = self.record_startup_time("实例化指令", begin_time)
         self.loc_helper.load_localization()  # 要在注册完命令后再读取本地化文件
-        self.loc_helper.save_localization()  # 更新本地文件
+        if not self.loc_helper.local_file_synced:  # 文件中缺少新的语句或注释时才更新本地文件, 重写整个文件很慢
+            self.loc_helper.save_localization()
         self.loc_helper.load_chat()
         self.loc_helper.save_chat()
+        begin_time = self.record_startup_time("读写本地化文件", begin_time)
         self.cfg_helper.load_config()
         self.cfg_helper.save_config()
+        self.apply_config()
+        self.record_startup_time("读写配置文件", begin_time)
+        # 启动时保存过的文件不需要重新读取, 之后再被修改才会重新读取
+        self.config_watcher.add_file(self.loc_helper.data_path, "本地化文件", self.loc_helper.load_localization)
+        self.config_watcher.add_file(self.loc_helper.chat_data_path, "自定义对话文件", self.loc_helper.load_chat)
+        self.config_watcher.add_file(self.cfg_helper.data_path, "配置文件", self.reload_config)
+        # 补全活跃度索引, 并补上离线期间错过的每日统计更新
+        self.sweeper.add_job(SWEEP_JOB_INDEX)
+        self.sweeper.add_job(SWEEP_JOB_ROLLOVER)
+        # 第一次用到时才载入的依赖在后台提前载入
+        self.register_task(self.warm_up, is_async=False, timeout=0)
 
         try:
             asyncio.get_running_loop()
@@ -83,6 +128,96 @@ class Bot:
         except RuntimeError:  # 在Debug中
             pass
 
+    def record_startup_time(self, phase: str, begin_time: float) -> float:
+        """记录启动阶段的耗时, 返回当前时间作为下一阶段的开始时间"""
+        now = time.perf_counter()
+        self.startup_time[phase] = now - begin_time
+        return now
+
+    def get_startup_info(self) -> List[str]:
+        """返回启动耗时的汇报: 各模块的导入耗时, 启动各阶段的耗时与初始化最慢的几个指令"""
+        from module import MODULE_IMPORT_TIME
+        module_init_time: Dict[str, float] = {}  # 模块名 -> 模块中所有指令的初始化耗时
+        for command_name, cost in self.command_init_time.items():
+            module_name = self.command_dict[command_name].__class__.__module__.split(".")[1]
+            module_init_time[module_name] = module_init_time.get(module_name, 0) + cost
+        slowest_commands = sorted(self.command_init_time.items(), key=lambda item: item[1], reverse=True)
+        slowest_commands = slowest_commands[:STARTUP_INFO_COMMAND_NUM]
+        return [
+            "模块导入: " + ", ".join(f"{name.split('.')[-1]} {cost:.2f}s" for name, cost in MODULE_IMPORT_TIME.items()),
+            "启动: " + ", ".join(f"{phase} {cost:.2f}s" for phase, cost in self.startup_time.items()),
+            "模块初始化: " + ", ".join(f"{name} {cost:.2f}s" for name, cost in module_init_time.items()),
+            "最慢的指令: " + ", ".join(f"{name} {cost:.2f}s" for name, cost in slowest_commands),
+        ]
+
+    def warm_up(self) -> List:
+        """在其他线程上提前载入第一次用到时才载入的依赖, 避免启动后的第一条消息等待"""
+        begin_time = time.perf_counter()
+        warm_up_preprocess()
+        dice_log(f"[Bot] [WarmUp] 预载完成 ({time.perf_counter() - begin_time:.2f}s)")
+        return []
+
+    def reload_config(self):
+        """
+        重新读取配置文件, 会在其他线程上执行
+        读取完成后回到事件循环上应用需要主动设置的配置, 数据驻留与发送队列都只应在事件循环所在的线程上修改
+        """
+        self.cfg_helper.load_config()
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.apply_config)
+        else:  # 在Debug中
+            self.apply_config()
+
+    def apply_config(self):
+        """应用需要主动设置的配置"""
+        self.apply_residency_config()
+        self.apply_send_rate_config()
+        self.apply_image_config()
+        self.apply_metrics_config()
+        self.apply_log_config()
+
+    def watch_config_files(self, now: float):
+        """检查配置文件是否被修改, 在其他线程上重新读取被修改的文件, 完成后通知Master"""
+        from core.command import BotCommandBase, BotSendMsgCommand
+        for path in self.config_watcher.get_changed_files(now):
+            def reload_config_file(path=path) -> List[BotCommandBase]:
+                feedback = self.config_watcher.reload(path)
+                master_list = self.get_master_ids()
+                if not master_list:
+                    return []
+                return [BotSendMsgCommand(self.account, feedback, [PrivateMessagePort(master_list[0])])]
+            self.register_task(reload_config_file, is_async=False, timeout=0)
+
+    def apply_residency_config(self):
+        """根据配置设置用户/群聊数据在内存中驻留的上限"""
+        max_entry: int = self.cfg_helper.get_value(CFG_DATA_RESIDENT_ENTRY)
+        max_size: int = self.cfg_helper.get_value(CFG_DATA_RESIDENT_SIZE)
+        self.data_manager.set_residency_limit(max_entry, max_size)
+
+    def apply_send_rate_config(self):
+        """根据配置设置发送消息的频率限制"""
+        if not self.proxy:
+            return
+        global_rate: float = self.cfg_helper.get_value(CFG_SEND_RATE_GLOBAL)
+        global_burst: int = self.cfg_helper.get_value(CFG_SEND_BURST_GLOBAL)
+        group_rate: float = self.cfg_helper.get_value(CFG_SEND_RATE_GROUP)
+        group_burst: int = self.cfg_helper.get_value(CFG_SEND_BURST_GROUP)
+        self.proxy.set_send_rate_limit(global_rate, global_burst, group_rate, group_burst)
+
+    def apply_image_config(self):
+        """根据配置设置本地图片的发送方式"""
+        ASSET_CACHE.set_use_file_url(bool(self.cfg_helper.get_value(CFG_IMAGE_FILE_URL)))
+
+    def apply_metrics_config(self):
+        """根据配置启用或停用运行指标的记录"""
+        METRICS.enabled = bool(self.cfg_helper.get_value(CFG_METRICS_ENABLE))
+
+    def apply_log_config(self):
+        """根据配置设置dicepp及各模块的日志级别"""
+        invalid_items = set_log_levels(self.cfg_helper.get_value(CFG_LOG_LEVEL))
+        if invalid_items:
+            dice_log(f"[Bot] [Config] 无法识别的日志级别设置: {invalid_items}", level=logging.WARNING)
+
     def register_task(self, task: Callable, is_async: bool = True, timeout: float = 10, timeout_callback: Optional[Callable] = None):
         """
         Args:
@@ -97,6 +232,7 @@ class Bot:
     async def tick_loop(self):
         from core.command import BotCommandBase
         loop = asyncio.get_event_loop()
+        self.loop = loop
         time_counter = [loop.time()] * 2
 
         meta_stat: MetaStatInfo = self.data_manager.get_data(DC_META, [DCK_META_STAT], default_gen=MetaStatInfo)
@@ -114,6 +250,8 @@ class Bot:
                         dice_log(str(self.handle_exception(f"Tick: {command.readable_name} CODE110")[0]))
 
                 if loop_begin_time - time_counter[0] > 60 * 5:  # 5分钟执行一次
+                    # 合并累计的统计数据
+                    self.stat_aggregator.flush()
                     # 更新在线时间并尝试每日更新
                     if meta_stat.update():
                         await self.tick_daily(bot_commands)
@@ -131,13 +269,17 @@ class Bot:
                     # 更新计时器
                     time_counter[1] = loop_begin_time
 
+                if self.sweeper.has_job():
+                    bot_commands += self.sweeper.run()
+
+                self.watch_config_files(loop_begin_time)
+
                 if self.todo_tasks:
                     free_time = max(loop_begin_time + 1 - loop.time(), 0.25)
                     await self.process_async_task(bot_commands, free_time, loop)
 
-                if self.proxy:
-                    for command in bot_commands:
-                        await self.proxy.process_bot_command(command)
+                if self.proxy and bot_commands:
+                    await self.proxy.process_bot_command_list(bot_commands)
             except Exception:
                 bot_commands += self.handle_exception(f"Tick Loop: CODE113")
 
@@ -145,13 +287,19 @@ class Bot:
             free_time = max(loop_begin_time + 1 - loop.time(), 0)
             await asyncio.sleep(free_time)
 
+    def get_todo_task_names(self) -> str:
+        """返回正在等待的任务名称与剩余的超时时间, 用于日志"""
+        task_info = [(task.get_coro().cr_code.co_name if isinstance(task, asyncio.Task) else task.__name__, info["timeout"])
+                     for task, info in self.todo_tasks.items()]
+        return str(task_info)
+
     async def process_async_task(self, bot_commands, free_time: float, loop):
         init_task = [(task, info) for task, info in self.todo_tasks.items() if not info["init"]]
         for func, info in init_task:
             func: Callable
             del self.todo_tasks[func]
             if not info["is_async"]:
-                dice_log(f"[Async Task] Init Sync: {func.__name__}")
+                BOT_LOGGER.debug("[Async Task] Init Sync: %s", func.__name__)
 
                 async def task_wrapper():
                     future = loop.run_in_executor(None, func)
@@ -160,14 +308,13 @@ class Bot:
 
                 task: asyncio.Task = asyncio.create_task(task_wrapper())
             else:
-                dice_log(f"[Async Task] Init Async: {func.__name__}")
+                BOT_LOGGER.debug("[Async Task] Init Async: %s", func.__name__)
                 task: asyncio.Task = asyncio.create_task(func())
             info["init"] = True
             self.todo_tasks[task] = info
 
-        dice_log(f"[Async Task] Try: "
-                 f"{[(task.get_coro().cr_code.co_name, self.todo_tasks[task]['timeout']) for task in self.todo_tasks.keys()]}"
-                 f" for {free_time} s")
+        # 每次tick都会执行, 只在启用DEBUG时才生成任务列表
+        BOT_LOGGER.debug("[Async Task] Try: %s for %s s", LazyStr(self.get_todo_task_names), free_time)
         try:
             done_tasks, pending_tasks = await asyncio.wait(self.todo_tasks.keys(), timeout=free_time)
             task: asyncio.Task
@@ -192,27 +339,15 @@ class Bot:
             dice_log(str(self.handle_exception(f"Async Task: CODE112")[0]))
 
     async def tick_daily(self, bot_commands):
-        # 更新用户统计
-        for user_id in self.data_manager.get_keys(DC_USER_DATA, []):
-            try:
-                user_stat: UserStatInfo = self.data_manager.get_data(DC_USER_DATA, [user_id, DCK_USER_STAT], get_ref=True)
-            except DataManagerError:
-                continue
-            user_stat.daily_update()
-        # 更新群聊统计
-        for group_id in self.data_manager.get_keys(DC_GROUP_DATA, []):
-            try:
-                group_stat: GroupStatInfo = self.data_manager.get_data(DC_USER_DATA, [group_id, DCK_GROUP_STAT], get_ref=True)
-            except DataManagerError:
-                continue
-            group_stat.daily_update()
+        # 更新用户与群聊统计, 由清扫器分段处理
+        self.sweeper.add_job(SWEEP_JOB_ROLLOVER)
+        # 整理统计历史
+        keep_day: int = self.cfg_helper.get_value(CFG_STAT_HISTORY_KEEP_DAY)
+        downsample_day: int = self.cfg_helper.get_value(CFG_STAT_HISTORY_DOWNSAMPLE_DAY)
+        self.stat_history.maintain(get_current_day_ordinal(), keep_day, downsample_day)
 
         # 尝试清理过期群聊和过期用户信息
-        async def clear_expired_data():
-            res = await self.clear_expired_data()
-            return res
-
-        self.register_task(clear_expired_data, timeout=3600)
+        self.clear_expired_data()
 
         # 调用每个command的tick_daily方法
         for command in self.command_dict.values():
@@ -261,6 +396,11 @@ class Bot:
         """
         if self.tick_task:
             self.tick_task.cancel()
+        self.command_executor.shutdown()
+        if self.proxy:  # 限流中的消息和重启的回复还在发送队列里
+            await self.proxy.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        self.stat_aggregator.flush(force=True)
+        self.stat_history.close()
         await self.data_manager.save_data_async()
         # 注意如果保存时文件不存在会用当前值写入default, 如果在读取自定义设置后删掉文件再保存, 就会得到一个不是默认的default sheet
         # self.loc_helper.save_localization() # 暂时不会在运行时修改, 不需要保存
@@ -273,8 +413,11 @@ class Bot:
     async def reboot_async(self):
         dice_log("[Bot] [Reboot] 开始重启")
         await self.shutdown_async()
+        if self.proxy:  # 保存数据期间可能又有新的消息加入发送队列
+            await self.proxy.drain(SHUTDOWN_DRAIN_TIMEOUT)
         import sys
         python = sys.executable
+        stop_log_writer()  # execl不会执行退出时的清理, 需要先写完队列中的日志
         os.execl(python, python, *sys.argv)
         # self.start_up()
         # await self.delay_init_command()
@@ -286,7 +429,9 @@ class Bot:
         command_names = sorted(command_names, key=lambda n: command_cls_dict[n].priority)  # 按优先级排序
         for command_name in command_names:
             command_cls = command_cls_dict[command_name]
+            begin_time = time.perf_counter()
             self.command_dict[command_name] = command_cls(bot=self)  # 默认的Dict是有序的, 所以之后用values拿到的也是有序的
+            self.command_init_time[command_name] = time.perf_counter() - begin_time
 
     def delay_init(self):
         """在载入本地化文本和配置等数据后调用"""
@@ -297,20 +442,37 @@ class Bot:
         loop = asyncio.get_event_loop()
         loop.run_until_complete(self.delay_init_command())
 
+    def delay_init_single(self, command_name: str) -> Tuple[List[str], List]:
+        """在线程池中执行一个指令的delay_init, 完成后该指令即可处理消息. 返回提示信息与出错时要发送的指令"""
+        command = self.command_dict[command_name]
+        begin_time = time.perf_counter()
+        init_info: List[str] = []
+        bc_list: List = []
+        try:
+            init_info = [f"{command.__class__.readable_name}: {info}" for info in command.delay_init()]
+        except Exception:
+            bc_list = self.handle_exception(f"加载{command.__class__.__name__}失败")  # 报错不用中文名
+        finally:
+            command.ready = True  # 出错时也不再阻止使用, 与之前的行为一致
+        self.command_init_time[command_name] = self.command_init_time.get(command_name, 0) + time.perf_counter() - begin_time
+        return init_info, bc_list
+
     async def delay_init_command(self):
-        """在载入本地化文本和配置等数据后调用"""
+        """在载入本地化文本和配置等数据后调用, 各指令的delay_init在线程池中并行执行, 执行期间不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
         init_info: List[str] = []
-        for command in self.command_dict.values():
-            try:
-                init_info_cur = command.delay_init()
-                for i in range(len(init_info_cur)):
-                    init_info_cur[i] = f"{command.__class__.readable_name}: {init_info_cur[i]}"
-                init_info += init_info_cur
-            except Exception:
-                if self.proxy:
-                    bc_list = self.handle_exception(f"加载{command.__class__.__name__}失败")  # 报错不用中文名
-                    for bc in bc_list:
-                        await self.proxy.process_bot_command(bc)
+        begin_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=DELAY_INIT_WORKERS, thread_name_prefix="DiceInit") as pool:
+            results = await asyncio.gather(*[loop.run_in_executor(pool, self.delay_init_single, command_name)
+                                             for command_name in self.command_dict.keys()])
+        for init_info_cur, bc_list in results:
+            init_info += init_info_cur
+            if bc_list and self.proxy:
+                await self.proxy.process_bot_command_list(bc_list)
+        self.record_startup_time("指令初始化", begin_time)
+        startup_info = self.get_startup_info()
+        for info in startup_info:
+            dice_log(f"[Bot] [Startup] {info}")
 
         if self.proxy:
             from core.command import BotSendMsgCommand
@@ -321,6 +483,7 @@ class Bot:
                 for i in range(len(init_info)):
                     if init_info[i] and init_info[i] != "$":
                         feedback_prefix += init_info[i]+"\n"
+                feedback_prefix += "\n" + "\n".join(startup_info) + "\n"
                 feedback = f"{feedback_prefix}\n{feedback}"
                 dice_log(feedback)
                 # 给上次reboot的Admin或Master汇报
@@ -329,12 +492,13 @@ class Bot:
                 if rebooter != "":
                     self.data_manager.set_data(DC_CTRL, ["rebooter"], "")
                     command = BotSendMsgCommand(self.account, feedback, [PrivateMessagePort(rebooter)])
-                    await self.proxy.process_bot_command(command)
+                    await self.proxy.process_bot_command_list([command])
                 # 如果不存在reboot者，则给所有Master汇报
                 else :
-                    for master in self.cfg_helper.get_config(CFG_MASTER):
-                        command = BotSendMsgCommand(self.account, feedback, [PrivateMessagePort(master)])
-                        await self.proxy.process_bot_command(command)
+                    master_ports = [PrivateMessagePort(master) for master in self.cfg_helper.get_config(CFG_MASTER)]
+                    if master_ports:
+                        command = BotSendMsgCommand(self.account, feedback, master_ports)
+                        await self.proxy.process_bot_command_list([command])
             else:
                 dice_log(init_info)
 
@@ -343,64 +507,59 @@ class Bot:
         """处理消息"""
         from core.command import BotCommandBase, BotSendMsgCommand, BotSendForwardMsgCommand
 
+        # 运行指标未启用时不计时
+        metrics_enabled = METRICS.enabled
+        if metrics_enabled:
+            METRICS.inc(METRIC_MESSAGE_TOTAL)
+            phase_begin_time = time.perf_counter()
+
         self.update_nickname(meta.user_id, "origin", meta.nickname)
 
         msg = preprocess_msg(msg)  # 转换中文符号, 转换小写等等
 
         bot_commands: List[BotCommandBase] = []
 
-        # 统计信息
-        meta_stat: MetaStatInfo = self.data_manager.get_data(DC_META, [DCK_META_STAT], default_gen=MetaStatInfo, get_ref=True)
-        user_stat: UserStatInfo = self.data_manager.get_data(DC_USER_DATA, [meta.user_id, DCK_USER_STAT], default_gen=UserStatInfo, get_ref=True)
-        # 修改meta的permission参数
-        # 4:骰主 3:骰管理 2:群主 1:群管理 0:普通人 -1:黑名单
-        if meta.user_id in self.cfg_helper.get_config(CFG_MASTER):
-            meta.permission = 4
-        elif meta.user_id in self.cfg_helper.get_config(CFG_ADMIN):
-            meta.permission = 3
-        else:
-            if meta.sender.role is not None:
-                if meta.sender.role == "owner": # 群主 权限2
-                    meta.permission = 2
-                elif meta.sender.role == "admin": # 群管理 权限1
-                    meta.permission = 1
-                else: #elif meta.sender.role == "member": # 群员，或普通人
-                    meta.permission = 0
-        # 群内资料同步
-        if meta.group_id:
-            group_stat: GroupStatInfo = self.data_manager.get_data(DC_GROUP_DATA, [meta.group_id, DCK_GROUP_STAT], default_gen=GroupStatInfo, get_ref=True)
-        else:
-            group_stat = GroupStatInfo()
+        # 创建消息上下文, meta.permission等数据在第一次用到时才从上下文中读取
+        meta.context = MessageContext(self, meta)
         # 统计收到的消息数量
-        meta_stat.msg.inc()
-        group_stat.msg.inc()
-        user_stat.msg.inc()
+        self.stat_aggregator.record_msg(meta.user_id, meta.group_id)
+        if metrics_enabled:
+            phase_begin_time = METRICS.observe_since(METRIC_MESSAGE_PHASE, phase_begin_time, phase="preprocess")
 
         # 处理宏
         macro_list: List[BotMacro]
         try:
             assert not msg.startswith(".define")
-            macro_list = self.data_manager.get_data(DC_MACRO, [meta.user_id], get_ref=True)
+            macro_list = self.data_manager.get_data(DC_MACRO, [meta.user_id], get_ref=True, read_only=True)
         except (DataManagerError, AssertionError):
             macro_list = []
-        for macro in macro_list:
-            msg = macro.process(msg)
-            if len(msg) > MACRO_PARSE_LIMIT:
-                break
+        if macro_list:
+            msg = self.macro_cache.get(meta.user_id, macro_list).process(msg)
+        if metrics_enabled:
+            phase_begin_time = METRICS.observe_since(METRIC_MESSAGE_PHASE, phase_begin_time, phase="macro")
 
         # 处理变量
+        var_dict: Dict[str, BotVariable]
         try:
-            var_name_list: List[str] = self.data_manager.get_keys(DC_VARIABLE, [meta.user_id, meta.group_id])
-        except DataManagerError:
-            var_name_list = []
-        for var_name in var_name_list:
-            key = f"%{var_name}%"
-            if key in msg:
-                var: BotVariable = self.data_manager.get_data(DC_VARIABLE, [meta.user_id, meta.group_id, var_name])
-                msg = msg.replace(key, str(var.val))
+            assert "%" in msg
+            var_dict = self.data_manager.get_data(DC_VARIABLE, [meta.user_id, meta.group_id], get_ref=True,
+                                                  read_only=True)
+        except (DataManagerError, AssertionError):
+            var_dict = {}
+        if var_dict:
+            var_resolved = self.variable_cache.get(meta.user_id, meta.group_id, var_dict)
+            if var_resolved is not None:
+                msg = substitute_variables(msg, var_resolved)
+            else:  # 变量名中含有%时只能逐个替换
+                for var_name, var in var_dict.items():
+                    key = f"%{var_name}%"
+                    if key in msg:
+                        msg = msg.replace(key, str(var.val))
+        if metrics_enabled:
+            phase_begin_time = METRICS.observe_since(METRIC_MESSAGE_PHASE, phase_begin_time, phase="variable")
 
         # 处理分行指令
-        command_split: str = self.cfg_helper.get_config(CFG_COMMAND_SPLIT)[0]
+        command_split: str = self.cfg_helper.snapshot.command_split
         msg_list = msg.split(command_split)
         msg_list = [m.strip() for m in msg_list]
         is_multi_command = len(msg_list) > 1
@@ -409,6 +568,8 @@ class Bot:
         for msg_cur in msg_list:
             for command in self.command_dict.values():
                 # 判断是否能处理该条指令
+                if metrics_enabled:
+                    command_begin_time = time.perf_counter()
                 try:
                     should_proc, should_pass, hint = command.can_process_msg(msg_cur, meta)
                 except Exception:
@@ -417,6 +578,9 @@ class Bot:
                     info = f"{msg_list}中的{msg_cur}" if is_multi_command else msg
                     group_info = f"群:{meta.group_id}" if meta.group_id else "私聊"
                     bot_commands += self.handle_exception(f"来源:{info}\n用户:{meta.user_id} {group_info}出错位置:{command.readable_name}\n错误代码：CODE100")
+                if metrics_enabled:
+                    command_begin_time = METRICS.observe_since(METRIC_COMMAND_MATCH, command_begin_time,
+                                                               command=command.__class__.__name__)
                 if not should_proc:
                     continue
                 # 在非群聊中企图执行群聊指令, 回复一条提示
@@ -425,26 +589,43 @@ class Bot:
                     bot_commands += [BotSendMsgCommand(self.account, feedback, [PrivateMessagePort(meta.user_id)])]
                     break
                 # 无权限者/权限不足者企图使用一条需要权限的指令, 回复一条提示
-                if meta.permission < command.permission_require:
+                if command.permission_require > 0 and meta.permission < command.permission_require:
                     feedback = self.loc_helper.format_loc_text(LOC_PERMISSION_DENIED_NOTICE)
                     bot_commands += [BotSendMsgCommand(self.account, feedback, [GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)])]
                     break
+                # 指令所需的数据还没有读取完成, 回复一条提示
+                if not command.ready:
+                    feedback = self.loc_helper.format_loc_text(LOC_COMMAND_LOADING_NOTICE)
+                    bot_commands += [BotSendMsgCommand(self.account, feedback, [GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)])]
+                    break
                 # 执行指令
                 res_commands = []
                 try:
-                    res_commands = command.process_msg(msg_cur, meta, hint)
+                    if command.need_prepare:
+                        await command.prepare_msg(msg_cur, meta, hint)
+                    if command.executor:
+                        timeout = command.timeout or COMMAND_EXECUTOR_TIMEOUT
+                        res_commands = await self.command_executor.run(functools.partial(command.process_msg, msg_cur, meta, hint),
+                                                                       meta.group_id or meta.user_id, timeout)
+                    else:
+                        res_commands = command.process_msg(msg_cur, meta, hint)
                     bot_commands += res_commands
+                except (CommandBusyError, asyncio.TimeoutError) as e:
+                    loc_key = LOC_COMMAND_BUSY_NOTICE if isinstance(e, CommandBusyError) else LOC_COMMAND_TIMEOUT_NOTICE
+                    dice_log(f"[Bot] [Executor] {command.readable_name} {'繁忙' if isinstance(e, CommandBusyError) else '超时'}: {msg_cur}")
+                    feedback = self.loc_helper.format_loc_text(loc_key)
+                    bot_commands += [BotSendMsgCommand(self.account, feedback, [GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)])]
                 except Exception:
                     # 发现未处理的错误, 汇报给主Master
                     info = f"{msg_list}中的{msg_cur}" if is_multi_command else msg
                     group_info = f"群:{meta.group_id}" if meta.group_id else "私聊"
                     bot_commands += self.handle_exception(f"来源:{info}\n用户:{meta.user_id} {group_info} CODE101")
+                if metrics_enabled:
+                    METRICS.observe_since(METRIC_COMMAND_PROCESS, command_begin_time, command=command.__class__.__name__)
 
                 # 统计处理的指令情况
                 if command.flag and res_commands:
-                    meta_stat.cmd.record(command)
-                    user_stat.cmd.record(command)
-                    group_stat.cmd.record(command)
+                    self.stat_aggregator.record_cmd(meta.user_id, meta.group_id, command.flag)
 
                 if not should_pass:  # 已经处理过, 不需要再传递给后面的指令
                     break
@@ -463,9 +644,14 @@ class Bot:
             if invalid_command_count == len(bot_commands):  # 全都是SendMsg则合并
                 bot_commands = list(send_msg_command_merged.values())
 
+        if metrics_enabled:
+            phase_begin_time = METRICS.observe_since(METRIC_MESSAGE_PHASE, phase_begin_time, phase="dispatch")
+
         if self.proxy and bot_commands:
             # 处理指令
             await self.proxy.process_bot_command_list(bot_commands)
+            if metrics_enabled:
+                METRICS.observe_since(METRIC_MESSAGE_PHASE, phase_begin_time, phase="send")
         return bot_commands
 
     def process_request(self, data: RequestData) -> Optional[bool]:
@@ -476,10 +662,10 @@ class Bot:
             comment: str = data.comment.strip()
             return not passwords or comment in passwords
         elif isinstance(data, JoinGroupRequestData):
-            should_allow: int = int(self.cfg_helper.get_config(CFG_GROUP_INVITE)[0])
+            should_allow: int = self.cfg_helper.get_value(CFG_GROUP_INVITE)
             return should_allow == 1
         elif isinstance(data, InviteGroupRequestData):
-            should_allow: int = int(self.cfg_helper.get_config(CFG_GROUP_INVITE)[0])
+            should_allow: int = self.cfg_helper.get_value(CFG_GROUP_INVITE)
             return should_allow == 1
         return False
 
@@ -508,9 +694,8 @@ class Bot:
                     
                     bot_commands += [BotSendMsgCommand(self.account, choice(feedback.split("|")), [GroupMessagePort(data.group_id)])]
 
-        if self.proxy:
-            for command in bot_commands:
-                await self.proxy.process_bot_command(command)
+        if self.proxy and bot_commands:
+            await self.proxy.process_bot_command_list(bot_commands)
         return bot_commands
 
     def handle_exception(self, info: str) -> List:
@@ -534,7 +719,7 @@ class Bot:
         from core.command import BotSendMsgCommand
         master_list = self.get_master_ids()
         if master_list:
-            await self.proxy.process_bot_command(BotSendMsgCommand(self.account, msg, [PrivateMessagePort(master_list[0])]))
+            await self.proxy.process_bot_command_list([BotSendMsgCommand(self.account, msg, [PrivateMessagePort(master_list[0])])])
 
     def get_nickname(self, user_id: str, group_id: str = "") -> str:
         """
@@ -593,107 +778,9 @@ class Bot:
     def fix_data(self):
         pass
 
-    async def clear_expired_data(self) -> List:
-        from core.command import BotSendMsgCommand, BotDelayCommand, BotLeaveGroupCommand, BotCommandBase
-        from module.common import DC_POINT, DC_WELCOME, DC_ACTIVATE, DC_CHAT_RECORD
-        from module.character.dnd5e import DC_CHAR_DND, DC_CHAR_HP
-        from module.initiative import DC_INIT
-
-        cur_date = get_current_date_raw()
-        try:
-            is_data_expire = bool(int(self.cfg_helper.get_config(CFG_DATA_EXPIRE)[0]))
-            user_expire_day = int(self.cfg_helper.get_config(CFG_USER_EXPIRE_DAY)[0])
-            group_expire_day = int(self.cfg_helper.get_config(CFG_GROUP_EXPIRE_DAY)[0])
-            group_expire_time = int(self.cfg_helper.get_config(CFG_GROUP_EXPIRE_WARNING)[0])
-            group_expire_warn = self.loc_helper.format_loc_text(LOC_GROUP_EXPIRE_WARNING)
-        except ValueError:
-            return self.handle_exception(f"自动清理信息")
-        if not is_data_expire:
-            return []
-        result_commands: List[BotCommandBase] = []
-        index = 0
-
-        white_list_group: List[str] = preprocess_white_list(self.cfg_helper.get_config(CFG_WHITE_LIST_GROUP))
-        white_list_user: List[str] = preprocess_white_list(self.cfg_helper.get_config(CFG_WHITE_LIST_USER))
-
-        # 清理过期用户信息
-        all_user_id: Set[str] = set(self.data_manager.get_keys(DC_USER_DATA, []))
-        # all_user_id.union(set(self.data_manager.get_keys(DC_NICKNAME, [])))
-        invalid_user_id = []
-        for user_id in all_user_id:
-            is_valid = False
-            # 白名单中的用户不会被清理
-            if user_id in white_list_user:
-                continue
-            try:
-                user_stat: UserStatInfo = self.data_manager.get_data(DC_USER_DATA, [user_id, DCK_USER_STAT])
-            except DataManagerError:
-                invalid_user_id.append(user_id)
-                continue
-            # 掷骰次数超过一定次数的用户不会被清理
-            if user_stat.roll.times.total_val > 200:
-                is_valid = True
-            # 过去一段时间内使用过指令的用户不会被清理
-            for flag in user_stat.cmd.flag_dict.keys():
-                flag_date = int_to_datetime(user_stat.cmd.flag_dict[flag].update_time)
-                if cur_date - flag_date < datetime.timedelta(days=user_expire_day):
-                    is_valid = True
-                    break
-            if not is_valid:
-                invalid_user_id.append(user_id)
-            index += 1
-            if index % 500 == 0:
-                await asyncio.sleep(0)
-        self.data_manager.delete_data_all([user_id for user_id in invalid_user_id])
-
-        # 清理过期群聊消息
-        all_group_id: Set[str] = set(self.data_manager.get_keys(DC_GROUP_DATA, []))
-        invalid_group_id = []
-        warning_group_id = []
-        for group_id in all_group_id:
-            is_valid = False
-            # 白名单中的群聊不会被清理
-            if group_id in white_list_group:
-                continue
-            try:
-                group_stat: GroupStatInfo = self.data_manager.get_data(DC_GROUP_DATA, [group_id, DCK_GROUP_STAT], get_ref=True)
-            except DataManagerError:
-                invalid_group_id.append(group_id)
-                continue
-            # 过去一段时间内使用过指令的群不会被清理
-            for flag in group_stat.cmd.flag_dict.keys():
-                flag_date = int_to_datetime(group_stat.cmd.flag_dict[flag].update_time)
-                if cur_date - flag_date < datetime.timedelta(days=group_expire_day):
-                    is_valid = True
-                    break
-            # 对还没有到达警告次数上限的群进行警告, 不会进行清理
-            if not is_valid and group_stat.meta.warn_time < group_expire_time:
-                is_valid = True
-                group_stat.meta.warn_time += 1
-                if group_stat.meta.member_count > 0:  # 只对拥有群成员的群发送警告消息, 没有说明已经不在该群了
-                    result_commands.append(BotDelayCommand(self.account, seconds=random.random() * 10 + 2))
-                    result_commands.append(BotSendMsgCommand(self.account, group_expire_warn, [GroupMessagePort(group_id)]))
-                    warning_group_id.append(group_id)
-            if not is_valid:
-                invalid_group_id.append(group_id)
-            index += 1
-            if index % 500 == 0:
-                await asyncio.sleep(0)
-        for group_id in invalid_group_id:
-            result_commands.append(BotDelayCommand(self.account, seconds=random.random() * 10 + 2))
-            # temp_warning = "[测试]该群聊已被标记为无效群聊, 尝试使用掷骰指令以清除此标记和提醒(目前没有实际作用, 被误标记了也不用担心)"
-            # result_commands.append(BotSendMsgCommand(self.account, temp_warning, [GroupMessagePort(group_id)]))
-            result_commands.append(BotLeaveGroupCommand(self.account, group_id))
-            self.data_manager.delete_data_all([group_id])
-
-        # 给Master汇报清理情况
-        if self.get_master_ids():
-            master_id = self.get_master_ids()[0]
-            result_commands.append(BotDelayCommand(self.account, seconds=random.random() * 10 + 2))
-            feedback = f"检查{len(all_user_id)}个用户数据, {len(all_group_id)}个群聊数据.\n" \
-                       f"清理{len(invalid_user_id)}个失效用户, {len(invalid_group_id)}个失效群聊({invalid_group_id}).\n" \
-                       f"对{len(warning_group_id)}个即将失效的群聊发送提示消息."
-            # 太长了别发给master了
-            # result_commands.append(BotSendMsgCommand(self.account, feedback, [PrivateMessagePort(master_id)]))
-        result_commands = list(reversed(result_commands))
-        return result_commands
+    def clear_expired_data(self) -> bool:
+        """
+        开始清理过期的用户与群聊数据, 由清扫器在之后的tick中分段完成, 若清理已经在进行中则返回False
+        """
+        self.sweeper.add_job(SWEEP_JOB_INDEX)  # 通过其他途径新建的数据也要加入索引
+        return self.sweeper.add_job(SWEEP_JOB_EXPIRE)
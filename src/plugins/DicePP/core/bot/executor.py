@@ -0,0 +1,88 @@
+"""
+指令线程池, 让计算量较大的指令(大量掷骰, 嵌套牌库抽取, 随机生成器等)的process_msg在事件循环之外执行, 避免阻塞其他群聊
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+COMMAND_EXECUTOR_WORKERS = 4  # 线程池中的线程数量
+COMMAND_EXECUTOR_MAX_PENDING = 16  # 最多同时有多少条指令在线程池中执行或排队, 超过后直接拒绝
+COMMAND_EXECUTOR_TIMEOUT = 10  # 默认的超时时间, 单位为秒
+COMMAND_EXECUTOR_LOCK_PRUNE_SIZE = 1024  # 群聊锁的数量超过该值时清理没有被占用的锁
+
+
+class CommandBusyError(Exception):
+    """线程池中排队的指令过多"""
+
+
+class CommandExecutor:
+    """
+    线程池的包装, 限制同时执行与排队的指令数量, 并保证同一个群聊(或私聊用户)的指令按顺序依次执行
+    指令超时后不会被强制终止(线程无法中断), 但调用方会立即得到超时的结果, 占用的名额直到线程真正结束才会释放
+    """
+    def __init__(self, max_workers: int = COMMAND_EXECUTOR_WORKERS, max_pending: int = COMMAND_EXECUTOR_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pool = None
+        self.pending: int = 0
+        self.locks: Dict[str, asyncio.Lock] = {}
+        # 统计信息
+        self.run_count: int = 0
+        self.busy_count: int = 0
+        self.timeout_count: int = 0
+
+    def get_pool(self) -> ThreadPoolExecutor:
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="DiceCommand")
+        return self.pool
+
+    async def run(self, func: Callable[[], Any], lock_key: str, timeout: float) -> Any:
+        """
+        在线程池中执行func并返回结果
+        Args:
+            func: 没有参数的同步函数
+            lock_key: 相同lock_key的调用会按顺序依次执行, 一般为群号或私聊用户的账号
+            timeout: 超时时间, 单位为秒, 为0代表不会超时
+        Raises:
+            CommandBusyError: 排队的指令过多
+            asyncio.TimeoutError: 执行超时
+        """
+        if self.pending >= self.max_pending:
+            self.busy_count += 1
+            raise CommandBusyError(f"线程池中已有{self.pending}条指令")
+        self.pending += 1
+        if len(self.locks) > COMMAND_EXECUTOR_LOCK_PRUNE_SIZE:
+            self.locks = {key: lock for key, lock in self.locks.items() if lock.locked()}
+        lock = self.locks.setdefault(lock_key, asyncio.Lock())
+        try:
+            await lock.acquire()
+        except BaseException:
+            self.pending -= 1
+            raise
+        # 名额与锁都在线程真正结束后才释放, 超时的指令结束前同一群聊的下一条指令不会开始执行
+        future = asyncio.get_running_loop().run_in_executor(self.get_pool(), func)
+        future.add_done_callback(lambda f: self.__on_done(f, lock))
+        self.run_count += 1
+        if not timeout:
+            return await future
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeout_count += 1
+            raise
+
+    def __on_done(self, future: asyncio.Future, lock: asyncio.Lock) -> None:
+        self.pending -= 1
+        lock.release()
+        if not future.cancelled():
+            future.exception()  # 超时后没有人等待结果, 读取一次异常避免asyncio警告
+
+    def get_status_info(self) -> str:
+        return f"指令线程池: 执行中{self.pending}/{self.max_pending}, 共执行{self.run_count}次, " \
+               f"繁忙拒绝{self.busy_count}次, 超时{self.timeout_count}次"
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
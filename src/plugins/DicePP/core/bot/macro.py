@@ -1,11 +1,15 @@
 import json
-from typing import Dict, List
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
 import re
 
 from core.data import JsonObject, custom_json_object
 
 MACRO_COMMAND_SPLIT = "%%"
 MACRO_PARSE_LIMIT = 500  # 宏展开以后的长度限制
+MACRO_CACHE_SIZE = 256  # 最多缓存多少个用户编译后的宏
+MACRO_REGEX_META_CHARS = ".^$*+?{}[]\\|()"
+MACRO_REGEX_QUANTIFIERS = "*?{"
 
 
 @custom_json_object
@@ -82,3 +86,67 @@ class BotMacro(JsonObject):
 
     def __repr__(self):
         return f"Macro({self.key}, Args:{self.args} -> {self.target})"
+
+
+def get_macro_literal(key: str) -> str:
+    """
+    返回宏关键字能匹配上时消息中必定包含的字符串(关键字开头的普通字符部分), 无法确定时返回空字符串
+    """
+    if "|" in key:
+        return ""
+    for index, char in enumerate(key):
+        if char in MACRO_REGEX_META_CHARS:
+            # 量词作用于前一个字符, 前一个字符也不是必须的
+            return key[:index - 1] if char in MACRO_REGEX_QUANTIFIERS and index > 0 else key[:index]
+    return key
+
+
+class BotMacroSet:
+    """
+    一个用户的所有宏, 处理结果与依次调用每个宏的process相同
+    编译时提取每个宏的关键字中必须出现的字符串, 消息中不包含该字符串的宏可以直接跳过, 不需要进行正则替换
+    """
+    def __init__(self, macro_list: List[BotMacro]):
+        self.macro_list = macro_list
+        self.literal_list: List[str] = [get_macro_literal(macro.key) for macro in macro_list]
+        # 所有宏都有必须出现的字符串时, 消息中不含任何一个首字就说明没有宏需要处理
+        if all(self.literal_list):
+            self.first_chars: Optional[FrozenSet[str]] = frozenset(literal[0] for literal in self.literal_list)
+        else:
+            self.first_chars = None
+
+    def process(self, input_str: str) -> str:
+        if self.first_chars is not None and self.first_chars.isdisjoint(input_str):
+            return input_str
+        for macro, literal in zip(self.macro_list, self.literal_list):
+            if literal and literal not in input_str:
+                continue
+            input_str = macro.process(input_str)
+            if len(input_str) > MACRO_PARSE_LIMIT:
+                break
+        return input_str
+
+
+class BotMacroCache:
+    """
+    按用户缓存编译后的宏, 最近最少使用的会被淘汰
+    宏列表被重新读取或修改后会是一个新的对象, 因此用宏列表对象本身判断缓存是否仍然有效
+    """
+    def __init__(self, max_size: int = MACRO_CACHE_SIZE):
+        self.max_size = max_size
+        self.cache: "OrderedDict[str, Tuple[List[BotMacro], BotMacroSet]]" = OrderedDict()
+
+    def get(self, user_id: str, macro_list: List[BotMacro]) -> BotMacroSet:
+        cached = self.cache.get(user_id)
+        if cached and cached[0] is macro_list:
+            self.cache.move_to_end(user_id)
+            return cached[1]
+        macro_set = BotMacroSet(macro_list)
+        self.cache[user_id] = (macro_list, macro_set)
+        self.cache.move_to_end(user_id)
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return macro_set
+
+    def invalidate(self, user_id: str) -> None:
+        self.cache.pop(user_id, None)
@@ -0,0 +1,210 @@
+"""
+增量清扫器, 把需要遍历大量用户或群聊的维护工作(建立活跃度索引, 每日统计更新, 过期数据清理)拆分为小段,
+在tick_loop的每次循环中只执行有限的时间, 避免长时间阻塞事件循环
+"""
+
+import time
+import random
+from collections import OrderedDict
+from typing import FrozenSet, List, Generator, Tuple, TYPE_CHECKING
+
+from utils.logger import dice_log
+from utils.time import get_current_day_ordinal, int_to_day_ordinal
+from core.localization import LOC_GROUP_EXPIRE_WARNING
+from core.config import CFG_DATA_EXPIRE, CFG_USER_EXPIRE_DAY, CFG_GROUP_EXPIRE_DAY, CFG_GROUP_EXPIRE_WARNING,\
+    CFG_WHITE_LIST_GROUP, CFG_WHITE_LIST_USER
+from core.communication import GroupMessagePort
+from core.data import DC_USER_DATA, DC_GROUP_DATA, DCK_USER_STAT, DCK_GROUP_STAT, DataManagerError
+from core.statistics import ActivityIndex, UserStatInfo, GroupStatInfo, STAT_KIND_USER, STAT_KIND_GROUP
+
+if TYPE_CHECKING:
+    from core.bot import Bot
+
+SWEEP_TIME_BUDGET = 0.05  # 每次循环中最多用于清扫的时间, 单位为秒
+SWEEP_BATCH_SIZE = 200  # 累计多少条索引变更后写入一次数据库
+
+SWEEP_JOB_INDEX = "index"
+SWEEP_JOB_ROLLOVER = "rollover"
+SWEEP_JOB_EXPIRE = "expire"
+
+SWEEP_TARGETS: List[Tuple[str, str, str]] = [(STAT_KIND_USER, DC_USER_DATA, DCK_USER_STAT),
+                                             (STAT_KIND_GROUP, DC_GROUP_DATA, DCK_GROUP_STAT)]
+
+SweepJob = Generator[List, None, None]  # 每处理一个统计目标yield一次, 值为需要执行的BotCommand列表
+
+
+def get_expire_before_day(today: int, expire_day: int) -> int:
+    """
+    返回过期清理时最后使用指令日期的上限(不含). 索引只记录日期, 原本按时间判断"距今不足expire_day天"的目标,
+    最后使用指令的日期最早可能是today - expire_day, 所以只清理在此之前的目标, 宁可晚一天清理也不能提前清理
+    """
+    return today - expire_day
+
+
+def get_stat_activity(stat) -> Tuple[int, int]:
+    """根据UserStatInfo或GroupStatInfo中记录的更新时间推算最后活跃和最后使用指令的日期序号"""
+    cmd_time = max((elem.update_time for elem in stat.cmd.flag_dict.values()), default=0)
+    active_time = max(stat.msg.update_time, stat.roll.times.update_time, cmd_time)
+    return int_to_day_ordinal(active_time), int_to_day_ordinal(cmd_time)
+
+
+class DataSweeper:
+    """
+    按加入顺序依次执行清扫任务, 同名的任务同时只会存在一个
+    """
+    def __init__(self, bot: "Bot", activity: ActivityIndex):
+        self.bot = bot
+        self.activity = activity
+        self.jobs: "OrderedDict[str, SweepJob]" = OrderedDict()
+
+    def add_job(self, name: str) -> bool:
+        """
+        加入一个清扫任务, 若同名任务已经在等待或执行中则返回False
+        Args:
+            name: SWEEP_JOB_INDEX, SWEEP_JOB_ROLLOVER或SWEEP_JOB_EXPIRE
+        """
+        if name in self.jobs:
+            return False
+        if name == SWEEP_JOB_INDEX:
+            self.jobs[name] = self.__index_job()
+        elif name == SWEEP_JOB_ROLLOVER:
+            self.jobs[name] = self.__rollover_job(get_current_day_ordinal())
+        elif name == SWEEP_JOB_EXPIRE:
+            self.jobs[name] = self.__expire_job()
+        else:
+            raise ValueError(f"未知的清扫任务: {name}")
+        return True
+
+    def has_job(self) -> bool:
+        return bool(self.jobs)
+
+    def run(self, budget: float = SWEEP_TIME_BUDGET) -> List:
+        """
+        执行清扫任务直到用完budget秒或所有任务完成, 返回需要执行的BotCommand
+        """
+        bot_commands = []
+        deadline = time.perf_counter() + budget
+        while self.jobs and time.perf_counter() < deadline:
+            name, job = next(iter(self.jobs.items()))
+            try:
+                bot_commands += next(job)
+            except StopIteration:
+                del self.jobs[name]
+            except Exception:
+                del self.jobs[name]
+                job.close()
+                dice_log(str(self.bot.handle_exception(f"Sweep: {name} CODE115")[0]))
+        return bot_commands
+
+    def __index_job(self) -> SweepJob:
+        """为还不在活跃度索引中的用户和群聊建立索引, 一般只有首次启动时需要处理所有数据"""
+        for kind, target, stat_key in SWEEP_TARGETS:
+            indexed = self.activity.get_entities(kind)
+            missing = [key for key in self.bot.data_manager.get_keys(target, []) if key not in indexed]
+            if not missing:
+                continue
+            dice_log(f"[Sweep] [Index] 为{len(missing)}个{target}建立活跃度索引")
+            batch = []
+            for key in missing:
+                try:
+                    stat = self.bot.data_manager.get_data(target, [key, stat_key])
+                    active_day, cmd_day = get_stat_activity(stat)
+                except DataManagerError:
+                    active_day, cmd_day = 0, 0
+                batch.append((key, active_day, cmd_day))
+                if len(batch) >= SWEEP_BATCH_SIZE:
+                    self.activity.insert(kind, batch)
+                    batch = []
+                yield []
+            self.activity.insert(kind, batch)
+
+    def __rollover_job(self, today: int) -> SweepJob:
+        """对仍有未归零计数的用户和群聊进行每日统计更新, 期间暂停合并新的统计数据"""
+        self.bot.stat_aggregator.suspended = True
+        try:
+            for kind, target, stat_key in SWEEP_TARGETS:
+                batch = []
+                for key, roll_day, dirty in self.activity.query_rollover(kind, today):
+                    past_days = today - roll_day
+                    try:
+                        stat = self.bot.data_manager.get_data(target, [key, stat_key], get_ref=True)
+                        stat.daily_update(past_days)
+                    except DataManagerError:
+                        pass
+                    batch.append((key, dirty - 1 if past_days == 1 else 0))
+                    if len(batch) >= SWEEP_BATCH_SIZE:
+                        self.activity.mark_rolled(kind, today, batch)
+                        batch = []
+                    yield []
+                self.activity.mark_rolled(kind, today, batch)
+        finally:
+            self.bot.stat_aggregator.suspended = False
+
+    def __expire_job(self) -> SweepJob:
+        """清理长时间没有使用指令的用户与群聊, 只需要检查活跃度索引给出的候选者"""
+        from core.command import BotDelayCommand, BotSendMsgCommand, BotLeaveGroupCommand
+        bot = self.bot
+        bot.stat_aggregator.flush()
+        is_data_expire: bool = bot.cfg_helper.get_value(CFG_DATA_EXPIRE)
+        if not is_data_expire:
+            return
+        user_expire_day: int = bot.cfg_helper.get_value(CFG_USER_EXPIRE_DAY)
+        group_expire_day: int = bot.cfg_helper.get_value(CFG_GROUP_EXPIRE_DAY)
+        group_expire_time: int = bot.cfg_helper.get_value(CFG_GROUP_EXPIRE_WARNING)
+        group_expire_warn = bot.loc_helper.format_loc_text(LOC_GROUP_EXPIRE_WARNING)
+        today = get_current_day_ordinal()
+        white_list_group: FrozenSet[str] = bot.cfg_helper.get_value(CFG_WHITE_LIST_GROUP)
+        white_list_user: FrozenSet[str] = bot.cfg_helper.get_value(CFG_WHITE_LIST_USER)
+
+        # 清理过期用户信息
+        user_candidates = self.activity.query_inactive(STAT_KIND_USER, get_expire_before_day(today, user_expire_day))
+        invalid_user_id = []
+        for user_id, _ in user_candidates:
+            # 白名单中的用户不会被清理
+            if user_id in white_list_user:
+                continue
+            try:
+                user_stat: UserStatInfo = bot.data_manager.get_data(DC_USER_DATA, [user_id, DCK_USER_STAT])
+                # 掷骰次数超过一定次数的用户不会被清理
+                is_valid = user_stat.roll.times.total_val > 200
+            except DataManagerError:
+                is_valid = False
+            if not is_valid:
+                invalid_user_id.append(user_id)
+                bot.data_manager.delete_data_all([user_id])
+            yield []
+        self.activity.delete(STAT_KIND_USER, invalid_user_id)
+        if invalid_user_id:
+            bot.variable_cache.clear()
+
+        # 清理过期群聊消息
+        group_candidates = self.activity.query_inactive(STAT_KIND_GROUP, get_expire_before_day(today, group_expire_day))
+        invalid_group_id = []
+        warning_group_id = []
+        for group_id, _ in group_candidates:
+            # 白名单中的群聊不会被清理
+            if group_id in white_list_group:
+                continue
+            bot_commands = []
+            try:
+                group_stat: GroupStatInfo = bot.data_manager.get_data(DC_GROUP_DATA, [group_id, DCK_GROUP_STAT], get_ref=True)
+            except DataManagerError:
+                group_stat = None
+            # 对还没有到达警告次数上限的群进行警告, 不会进行清理
+            if group_stat and group_stat.meta.warn_time < group_expire_time:
+                group_stat.meta.warn_time += 1
+                if group_stat.meta.member_count > 0:  # 只对拥有群成员的群发送警告消息, 没有说明已经不在该群了
+                    bot_commands.append(BotDelayCommand(bot.account, seconds=random.random() * 10 + 2))
+                    bot_commands.append(BotSendMsgCommand(bot.account, group_expire_warn, [GroupMessagePort(group_id)]))
+                    warning_group_id.append(group_id)
+            else:
+                invalid_group_id.append(group_id)
+                bot_commands.append(BotDelayCommand(bot.account, seconds=random.random() * 10 + 2))
+                bot_commands.append(BotLeaveGroupCommand(bot.account, group_id))
+                bot.data_manager.delete_data_all([group_id])
+            yield bot_commands
+        self.activity.delete(STAT_KIND_GROUP, invalid_group_id)
+
+        dice_log(f"[Sweep] [Expire] 检查{len(user_candidates)}个不活跃用户, {len(group_candidates)}个不活跃群聊. "
+                 f"清理{len(invalid_user_id)}个失效用户, {len(invalid_group_id)}个失效群聊({invalid_group_id}). "
+                 f"对{len(warning_group_id)}个即将失效的群聊发送提示消息.")
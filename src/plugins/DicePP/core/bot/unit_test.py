@@ -0,0 +1,257 @@
+import unittest
+import os
+import shutil
+import random
+from typing import Any, Dict, List, Union
+
+from utils.time import get_current_day_ordinal, get_current_date_int, int_to_day_ordinal
+from core.command import BotSendMsgCommand, BotLeaveGroupCommand
+from core.config import CFG_DATA_EXPIRE, CFG_USER_EXPIRE_DAY, CFG_GROUP_EXPIRE_DAY, CFG_GROUP_EXPIRE_WARNING,\
+    CFG_WHITE_LIST_GROUP, CFG_WHITE_LIST_USER, DEFAULT_CONFIG_TYPE
+from core.config.config_item import CONFIG_PARSERS, CONFIG_TYPE_STR
+from core.data import DataManager, DC_USER_DATA, DC_GROUP_DATA, DCK_USER_STAT, DCK_GROUP_STAT
+from core.statistics import StatHistory, ActivityIndex, UserStatInfo, GroupStatInfo, StatElementBase,\
+    STAT_KIND_USER, STAT_KIND_GROUP
+from core.bot.sweeper import DataSweeper, SWEEP_JOB_INDEX, SWEEP_JOB_ROLLOVER, SWEEP_JOB_EXPIRE
+from core.bot.variable import BotVariable, resolve_variables, substitute_variables
+from core.bot.context import MessageContext
+from core.communication import MessageMetaData, MessageSender
+
+test_path = os.path.join(os.path.dirname(__file__), 'test_data')
+
+EXPIRE_DAY = 10
+
+
+class TestSweepBot:
+    """只提供DataSweeper用到的接口"""
+    class Aggregator:
+        def __init__(self):
+            self.suspended = False
+
+        def flush(self):
+            pass
+
+    class ConfigHelper:
+        def __init__(self):
+            self.configs: Dict[str, List[str]] = {
+                CFG_DATA_EXPIRE: ["1"], CFG_USER_EXPIRE_DAY: [str(EXPIRE_DAY)], CFG_GROUP_EXPIRE_DAY: [str(EXPIRE_DAY)],
+                CFG_GROUP_EXPIRE_WARNING: ["1"], CFG_WHITE_LIST_GROUP: ["other_group;white_group"], CFG_WHITE_LIST_USER: ["white_user"],
+            }
+
+        def get_config(self, key: str) -> List[str]:
+            return self.configs[key]
+
+        def get_value(self, key: str) -> Any:
+            return CONFIG_PARSERS[DEFAULT_CONFIG_TYPE.get(key, CONFIG_TYPE_STR)](tuple(self.configs[key]))
+
+    class LocHelper:
+        @staticmethod
+        def format_loc_text(key: str, **kwargs) -> str:
+            return "expire warning"
+
+    class VariableCache:
+        def clear(self):
+            pass
+
+    def __init__(self, data_manager: DataManager):
+        self.account = "test_bot"
+        self.data_manager = data_manager
+        self.stat_aggregator = self.Aggregator()
+        self.cfg_helper = self.ConfigHelper()
+        self.loc_helper = self.LocHelper()
+        self.variable_cache = self.VariableCache()
+
+    def handle_exception(self, info: str) -> list:
+        raise AssertionError(info)
+
+
+def make_variables(var_info: Dict[str, Union[int, str]]) -> Dict[str, BotVariable]:
+    var_dict = {}
+    for name, val in var_info.items():
+        var_dict[name] = BotVariable()
+        var_dict[name].initialize(name, val)
+    return var_dict
+
+
+def legacy_substitute(msg: str, var_dict: Dict[str, BotVariable]) -> str:
+    """之前逐个变量调用str.replace的写法"""
+    for var_name, var in var_dict.items():
+        key = f"%{var_name}%"
+        if key in msg:
+            msg = msg.replace(key, str(var.val))
+    return msg
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data_manager = DataManager(test_path)
+        self.history = StatHistory(os.path.join(test_path, "stat_history.db"))
+        self.activity = ActivityIndex(self.history)
+        self.bot = TestSweepBot(self.data_manager)
+        self.sweeper = DataSweeper(self.bot, self.activity)
+        self.today = get_current_day_ordinal()
+
+    def tearDown(self) -> None:
+        self.history.close()
+        shutil.rmtree(test_path, ignore_errors=True)
+
+    def run_all(self) -> list:
+        bot_commands = []
+        while self.sweeper.has_job():
+            bot_commands += self.sweeper.run(budget=1)
+        return bot_commands
+
+    def test0_index_budget(self):
+        print("开始测试分段建立索引")
+        user_num = 2000
+        for i in range(user_num):
+            self.data_manager.set_data(DC_USER_DATA, [f"user{i}", DCK_USER_STAT], UserStatInfo())
+        cmd_stat = UserStatInfo()
+        cmd_stat.cmd.flag_dict[1] = StatElementBase()
+        cmd_time = get_current_date_int() - 2 * 24 * 3600
+        cmd_stat.cmd.flag_dict[1].inc(update_time=cmd_time)
+        self.data_manager.set_data(DC_USER_DATA, ["user0", DCK_USER_STAT], cmd_stat)
+        self.activity.insert(STAT_KIND_USER, [("user1", 5, 5)])  # 已经在索引中的不会被覆盖
+
+        self.assertTrue(self.sweeper.add_job(SWEEP_JOB_INDEX))
+        self.assertFalse(self.sweeper.add_job(SWEEP_JOB_INDEX))  # 同名任务只会有一个
+        self.sweeper.run(budget=0)
+        self.assertTrue(self.sweeper.has_job())
+        self.assertEqual(self.activity.get_entities(STAT_KIND_USER), {"user1"})  # 没有时间时不做任何处理
+        run_times = 0
+        while self.sweeper.has_job():
+            self.sweeper.run(budget=0.001)
+            run_times += 1
+        self.assertGreater(run_times, 1)
+        self.assertEqual(len(self.activity.get_entities(STAT_KIND_USER)), user_num)
+        row = self.activity.get_connection().execute(
+            "SELECT entity, cmd_day FROM stat_activity WHERE kind = ? AND entity IN ('user0', 'user1', 'user2') ORDER BY entity;",
+            (STAT_KIND_USER,)).fetchall()
+        self.assertEqual(row, [("user0", int_to_day_ordinal(cmd_time)), ("user1", 5), ("user2", 0)])
+        print(f"分{run_times}次完成建立索引")
+
+    def test1_rollover(self):
+        print("开始测试每日更新")
+        for user_id, roll_day in (("yesterday", self.today - 1), ("long_ago", self.today - 3), ("today", self.today)):
+            stat = UserStatInfo()
+            stat.msg.cur_day_val = 5
+            stat.msg.last_day_val = 2
+            self.data_manager.set_data(DC_USER_DATA, [user_id, DCK_USER_STAT], stat)
+            self.activity.insert(STAT_KIND_USER, [(user_id, roll_day, 0)])
+
+        self.sweeper.add_job(SWEEP_JOB_ROLLOVER)
+        self.sweeper.run(budget=0)
+        self.assertTrue(self.sweeper.has_job())
+        self.run_all()
+        self.assertFalse(self.bot.stat_aggregator.suspended)
+
+        def get_msg_stat(user_id: str):
+            stat = self.data_manager.get_data(DC_USER_DATA, [user_id, DCK_USER_STAT])
+            return stat.msg.cur_day_val, stat.msg.last_day_val
+        self.assertEqual(get_msg_stat("yesterday"), (0, 5))
+        self.assertEqual(get_msg_stat("long_ago"), (0, 0))
+        self.assertEqual(get_msg_stat("today"), (5, 2))  # 今天已经更新过
+        self.assertEqual(self.activity.query_rollover(STAT_KIND_USER, self.today), [])
+        self.assertEqual(self.activity.query_rollover(STAT_KIND_USER, self.today + 1),
+                         [("yesterday", self.today, 1), ("today", self.today, 2)])
+
+        # 同一天再次执行不会重复更新
+        self.data_manager.get_data(DC_USER_DATA, ["yesterday", DCK_USER_STAT], get_ref=True).msg.cur_day_val = 3
+        self.sweeper.add_job(SWEEP_JOB_ROLLOVER)
+        self.run_all()
+        self.assertEqual(get_msg_stat("yesterday"), (3, 5))
+        print("每日更新正确且不会重复执行")
+
+    def test2_expire(self):
+        print("开始测试过期清理")
+        user_days = {"old": self.today - EXPIRE_DAY - 1, "edge": self.today - EXPIRE_DAY,
+                     "recent": self.today - EXPIRE_DAY + 1, "never": 0, "roller": 0, "white_user": 0}
+        for user_id, cmd_day in user_days.items():
+            stat = UserStatInfo()
+            if user_id == "roller":
+                stat.roll.times.total_val = 201
+            self.data_manager.set_data(DC_USER_DATA, [user_id, DCK_USER_STAT], stat)
+            self.activity.insert(STAT_KIND_USER, [(user_id, cmd_day, cmd_day)])
+        group_info = {"old_warned": (self.today - EXPIRE_DAY - 1, 1, 5), "old_new": (self.today - EXPIRE_DAY - 1, 0, 5),
+                      "old_left": (self.today - EXPIRE_DAY - 1, 0, 0), "edge": (self.today - EXPIRE_DAY, 1, 5),
+                      "white_group": (0, 1, 5)}
+        for group_id, (cmd_day, warn_time, member_count) in group_info.items():
+            stat = GroupStatInfo()
+            stat.meta.warn_time = warn_time
+            stat.meta.member_count = member_count
+            self.data_manager.set_data(DC_GROUP_DATA, [group_id, DCK_GROUP_STAT], stat)
+            self.activity.insert(STAT_KIND_GROUP, [(group_id, cmd_day, cmd_day)])
+
+        self.sweeper.add_job(SWEEP_JOB_EXPIRE)
+        bot_commands = self.run_all()
+
+        # 最后使用指令的日期恰好在expire_day天前的用户可能还不足expire_day天, 不能清理
+        remain_user = {"edge", "recent", "roller", "white_user"}
+        self.assertEqual(set(self.data_manager.get_keys(DC_USER_DATA, [])), remain_user)
+        self.assertEqual(self.activity.get_entities(STAT_KIND_USER), remain_user)
+        remain_group = {"old_new", "old_left", "edge", "white_group"}
+        self.assertEqual(set(self.data_manager.get_keys(DC_GROUP_DATA, [])), remain_group)
+        self.assertEqual(self.activity.get_entities(STAT_KIND_GROUP), remain_group)
+        for group_id in ("old_new", "old_left"):
+            self.assertEqual(self.data_manager.get_data(DC_GROUP_DATA, [group_id, DCK_GROUP_STAT]).meta.warn_time, 1)
+        self.assertEqual(self.data_manager.get_data(DC_GROUP_DATA, ["edge", DCK_GROUP_STAT]).meta.warn_time, 1)
+
+        leave_group = [command.target_group_id for command in bot_commands if isinstance(command, BotLeaveGroupCommand)]
+        self.assertEqual(leave_group, ["old_warned"])
+        warn_group = [command.targets[0].group_id for command in bot_commands if isinstance(command, BotSendMsgCommand)]
+        self.assertEqual(warn_group, ["old_new"])  # 没有群成员的群不发送警告
+        print("过期清理正确")
+
+        # 清理关闭时不做任何处理
+        self.bot.cfg_helper.configs[CFG_DATA_EXPIRE] = ["0"]
+        self.sweeper.add_job(SWEEP_JOB_EXPIRE)
+        self.assertEqual(self.run_all(), [])
+        self.assertEqual(set(self.data_manager.get_keys(DC_GROUP_DATA, [])), remain_group)
+
+    def test3_variable(self):
+        print("开始测试变量替换")
+        var_dict = make_variables({"生命": 20, "a": 1, "ab": 12, "b b": 3, "空": ""})
+        resolved = resolve_variables(var_dict)
+        cases = ["", "没有变量", ".r 1d20+%生命%", "%a%%ab%%b b%", "%a", "a%", "%%a%%", "%不存在%+%a%",
+                 "%空%+1", "%a%%", "%%", "%A%", "%生命%%生命%"]
+        rng = random.Random(0)
+        # 普通文本不与变量名拼接, 避免出现之前的写法依赖替换顺序的情况
+        segments = ["%生命%", "%a%", "%ab%", "%b b%", "%不存在%", "%空%", ".r", "1d20+", "攻击", " ", "+"]
+        cases += ["".join(rng.choice(segments) for _ in range(rng.randint(1, 8))) for _ in range(500)]
+        for msg in cases:
+            self.assertEqual(substitute_variables(msg, resolved), legacy_substitute(msg, var_dict), f"消息: {msg!r}")
+        # 变量引用重叠时从左到右替换
+        self.assertEqual(substitute_variables("%a%b b%", resolved), "1b b%")
+        self.assertEqual(substitute_variables("%x%a%", resolved), "%x1")
+        self.assertEqual(substitute_variables("%a%", {}), "%a%")
+        print("变量替换与之前的结果相同")
+
+    def test4_variable_dep(self):
+        print("开始测试变量依赖")
+        var_dict = make_variables({"总": "%力量%+%加值%", "加值": "%熟练%+1", "熟练": 2, "力量": 3,
+                                   "甲": "%乙%", "乙": "%甲%+1", "缺": "%不存在%"})
+        resolved = resolve_variables(var_dict)
+        self.assertEqual(resolved["总"], "3+2+1")  # 无论定义顺序如何, 都按依赖关系求值
+        self.assertEqual(resolved["加值"], "2+1")
+        self.assertEqual(resolved["缺"], "%不存在%")
+        # 循环依赖的部分保持原样
+        self.assertEqual(resolved["甲"], "%甲%+1")
+        self.assertEqual(resolved["乙"], "%甲%+1")
+        self.assertEqual(substitute_variables(".r %总%", resolved), ".r 3+2+1")
+        print("变量依赖求值正确")
+
+    def test5_context_data(self):
+        print("开始测试消息上下文中的数据")
+        self.data_manager.set_data(DC_GROUP_DATA, ["group", "config"], {"list": [1, 2]})
+        context = MessageContext(self.bot, MessageMetaData("", "", MessageSender("user", "测试"), "group"))
+        data = context.get_data(DC_GROUP_DATA, ["group", "config"])
+        data["list"].append(3)  # 修改取得的数据不影响之后读取的结果
+        self.assertEqual(context.get_data(DC_GROUP_DATA, ["group", "config"]), {"list": [1, 2]})
+        self.assertEqual(self.data_manager.get_data(DC_GROUP_DATA, ["group", "config"]), {"list": [1, 2]})
+        self.data_manager.set_data(DC_GROUP_DATA, ["group", "config", "list"], [4])  # 修改数据后重新读取
+        self.assertEqual(context.get_data(DC_GROUP_DATA, ["group", "config"]), {"list": [4]})
+        print("消息上下文中的数据正确")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,12 @@
 import json
-from typing import Union
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
 import re
 
 from core.data import JsonObject, custom_json_object
 
 VAR_DEP_PATTERN: re.Pattern = re.compile(r"%(.+)%")
+VAR_CACHE_SIZE = 1024  # 最多缓存多少个(用户, 群聊)的变量取值
 
 
 @custom_json_object
@@ -42,3 +44,94 @@ class BotVariable(JsonObject):
 
     def __repr__(self):
         return f"Var({self.name} = {self.val})"
+
+
+def resolve_variables(var_dict: Dict[str, BotVariable]) -> Dict[str, str]:
+    """
+    计算每个变量替换后的字符串, 依赖其他变量的变量会按依赖关系的拓扑顺序求值, 循环依赖的部分保持原样
+    """
+    resolved: Dict[str, str] = {}
+    visiting: set = set()
+
+    def resolve(name: str) -> str:
+        if name in resolved:
+            return resolved[name]
+        var = var_dict[name]
+        if var.is_num or not var.dep:
+            resolved[name] = str(var.val)
+            return resolved[name]
+        visiting.add(name)
+        val = str(var.val)
+        # 先求出被引用的变量, 即按拓扑顺序求值
+        dep_resolved = {dep: resolve(dep) for dep in val.split("%")[1:-1] if dep in var_dict and dep not in visiting}
+        val = substitute_variables(val, dep_resolved)
+        visiting.discard(name)
+        resolved[name] = val
+        return val
+
+    for var_name in var_dict:
+        resolve(var_name)
+    return resolved
+
+
+def substitute_variables(input_str: str, resolved: Dict[str, str]) -> str:
+    """
+    从左到右扫描一次input_str, 将所有%变量名%替换为resolved中的值, 不存在的变量名保持原样
+    """
+    if not resolved:
+        return input_str
+    start = input_str.find("%")
+    if start == -1:
+        return input_str
+    result: List[str] = []
+    prev = 0
+    while start != -1:
+        end = input_str.find("%", start + 1)
+        if end == -1:
+            break
+        name = input_str[start + 1:end]
+        if name in resolved:
+            result.append(input_str[prev:start])
+            result.append(resolved[name])
+            prev = end + 1
+            start = input_str.find("%", prev)
+        else:
+            # 结尾的%可能是下一个引用的开头
+            start = end
+    if not result:
+        return input_str
+    result.append(input_str[prev:])
+    return "".join(result)
+
+
+class BotVariableCache:
+    """
+    按(用户, 群聊)缓存所有变量替换后的字符串, 最近最少使用的会被淘汰
+    变量被修改或删除后需要调用invalidate
+    """
+    def __init__(self, max_size: int = VAR_CACHE_SIZE):
+        self.max_size = max_size
+        self.cache: "OrderedDict[Tuple[str, str], Optional[Dict[str, str]]]" = OrderedDict()
+
+    def get(self, user_id: str, group_id: str, var_dict: Dict[str, BotVariable]) -> Optional[Dict[str, str]]:
+        """
+        返回变量名到替换字符串的字典, 若有变量名中含有%, 无法通过一次扫描处理, 返回None
+        """
+        key = (user_id, group_id)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if any("%" in var_name for var_name in var_dict):
+            resolved = None
+        else:
+            resolved = resolve_variables(var_dict)
+        self.cache[key] = resolved
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return resolved
+
+    def invalidate(self, user_id: str, group_id: str) -> None:
+        self.cache.pop((user_id, group_id), None)
+
+    def clear(self) -> None:
+        self.cache.clear()
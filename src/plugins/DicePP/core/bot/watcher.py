@@ -0,0 +1,87 @@
+"""
+配置文件监视, config.xlsx, localization.xlsx, chat.xlsx被修改后只重新读取被修改的文件, 不需要重启
+"""
+
+import os
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from utils.logger import dice_log
+
+CONFIG_WATCH_INTERVAL = 5  # 检查修改时间的间隔, 单位为秒
+CONFIG_WATCH_SETTLE = 1  # 文件最后一次修改后至少经过多久才重新读取, 避免读到写了一半的文件, 单位为秒
+
+FileStat = Tuple[int, int]  # (修改时间, 文件大小)
+
+
+def get_file_stat(path: str) -> Optional[FileStat]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ConfigFileWatcher:
+    """
+    轮询文件的修改时间, 标准库没有跨平台的文件变动通知, 每隔几秒检查一次修改时间的开销可以忽略
+    """
+    def __init__(self, interval: float = CONFIG_WATCH_INTERVAL):
+        self.interval = interval
+        self.files: Dict[str, Tuple[str, Callable[[], None]]] = {}  # 路径 -> (显示的名字, 重新读取的函数)
+        self.stats: Dict[str, Optional[FileStat]] = {}  # 路径 -> 上次读取时的状态
+        self.reloading: Set[str] = set()  # 正在重新读取的文件
+        self.check_time: float = 0
+
+    def add_file(self, path: str, name: str, reload_func: Callable[[], None]) -> None:
+        """
+        Args:
+            path: 文件路径
+            name: 汇报时显示的名字
+            reload_func: 重新读取该文件的函数, 会在其他线程上执行
+        """
+        self.files[path] = (name, reload_func)
+        self.stats[path] = get_file_stat(path)
+
+    def record(self) -> None:
+        """记录所有文件当前的状态, 之前的修改(如启动时自己保存的文件)不会触发重新读取"""
+        for path in self.files:
+            self.stats[path] = get_file_stat(path)
+
+    def get_changed_files(self, now: float) -> List[str]:
+        """
+        返回上次读取后被修改过的文件, 距离上次检查不足interval秒时直接返回空列表
+        Args:
+            now: 当前时间, 只用来判断检查间隔, 单调时间即可
+        """
+        if now - self.check_time < self.interval:
+            return []
+        self.check_time = now
+        changed = []
+        for path in self.files:
+            if path in self.reloading:
+                continue
+            stat = get_file_stat(path)
+            if stat is None or stat == self.stats[path]:  # 文件被删除时保持现有的配置
+                continue
+            if time.time() - stat[0] / 1e9 < CONFIG_WATCH_SETTLE:
+                continue
+            self.reloading.add(path)
+            changed.append(path)
+        return changed
+
+    def reload(self, path: str) -> str:
+        """重新读取文件并返回汇报的内容, 应在get_changed_files返回该文件后调用一次"""
+        name, reload_func = self.files[path]
+        # 先记录状态再读取, 读取过程中文件再次被修改的话下次检查还会重新读取
+        self.stats[path] = get_file_stat(path)
+        begin_time = time.monotonic()
+        try:
+            reload_func()
+            feedback = f"检测到{name}被修改, 已重新读取 ({time.monotonic() - begin_time:.2f}秒)"
+        except Exception as e:
+            feedback = f"检测到{name}被修改, 重新读取失败, 继续使用之前的配置: {e}"
+        finally:
+            self.reloading.discard(path)
+        dice_log(f"[Watcher] [Reload] {feedback}")
+        return feedback
@@ -87,7 +87,7 @@ class BotSendForwardMsgCommand(BotCommandBase):
 
 class BotSendFileCommand(BotCommandBase):
     """
-    上传文件（群内限定）
+    上传文件到群聊或私聊, 群聊中display_name可以用"文件夹/文件名"指定已存在的群文件夹
     """
 
     def __init__(self, bot_id: str, file: str, display_name: str, targets: List[MessagePort]):
@@ -38,6 +38,9 @@ DPP_COMMAND_FLAG_DICT = {
     DPP_COMMAND_FLAG_HUB: "Hub",
 }
 
+DPP_COMMAND_EXECUTOR_DEFAULT = ""  # 在事件循环中直接执行
+DPP_COMMAND_EXECUTOR_THREAD = "thread"  # 在指令线程池中执行
+
 DPP_COMMAND_CLUSTER_DEFAULT = 0  # 命令所属的功能群
 DPP_COMMAND_CLUSTER_DICT = {
     DPP_COMMAND_CLUSTER_DEFAULT: "Default",
@@ -19,6 +19,8 @@ class UserCommandBase(metaclass=abc.ABCMeta):
     
     group_only: bool = False
     permission_require: int = 0
+    executor: str = DPP_COMMAND_EXECUTOR_DEFAULT
+    timeout: float = 0
 
     def __init__(self, bot: Bot):
         """
@@ -27,9 +29,17 @@ class UserCommandBase(metaclass=abc.ABCMeta):
         """
         self.bot = bot
         self.format_loc = self.bot.loc_helper.format_loc_text  # 精简代码长度
+        # 重写了delay_init的指令在delay_init完成之前不处理消息, 只回复一条读取中的提示
+        self.ready: bool = (type(self).delay_init is UserCommandBase.delay_init)
+        # 没有重写prepare_msg的指令不需要等待
+        self.need_prepare: bool = (type(self).prepare_msg is not UserCommandBase.prepare_msg)
 
     def delay_init(self) -> List[str]:
-        """在机器人完成初始化后调用, 此时可以读取本地化文本和配置, 返回提示信息"""
+        """
+        在机器人完成初始化后调用, 此时可以读取本地化文本和配置, 返回提示信息
+        各指令的delay_init会在线程池中并行执行, 不要依赖其他指令的delay_init的结果
+        在完成之前can_process_msg仍会被调用, 不要在其中使用delay_init读取的数据
+        """
         return []
 
     def tick(self) -> List[BotCommandBase]:
@@ -56,6 +66,13 @@ class UserCommandBase(metaclass=abc.ABCMeta):
         should_pass: bool = False
         return should_proc, should_pass, None
 
+    async def prepare_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> None:
+        """
+        在process_msg之前于事件循环中执行, 用于需要等待而不能阻塞事件循环的准备工作, 例如等待后台的写入完成
+        参数与process_msg相同
+        """
+        pass
+
     @abc.abstractmethod
     def process_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> List[BotCommandBase]:
         """
@@ -96,7 +113,9 @@ def custom_user_command(readable_name: str,
                         group_only: bool = False,
                         flag: int = DPP_COMMAND_FLAG_DEFAULT,
                         cluster: int = DPP_COMMAND_CLUSTER_DEFAULT,
-                        permission_require: int = 0):
+                        permission_require: int = 0,
+                        executor: str = DPP_COMMAND_EXECUTOR_DEFAULT,
+                        timeout: float = 0):
     """
     装饰Command类, 给自定义的Command附加一些参数
     Args:
@@ -106,6 +125,8 @@ def custom_user_command(readable_name: str,
         flag: 标志位, 标志着指令的类型是DND指令, 娱乐指令等等, 主要用于profiler
         cluster: 所属的命令群组, 被用来开关某一组功能
         permission_require: 所需权限，默认为谁都能用
+        executor: 为DPP_COMMAND_EXECUTOR_THREAD时process_msg会在线程池中执行, 用于计算量较大的指令, 同一群聊的这类指令会依次执行
+        timeout: 在线程池中执行时的超时时间, 单位为秒, 为0时使用默认值
     """
 
     def custom_inner(cls):
@@ -120,6 +141,8 @@ def custom_user_command(readable_name: str,
         cls.flag = flag
         cls.cluster = cluster
         cls.permission_require = permission_require
+        cls.executor = executor
+        cls.timeout = timeout
         USER_COMMAND_CLS_DICT[cls.__name__] = cls
         return cls
 
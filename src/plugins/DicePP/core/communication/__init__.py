@@ -1,7 +1,7 @@
 from core.communication.info import GroupInfo, GroupMemberInfo
 from core.communication.port import MessagePort, PrivateMessagePort, GroupMessagePort
 from core.communication.message import MessageSender, MessageMetaData
-from core.communication.process import preprocess_msg
+from core.communication.process import preprocess_msg, warm_up_preprocess
 
 from core.communication.notice import NoticeData, GroupIncreaseNoticeData, FriendAddNoticeData
 from core.communication.request import RequestData, FriendRequestData, JoinGroupRequestData, InviteGroupRequestData
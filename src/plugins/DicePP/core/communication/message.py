@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Optional
 
 class MessageSender:
     def __init__(self, user_id: str, nickname: str):
@@ -28,7 +28,20 @@ class MessageMetaData:
         self.nickname: str = sender.nickname
         self.group_id: str = group_id
         self.to_me: bool = to_me
-        self.permission: int = 0
+        self.__permission: Optional[int] = None
         # 新增字段：消息唯一 ID（OneBot v11 为 int，统一转为 str 存）
         self.message_id: Optional[str] = None
+        # 消息上下文(core.bot.context.MessageContext), 由Bot.process_message创建
+        self.context: Any = None
+
+    @property
+    def permission(self) -> int:
+        """4:骰主 3:骰管理 2:群主 1:群管理 0:普通人 -1:黑名单; 没有设置过时从消息上下文中读取"""
+        if self.__permission is None:
+            return self.context.permission if self.context is not None else 0
+        return self.__permission
+
+    @permission.setter
+    def permission(self, value: int) -> None:
+        self.__permission = value
 
@@ -1,15 +1,72 @@
 import html
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
-from zhconv import convert
 from utils.string import to_english_str
 
+PREPROCESS_CACHE_LEN = 32  # 不超过该长度的消息会缓存预处理结果, 一般是重复出现的短指令
+PREPROCESS_CACHE_SIZE = 4096
+
+# 简体转换的触发条件, 第一次转换时才导入zhconv并生成, 启动后会在后台线程中提前生成
+# 第一项为所有可能触发转换的字, 第二项为会被转换的单字(繁体字), 第三项为不包含这些单字但仍会被转换的词语, 以首字为键
+_zh_trigger: Optional[Tuple[FrozenSet[str], FrozenSet[str], Dict[str, List[str]]]] = None
+
+
+def get_zh_trigger() -> Tuple[FrozenSet[str], FrozenSet[str], Dict[str, List[str]]]:
+    global _zh_trigger
+    if _zh_trigger is None:
+        from zhconv.zhconv import getdict
+        zh_dict: Dict[str, str] = getdict('zh-cn')
+        char_set = frozenset(word for word, target in zh_dict.items() if len(word) == 1 and word != target)
+        phrase_dict: Dict[str, List[str]] = defaultdict(list)
+        for word, target in zh_dict.items():
+            if word != target and char_set.isdisjoint(word):
+                phrase_dict[word[0]].append(word)
+        _zh_trigger = (char_set | frozenset(phrase_dict.keys()), char_set, dict(phrase_dict))
+    return _zh_trigger
+
+
+def warm_up_preprocess() -> None:
+    """提前导入zhconv并生成简体转换的触发条件, 在后台线程中调用"""
+    get_zh_trigger()
+
+
+def need_zh_convert(msg_str: str) -> bool:
+    """
+    判断zhconv是否会改变这个字符串: 只有字典中某个会被转换的词出现在字符串中时才需要转换
+    """
+    trigger_set, char_set, phrase_dict = get_zh_trigger()
+    if trigger_set.isdisjoint(msg_str):
+        return False
+    if not char_set.isdisjoint(msg_str):
+        return True
+    for first_char in trigger_set.intersection(msg_str):
+        if any(phrase in msg_str for phrase in phrase_dict[first_char]):
+            return True
+    return False
+
 
 def preprocess_msg(msg_str: str) -> str:
     """
     预处理消息字符串
     """
-    msg_str = to_english_str(msg_str)  # 转换中文标点
+    if len(msg_str) <= PREPROCESS_CACHE_LEN:
+        return preprocess_msg_cached(msg_str)
+    return preprocess_msg_raw(msg_str)
+
+
+@lru_cache(maxsize=PREPROCESS_CACHE_SIZE)
+def preprocess_msg_cached(msg_str: str) -> str:
+    return preprocess_msg_raw(msg_str)
+
+
+def preprocess_msg_raw(msg_str: str) -> str:
+    if not msg_str.isascii():
+        msg_str = to_english_str(msg_str)  # 转换中文标点
     msg_str = msg_str.lower().strip()  # 转换小写, 去掉前后空格
     msg_str = html.unescape(msg_str)   # html实体转义: &#36; -> $
-    msg_str = convert(msg_str, 'zh-cn')# 转换简体处理
+    if need_zh_convert(msg_str):
+        from zhconv import convert
+        msg_str = convert(msg_str, 'zh-cn')  # 转换简体处理
     return msg_str
@@ -1,26 +1,33 @@
 from typing import Dict, List
 
 from core.config.declare import BOT_AGREEMENT
+from core.config.config_item import CONFIG_TYPE_STR, CONFIG_TYPE_INT, CONFIG_TYPE_FLOAT, CONFIG_TYPE_BOOL, \
+    CONFIG_TYPE_LIST, CONFIG_TYPE_ID_SET, CONFIG_TYPE_ID_SET_SPLIT
 
 DEFAULT_CONFIG: Dict[str, str] = {}
 DEFAULT_CONFIG_COMMENT: Dict[str, str] = {}
+DEFAULT_CONFIG_TYPE: Dict[str, str] = {}  # 没有声明类型的配置为CONFIG_TYPE_STR
 
 # 默认配置
 CFG_MASTER = "master"
 DEFAULT_CONFIG[CFG_MASTER] = ""
 DEFAULT_CONFIG_COMMENT[CFG_MASTER] = "Master账号, 权限最高, 可以有多个Master"
+DEFAULT_CONFIG_TYPE[CFG_MASTER] = CONFIG_TYPE_ID_SET
 
 CFG_ADMIN = "admin"
 DEFAULT_CONFIG[CFG_ADMIN] = ""
 DEFAULT_CONFIG_COMMENT[CFG_ADMIN] = "管理员账号, 拥有次高权限, 可以有多个管理员"
+DEFAULT_CONFIG_TYPE[CFG_ADMIN] = CONFIG_TYPE_ID_SET
 
 CFG_FRIEND_TOKEN = "friend_token"
 DEFAULT_CONFIG[CFG_FRIEND_TOKEN] = ""
 DEFAULT_CONFIG_COMMENT[CFG_FRIEND_TOKEN] = "用户申请好友时在验证中输入参数中的文本之一骰娘才会通过, 若字符串为空则通过所有的好友验证"
+DEFAULT_CONFIG_TYPE[CFG_FRIEND_TOKEN] = CONFIG_TYPE_LIST
 
 CFG_GROUP_INVITE = "group_invite"
 DEFAULT_CONFIG[CFG_GROUP_INVITE] = "1"
 DEFAULT_CONFIG_COMMENT[CFG_GROUP_INVITE] = "好友邀请加群时是否同意, 0为总是拒绝, 1为总是同意"
+DEFAULT_CONFIG_TYPE[CFG_GROUP_INVITE] = CONFIG_TYPE_INT
 
 CFG_AGREEMENT = "agreement"
 DEFAULT_CONFIG[CFG_AGREEMENT] = BOT_AGREEMENT
@@ -33,27 +40,89 @@ DEFAULT_CONFIG_COMMENT[CFG_COMMAND_SPLIT] = "分割多条指令的关键字, 默
 CFG_DATA_EXPIRE = "data_expire"
 DEFAULT_CONFIG[CFG_DATA_EXPIRE] = "0"
 DEFAULT_CONFIG_COMMENT[CFG_DATA_EXPIRE] = "是否定期清除过期数据与退出群聊, 0为不清理, 1为清理"
+DEFAULT_CONFIG_TYPE[CFG_DATA_EXPIRE] = CONFIG_TYPE_BOOL
 
 CFG_USER_EXPIRE_DAY = "user_expire_day"
 DEFAULT_CONFIG[CFG_USER_EXPIRE_DAY] = "60"
 DEFAULT_CONFIG_COMMENT[CFG_USER_EXPIRE_DAY] = "用户在多少天内没有使用过指令则清除相关数据"
+DEFAULT_CONFIG_TYPE[CFG_USER_EXPIRE_DAY] = CONFIG_TYPE_INT
 
 CFG_GROUP_EXPIRE_DAY = "group_expire_day"
 DEFAULT_CONFIG[CFG_GROUP_EXPIRE_DAY] = "14"
 DEFAULT_CONFIG_COMMENT[CFG_GROUP_EXPIRE_DAY] = "群聊在多少天内没有使用过指令则清除相关数据并退群"
+DEFAULT_CONFIG_TYPE[CFG_GROUP_EXPIRE_DAY] = CONFIG_TYPE_INT
 
 CFG_GROUP_EXPIRE_WARNING = "group_expire_warning_time"
 DEFAULT_CONFIG[CFG_GROUP_EXPIRE_WARNING] = "1"
 DEFAULT_CONFIG_COMMENT[CFG_GROUP_EXPIRE_WARNING] = f"清除相关数据并退群之前进行几次警告, 如{CFG_GROUP_EXPIRE_DAY}为14, {CFG_GROUP_EXPIRE_WARNING}为2, " \
                                                    f"则14天内群内没有人使用指令就会在第15天提示1次, 第16天提示1次然后退群. (提示词在localization中配置)"
+DEFAULT_CONFIG_TYPE[CFG_GROUP_EXPIRE_WARNING] = CONFIG_TYPE_INT
 
 CFG_WHITE_LIST_GROUP = "white_list_group"
 DEFAULT_CONFIG[CFG_WHITE_LIST_GROUP] = ""
 DEFAULT_CONFIG_COMMENT[CFG_WHITE_LIST_GROUP] = f"可填多个单元格, 或用;在同一个单元格分隔不同的群号, 列表中的群不会被自动清除信息或退群"
+DEFAULT_CONFIG_TYPE[CFG_WHITE_LIST_GROUP] = CONFIG_TYPE_ID_SET_SPLIT
 
 CFG_WHITE_LIST_USER = "white_list_user"
 DEFAULT_CONFIG[CFG_WHITE_LIST_USER] = ""
 DEFAULT_CONFIG_COMMENT[CFG_WHITE_LIST_USER] = f"可填多个单元格, 或用;在同一个单元格分隔不同的账号, 列表中的账号不会被自动清除信息"
+DEFAULT_CONFIG_TYPE[CFG_WHITE_LIST_USER] = CONFIG_TYPE_ID_SET_SPLIT
+
+CFG_DATA_RESIDENT_ENTRY = "data_resident_entry"
+DEFAULT_CONFIG[CFG_DATA_RESIDENT_ENTRY] = "5000"
+DEFAULT_CONFIG_COMMENT[CFG_DATA_RESIDENT_ENTRY] = "用户/群聊数据最多在内存中驻留多少条, 超出后最久未使用的数据会在写回硬盘后移出内存, 0为不限制"
+DEFAULT_CONFIG_TYPE[CFG_DATA_RESIDENT_ENTRY] = CONFIG_TYPE_INT
+
+CFG_DATA_RESIDENT_SIZE = "data_resident_size"
+DEFAULT_CONFIG[CFG_DATA_RESIDENT_SIZE] = "0"
+DEFAULT_CONFIG_COMMENT[CFG_DATA_RESIDENT_SIZE] = "用户/群聊数据在内存中驻留的估计大小上限, 单位为KB, 0为不限制"
+DEFAULT_CONFIG_TYPE[CFG_DATA_RESIDENT_SIZE] = CONFIG_TYPE_INT
+
+CFG_STAT_HISTORY_KEEP_DAY = "stat_history_keep_day"
+DEFAULT_CONFIG[CFG_STAT_HISTORY_KEEP_DAY] = "365"
+DEFAULT_CONFIG_COMMENT[CFG_STAT_HISTORY_KEEP_DAY] = "统计历史保留多少天, 0为永久保留"
+DEFAULT_CONFIG_TYPE[CFG_STAT_HISTORY_KEEP_DAY] = CONFIG_TYPE_INT
+
+CFG_STAT_HISTORY_DOWNSAMPLE_DAY = "stat_history_downsample_day"
+DEFAULT_CONFIG[CFG_STAT_HISTORY_DOWNSAMPLE_DAY] = "60"
+DEFAULT_CONFIG_COMMENT[CFG_STAT_HISTORY_DOWNSAMPLE_DAY] = "超过多少天的统计历史会从按天记录合并为按周记录, 0为不合并"
+DEFAULT_CONFIG_TYPE[CFG_STAT_HISTORY_DOWNSAMPLE_DAY] = CONFIG_TYPE_INT
+
+CFG_SEND_RATE_GLOBAL = "send_rate_global"
+DEFAULT_CONFIG[CFG_SEND_RATE_GLOBAL] = "60"
+DEFAULT_CONFIG_COMMENT[CFG_SEND_RATE_GLOBAL] = "所有消息合计每分钟最多发送多少条, 超出后会排队等待, 0为不限制"
+DEFAULT_CONFIG_TYPE[CFG_SEND_RATE_GLOBAL] = CONFIG_TYPE_FLOAT
+
+CFG_SEND_BURST_GLOBAL = "send_burst_global"
+DEFAULT_CONFIG[CFG_SEND_BURST_GLOBAL] = "20"
+DEFAULT_CONFIG_COMMENT[CFG_SEND_BURST_GLOBAL] = "所有消息合计最多可以连续发送多少条而不等待"
+DEFAULT_CONFIG_TYPE[CFG_SEND_BURST_GLOBAL] = CONFIG_TYPE_INT
+
+CFG_SEND_RATE_GROUP = "send_rate_group"
+DEFAULT_CONFIG[CFG_SEND_RATE_GROUP] = "20"
+DEFAULT_CONFIG_COMMENT[CFG_SEND_RATE_GROUP] = "每个群聊每分钟最多发送多少条消息, 超出后会排队等待, 排队中的消息会尽量合并为一条, 0为不限制"
+DEFAULT_CONFIG_TYPE[CFG_SEND_RATE_GROUP] = CONFIG_TYPE_FLOAT
+
+CFG_SEND_BURST_GROUP = "send_burst_group"
+DEFAULT_CONFIG[CFG_SEND_BURST_GROUP] = "8"
+DEFAULT_CONFIG_COMMENT[CFG_SEND_BURST_GROUP] = "每个群聊最多可以连续发送多少条消息而不等待"
+DEFAULT_CONFIG_TYPE[CFG_SEND_BURST_GROUP] = CONFIG_TYPE_INT
+
+CFG_IMAGE_FILE_URL = "image_file_url"
+DEFAULT_CONFIG[CFG_IMAGE_FILE_URL] = "0"
+DEFAULT_CONFIG_COMMENT[CFG_IMAGE_FILE_URL] = "发送本地图片时是否只发送文件路径, 0为发送编码后的图片, 1为发送file://路径(仅当OneBot客户端与骰娘在同一台机器上时可用)"
+DEFAULT_CONFIG_TYPE[CFG_IMAGE_FILE_URL] = CONFIG_TYPE_BOOL
+
+CFG_METRICS_ENABLE = "metrics_enable"
+DEFAULT_CONFIG[CFG_METRICS_ENABLE] = "0"
+DEFAULT_CONFIG_COMMENT[CFG_METRICS_ENABLE] = "是否记录运行指标(各阶段耗时, 数据读写次数等), 0为不记录, 1为记录. 记录后可通过.m metrics或/dpp/metrics查看"
+DEFAULT_CONFIG_TYPE[CFG_METRICS_ENABLE] = CONFIG_TYPE_BOOL
+
+CFG_LOG_LEVEL = "log_level"
+DEFAULT_CONFIG[CFG_LOG_LEVEL] = "INFO"
+DEFAULT_CONFIG_COMMENT[CFG_LOG_LEVEL] = "日志级别, 可选DEBUG/INFO/WARNING/ERROR. 可以用\"模块=级别\"单独设置某个模块, 如adapter=WARNING, core.bot=DEBUG, " \
+                                        "可填多个单元格, 或用;在同一个单元格分隔不同的设置"
+DEFAULT_CONFIG_TYPE[CFG_LOG_LEVEL] = CONFIG_TYPE_LIST
 
 
 def preprocess_white_list(raw_list: List[str]) -> List[str]:
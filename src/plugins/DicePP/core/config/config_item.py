@@ -1,5 +1,5 @@
 import copy
-from typing import List
+from typing import Any, Callable, Dict, List, Tuple
 
 
 class ConfigItem:
@@ -19,3 +19,24 @@ class ConfigItem:
         返回一个可选择的本地化字符串, 若没有可用的本地化字符串, 返回空字符串
         """
         return copy.copy(self.contents)
+
+
+# 配置的类型, 读取配置文件时按类型解析一次, 之后通过ConfigManager.get_value直接取得解析后的结果
+CONFIG_TYPE_STR = "str"  # 第一个参数, 没有参数时为空字符串
+CONFIG_TYPE_INT = "int"  # 第一个参数转为int
+CONFIG_TYPE_FLOAT = "float"  # 第一个参数转为float
+CONFIG_TYPE_BOOL = "bool"  # 第一个参数转为int后是否不为0
+CONFIG_TYPE_LIST = "list"  # 所有参数组成的tuple
+CONFIG_TYPE_ID_SET = "id_set"  # 所有参数组成的frozenset, 用来判断账号或群号是否在列表中
+CONFIG_TYPE_ID_SET_SPLIT = "id_set_split"  # 与id_set相同, 但同一个参数中可以用;分隔多个账号或群号
+
+CONFIG_PARSERS: Dict[str, Callable[[Tuple[str, ...]], Any]] = {
+    CONFIG_TYPE_STR: lambda contents: contents[0] if contents else "",
+    CONFIG_TYPE_INT: lambda contents: int(contents[0]),
+    CONFIG_TYPE_FLOAT: lambda contents: float(contents[0]),
+    CONFIG_TYPE_BOOL: lambda contents: int(contents[0]) != 0,
+    CONFIG_TYPE_LIST: lambda contents: contents,
+    CONFIG_TYPE_ID_SET: lambda contents: frozenset(contents),
+    CONFIG_TYPE_ID_SET_SPLIT: lambda contents: frozenset(item.strip() for text in contents for item in text.split(";")
+                                                         if item.strip()),
+}
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 import openpyxl
 from openpyxl.comments import Comment
@@ -7,22 +7,53 @@ from openpyxl.comments import Comment
 from utils.logger import dice_log
 from utils.localdata import read_xlsx
 
-from core.config.config_item import ConfigItem
+from core.config.config_item import ConfigItem, CONFIG_TYPE_STR, CONFIG_PARSERS
 from core.config.basic import DATA_PATH
-from core.config.common import DEFAULT_CONFIG, DEFAULT_CONFIG_COMMENT
+from core.config.common import DEFAULT_CONFIG, DEFAULT_CONFIG_COMMENT, DEFAULT_CONFIG_TYPE
+from core.config.snapshot import ConfigSnapshot
 
 CONFIG_FILE_PATH = "config.xlsx"
 
 
+class ConfigItemDict(dict):
+    """所有配置, 直接替换其中的配置时通知ConfigManager重新生成快照"""
+    def __init__(self, on_change: Callable[[], None], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_change = on_change
+
+    def __setitem__(self, key: str, value: ConfigItem) -> None:
+        super().__setitem__(key, value)
+        self.on_change()
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self.on_change()
+
+
 class ConfigManager:
     def __init__(self, data_path: str, identifier: str):
         self.data_path = os.path.join(data_path, CONFIG_FILE_PATH)
         self.identifier = identifier
-        self.all_configs: Dict[str, ConfigItem] = {}
+        self.all_configs: Dict[str, ConfigItem] = ConfigItemDict(self.mark_dirty)
+        self.value_types: Dict[str, str] = {}  # 配置关键字 -> 配置的类型
+        self.defaults: Dict[str, str] = {}  # 配置关键字 -> 注册时的默认值
+        self.__snapshot: Optional[ConfigSnapshot] = None
 
         # 默认配置
         for key in DEFAULT_CONFIG.keys():
-            self.register_config(key, DEFAULT_CONFIG[key], DEFAULT_CONFIG_COMMENT[key])
+            self.register_config(key, DEFAULT_CONFIG[key], DEFAULT_CONFIG_COMMENT[key], DEFAULT_CONFIG_TYPE.get(key, CONFIG_TYPE_STR))
+
+    def mark_dirty(self) -> None:
+        """配置被修改, 下次读取时重新生成快照"""
+        self.__snapshot = None
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """当前配置的只读快照, 取得后可以一直使用, 重新读取配置文件不会影响已经取得的快照"""
+        snapshot = self.__snapshot
+        if snapshot is None:
+            snapshot = self.__snapshot = ConfigSnapshot(self.all_configs, self.value_types, self.defaults)
+        return snapshot
 
     def load_config(self):
         """用文档里的配置覆写之前的配置"""
@@ -37,15 +68,20 @@ class ConfigManager:
         else:
             dice_log(f"[BotConfig] [Load] 无法读取配置文件 {self.data_path.replace(DATA_PATH, '~')} {self.identifier}")
             return
+        # 先在副本中读取所有配置, 再整体替换配置与快照, 读取过程中其他调用方看到的一直是旧配置
+        new_configs = ConfigItemDict(self.mark_dirty, self.all_configs)
         for row in sheet.iter_rows():
             key = str(row[0].value)  # 第一个元素为关键字
-            if key not in self.all_configs:
+            if key not in new_configs:
                 continue
-            comment: str = self.all_configs[key].comment  # 沿用原来的注释, 不用文件里的
-            self.all_configs[key] = ConfigItem(key, comment=comment)
+            comment: str = new_configs[key].comment  # 沿用原来的注释, 不用文件里的
+            item = ConfigItem(key, comment=comment)
             for text in [str(cell.value) for cell in row[1:] if (cell.value is not None)]:
-                self.all_configs[key].add(text)
+                item.add(text)
+            dict.__setitem__(new_configs, key, item)
         workbook.close()
+        new_snapshot = ConfigSnapshot(new_configs, self.value_types, self.defaults)
+        self.all_configs, self.__snapshot = new_configs, new_snapshot
         dice_log(f"[BotConfig] [Load] 成功读取配置文件 {self.data_path.replace(DATA_PATH, '~')}")
 
     def save_config(self):
@@ -82,20 +118,32 @@ class ConfigManager:
 
         dice_log(f"[BotConfig] [Save] 成功更新配置文件 {self.data_path.replace(DATA_PATH, '~')}")
 
-    def register_config(self, key: str, origin_str: str, comment: str = ""):
+    def register_config(self, key: str, origin_str: str, comment: str = "", value_type: str = CONFIG_TYPE_STR):
         """
         将一个配置注册至Helper中
         Args:
             key: 配置关键字
             origin_str: 配置的默认值
             comment: 注释
+            value_type: 配置的类型, 见CONFIG_TYPE_*, 决定get_value返回的结果
         """
+        assert value_type in CONFIG_PARSERS, f"未知的配置类型 {value_type}"
+        self.value_types[key] = value_type
+        self.defaults[key] = origin_str
         self.all_configs[key] = ConfigItem(key, origin_str, comment)
 
     def get_config(self, key: str) -> List[str]:
         """
-        获取本地化语句
+        获取配置的所有参数, 返回的是拷贝
         Args:
-            key: 本地化语句的关键字
+            key: 配置关键字
+        """
+        return list(self.snapshot.raw[key])
+
+    def get_value(self, key: str) -> Any:
+        """
+        获取按类型解析后的配置, 不会产生拷贝, 无效的配置会使用默认值
+        Args:
+            key: 配置关键字
         """
-        return self.all_configs[key].get()
+        return self.snapshot.values[key]
@@ -0,0 +1,58 @@
+"""
+配置快照, 读取配置文件后按声明的类型解析一次, 之后只读
+重新读取配置时生成新的快照整体替换, 正在使用旧快照的调用方不受影响
+"""
+
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Tuple
+
+from utils.logger import dice_log
+
+from core.config.config_item import ConfigItem, CONFIG_PARSERS, CONFIG_TYPE_STR
+from core.config.common import CFG_MASTER, CFG_ADMIN, CFG_COMMAND_SPLIT
+
+
+class ConfigSnapshot:
+    """
+    raw: 配置关键字 -> 原始参数
+    values: 配置关键字 -> 按类型解析后的值, 解析失败时使用默认值解析的结果, 默认值也无法解析时为None
+    master, admin, command_split: 每条消息都会用到的配置, 可以直接通过属性访问
+    """
+    __slots__ = ("raw", "values", "master", "admin", "command_split")
+    raw: Mapping[str, Tuple[str, ...]]
+    values: Mapping[str, Any]
+    master: FrozenSet[str]
+    admin: FrozenSet[str]
+    command_split: str
+
+    def __init__(self, items: Mapping[str, ConfigItem], value_types: Mapping[str, str], defaults: Mapping[str, str]):
+        """
+        Args:
+            items: 配置关键字 -> 当前的配置
+            value_types: 配置关键字 -> 配置的类型, 没有声明的为CONFIG_TYPE_STR
+            defaults: 配置关键字 -> 注册时的默认值
+        """
+        raw: Dict[str, Tuple[str, ...]] = {}
+        values: Dict[str, Any] = {}
+        for key, item in items.items():
+            contents = tuple(item.contents)
+            parser = CONFIG_PARSERS[value_types.get(key, CONFIG_TYPE_STR)]
+            raw[key] = contents
+            try:
+                values[key] = parser(contents)
+            except (ValueError, IndexError):
+                default_str = defaults.get(key, "")
+                dice_log(f"[BotConfig] [Parse] 配置 {key} 的值 {list(contents)} 无效, 使用默认值 {default_str}")
+                try:
+                    values[key] = parser((default_str,) if default_str else ())
+                except (ValueError, IndexError):
+                    values[key] = None
+        set_attr = super().__setattr__
+        set_attr("raw", MappingProxyType(raw))
+        set_attr("values", MappingProxyType(values))
+        set_attr("master", frozenset(raw.get(CFG_MASTER, ())))
+        set_attr("admin", frozenset(raw.get(CFG_ADMIN, ())))
+        set_attr("command_split", values.get(CFG_COMMAND_SPLIT, ""))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ConfigSnapshot is read-only")
@@ -0,0 +1,129 @@
+import unittest
+import os
+import shutil
+
+import openpyxl
+
+from core.config.config_item import ConfigItem, CONFIG_TYPE_STR, CONFIG_TYPE_INT, CONFIG_TYPE_FLOAT, CONFIG_TYPE_BOOL, \
+    CONFIG_TYPE_LIST, CONFIG_TYPE_ID_SET, CONFIG_TYPE_ID_SET_SPLIT
+from core.config.common import CFG_MASTER, CFG_ADMIN, CFG_COMMAND_SPLIT, CFG_GROUP_INVITE, CFG_DATA_EXPIRE
+from core.config.snapshot import ConfigSnapshot
+from core.config.manager import ConfigManager, CONFIG_FILE_PATH
+
+test_path = os.path.join(os.path.dirname(__file__), 'test_data')
+
+TEST_IDENTIFIER = "TestBot"
+
+
+def make_items(contents_dict: dict) -> dict:
+    items = {}
+    for key, contents in contents_dict.items():
+        items[key] = ConfigItem(key)
+        for text in contents:
+            items[key].add(text)
+    return items
+
+
+class MyTestCase(unittest.TestCase):
+    def tearDown(self) -> None:
+        shutil.rmtree(test_path, ignore_errors=True)
+
+    def test0_parse(self):
+        print("开始测试配置解析")
+        value_types = {"int": CONFIG_TYPE_INT, "float": CONFIG_TYPE_FLOAT, "bool_0": CONFIG_TYPE_BOOL,
+                       "bool_2": CONFIG_TYPE_BOOL, "list": CONFIG_TYPE_LIST, "id_set": CONFIG_TYPE_ID_SET,
+                       "id_set_split": CONFIG_TYPE_ID_SET_SPLIT, "str": CONFIG_TYPE_STR, "str_empty": CONFIG_TYPE_STR}
+        items = make_items({"int": ["-3"], "float": ["0.5"], "bool_0": ["0"], "bool_2": ["2"], "list": ["a", "b", "a"],
+                            "id_set": ["123", "456", "123"], "id_set_split": ["123; 456;", ";", "789"], "str": ["abc", "def"], "str_empty": [], "untyped": ["x"]})
+        snapshot = ConfigSnapshot(items, value_types, {})
+        self.assertEqual(snapshot.values["int"], -3)
+        self.assertEqual(snapshot.values["float"], 0.5)
+        self.assertIs(snapshot.values["bool_0"], False)
+        self.assertIs(snapshot.values["bool_2"], True)
+        self.assertEqual(snapshot.values["list"], ("a", "b", "a"))
+        self.assertEqual(snapshot.values["id_set"], frozenset({"123", "456"}))
+        self.assertTrue("123" in snapshot.values["id_set"])
+        self.assertEqual(snapshot.values["id_set_split"], frozenset({"123", "456", "789"}))  # 用;分隔, 忽略空白
+        self.assertEqual(snapshot.values["str"], "abc")  # 只取第一个参数
+        self.assertEqual(snapshot.values["str_empty"], "")
+        self.assertEqual(snapshot.values["untyped"], "x")  # 没有声明类型的配置为字符串
+        self.assertEqual(snapshot.raw["str"], ("abc", "def"))
+        print("配置解析正确")
+
+    def test1_default(self):
+        print("开始测试无效配置使用默认值")
+        value_types = {"int_invalid": CONFIG_TYPE_INT, "int_empty": CONFIG_TYPE_INT, "float_invalid": CONFIG_TYPE_FLOAT,
+                       "bool_invalid": CONFIG_TYPE_BOOL, "no_default": CONFIG_TYPE_INT, "bad_default": CONFIG_TYPE_INT}
+        defaults = {"int_invalid": "7", "int_empty": "8", "float_invalid": "1.5", "bool_invalid": "1", "no_default": "",
+                    "bad_default": "abc"}
+        items = make_items({"int_invalid": ["abc"], "int_empty": [], "float_invalid": ["1,5"], "bool_invalid": ["是"],
+                            "no_default": ["1.0"], "bad_default": ["def"]})
+        snapshot = ConfigSnapshot(items, value_types, defaults)
+        self.assertEqual(snapshot.values["int_invalid"], 7)
+        self.assertEqual(snapshot.values["int_empty"], 8)  # 空的单元格没有参数
+        self.assertEqual(snapshot.values["float_invalid"], 1.5)
+        self.assertIs(snapshot.values["bool_invalid"], True)
+        self.assertIsNone(snapshot.values["no_default"])  # 默认值也无法解析时为None
+        self.assertIsNone(snapshot.values["bad_default"])
+        self.assertEqual(snapshot.raw["int_invalid"], ("abc",))  # 原始参数保持不变
+        print("无效配置使用默认值正确")
+
+    def test2_read_only(self):
+        print("开始测试快照只读")
+        items = make_items({CFG_MASTER: ["1", "2"], CFG_ADMIN: [], CFG_COMMAND_SPLIT: ["\\\\"]})
+        snapshot = ConfigSnapshot(items, {CFG_MASTER: CONFIG_TYPE_ID_SET, CFG_ADMIN: CONFIG_TYPE_ID_SET}, {})
+        self.assertEqual(snapshot.master, frozenset({"1", "2"}))
+        self.assertEqual(snapshot.admin, frozenset())
+        self.assertEqual(snapshot.command_split, "\\\\")
+        self.assertRaises(AttributeError, setattr, snapshot, "master", frozenset())
+        with self.assertRaises(TypeError):
+            snapshot.values[CFG_MASTER] = frozenset()
+        items[CFG_MASTER].add("3")  # 快照不受之后修改的影响
+        self.assertEqual(snapshot.master, frozenset({"1", "2"}))
+        print("快照只读正确")
+
+    def test3_manager(self):
+        print("开始测试配置管理")
+        os.makedirs(test_path, exist_ok=True)
+        manager = ConfigManager(test_path, TEST_IDENTIFIER)
+        self.assertEqual(manager.get_value(CFG_GROUP_INVITE), 1)
+        self.assertIs(manager.get_value(CFG_DATA_EXPIRE), False)
+        manager.all_configs[CFG_GROUP_INVITE] = ConfigItem(CFG_GROUP_INVITE, "0")  # 直接替换配置后重新生成快照
+        self.assertEqual(manager.get_value(CFG_GROUP_INVITE), 0)
+        self.assertEqual(manager.get_config(CFG_GROUP_INVITE), ["0"])
+        manager.all_configs[CFG_DATA_EXPIRE] = ConfigItem(CFG_DATA_EXPIRE, "1")
+        self.assertIs(manager.get_value(CFG_DATA_EXPIRE), True)
+        manager.save_config()
+
+        # 修改配置文件: 无效的整数, 空的单元格, 多个账号
+        workbook = openpyxl.load_workbook(os.path.join(test_path, CONFIG_FILE_PATH))
+        sheet = workbook[TEST_IDENTIFIER]
+        for row in sheet.iter_rows():
+            key = row[0].value
+            if key == CFG_GROUP_INVITE:
+                row[1].value = "abc"
+            elif key == CFG_DATA_EXPIRE:
+                row[1].value = None
+            elif key == CFG_MASTER:
+                row[1].value = "111"
+                sheet.cell(row=row[0].row, column=3, value="222")
+        workbook.save(os.path.join(test_path, CONFIG_FILE_PATH))
+        workbook.close()
+
+        snapshot_old = manager.snapshot
+        manager.load_config()
+        self.assertEqual(manager.get_config(CFG_GROUP_INVITE), ["abc"])
+        self.assertEqual(manager.get_value(CFG_GROUP_INVITE), 1)  # 注册时的默认值
+        self.assertEqual(manager.get_config(CFG_DATA_EXPIRE), [])
+        self.assertIs(manager.get_value(CFG_DATA_EXPIRE), False)
+        self.assertEqual(manager.snapshot.master, frozenset({"111", "222"}))
+        # 读取前取得的快照保持不变, 读取后整体替换为新的快照
+        self.assertIsNot(manager.snapshot, snapshot_old)
+        self.assertEqual(snapshot_old.values[CFG_GROUP_INVITE], 0)
+        self.assertIs(snapshot_old.values[CFG_DATA_EXPIRE], True)
+        self.assertEqual(snapshot_old.master, frozenset())
+        print("配置管理正确")
+
+
+if __name__ == '__main__':
+    unittest.main()
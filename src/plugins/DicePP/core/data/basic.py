@@ -27,19 +27,19 @@ class _(DataChunkBase):
         self.version = 1
 
 
-@custom_data_chunk(identifier=DC_MACRO, include_json_object=True)
+@custom_data_chunk(identifier=DC_MACRO, include_json_object=True, lazy_load=True)
 class _(DataChunkBase):
     def __init__(self):
         super().__init__()
 
 
-@custom_data_chunk(identifier=DC_VARIABLE, include_json_object=True)
+@custom_data_chunk(identifier=DC_VARIABLE, include_json_object=True, lazy_load=True)
 class _(DataChunkBase):
     def __init__(self):
         super().__init__()
 
 
-@custom_data_chunk(identifier=DC_USER_DATA, include_json_object=True)
+@custom_data_chunk(identifier=DC_USER_DATA, include_json_object=True, lazy_load=True)
 class _(DataChunkBase):
     def __init__(self):
         super().__init__()
@@ -51,7 +51,7 @@ class _(DataChunkBase):
         self.version = 1
 
 
-@custom_data_chunk(identifier=DC_GROUP_DATA, include_json_object=True)
+@custom_data_chunk(identifier=DC_GROUP_DATA, include_json_object=True, lazy_load=True)
 class _(DataChunkBase):
     def __init__(self):
         super().__init__()
@@ -63,7 +63,7 @@ class _(DataChunkBase):
         self.version = 1
 
 
-@custom_data_chunk(identifier=DC_NICKNAME)
+@custom_data_chunk(identifier=DC_NICKNAME, lazy_load=True)
 class _(DataChunkBase):
     def __init__(self):
         super().__init__()
@@ -58,6 +58,112 @@ def _update_hasher(hasher: "hashlib._Hash", value: Any) -> None:
     hasher.update(b"S")
     hasher.update(str(value).encode("utf-8", "surrogatepass"))
 
+
+# noinspection PyBroadException
+def deserialize_json_object_in_node(node: Any) -> None:
+    """
+    递归地将节点中的 JsonObject 字符串或可推断的 dict 转换为 JsonObject 实例。
+    - 处理字符串形式的 JsonObject（以 JSON_OBJECT_PREFIX 开头）
+    - 处理字符串形式的裸 JSON（如 '{...}'），尝试 json.loads 后再推断
+    - 处理已经是 dict 的旧格式，使用 construct_from_dict 做启发式匹配
+    """
+    if isinstance(node, dict):
+        invalid_key = []
+        for key, value in list(node.items()):
+            # Recurse into nested containers first
+            if isinstance(value, (dict, list)):
+                deserialize_json_object_in_node(value)
+                continue
+
+            # Case A: explicit JsonObject encoded with prefix
+            if isinstance(value, str) and value.find(JSON_OBJECT_PREFIX) == 0:
+                try:
+                    node[key] = JsonObject.construct_from_json(value)
+                    continue
+                except Exception as e:
+                    dice_log(f"[DataManager] [Load] 从字典中加载{key}: {value}时出现错误 {e}")
+                    invalid_key.append(key)
+                    continue
+
+            # Case B: string that looks like JSON (old formats)
+            if isinstance(value, str) and value and value[0] in ('{', '['):
+                try:
+                    parsed = json.loads(value)
+                except Exception:
+                    parsed = None
+                if isinstance(parsed, dict):
+                    # try to construct JsonObject from dict
+                    try:
+                        obj = JsonObject.construct_from_dict(parsed)
+                        if obj is not None:
+                            node[key] = obj
+                            continue
+                        else:
+                            # if not a JsonObject, keep parsed dict
+                            node[key] = parsed
+                            continue
+                    except Exception as e:
+                        dice_log(f"[DataManager] [Load] 解析字符串JSON为对象时出错 {e}")
+
+            # Case C: dict in place of JsonObject (older dumps)
+            if isinstance(value, dict):
+                try:
+                    obj = JsonObject.construct_from_dict(value)
+                    if obj is not None:
+                        node[key] = obj
+                        continue
+                except Exception as e:
+                    dice_log(f"[DataManager] [Load] 从字典构造 JsonObject 时出错 {e}")
+
+        for key in invalid_key:
+            del node[key]
+
+    elif isinstance(node, list):
+        invalid_index = []
+        for index, value in enumerate(list(node)):
+            if isinstance(value, (dict, list)):
+                deserialize_json_object_in_node(value)
+                continue
+
+            if isinstance(value, str) and value.find(JSON_OBJECT_PREFIX) == 0:
+                try:
+                    node[index] = JsonObject.construct_from_json(value)
+                    continue
+                except Exception as e:
+                    dice_log(f"[DataManager] [Load] 从列表中加载{index}: {value}时出现错误 {e}")
+                    invalid_index.append(index)
+                    continue
+
+            if isinstance(value, str) and value and value[0] in ('{', '['):
+                try:
+                    parsed = json.loads(value)
+                except Exception:
+                    parsed = None
+                if isinstance(parsed, dict):
+                    try:
+                        obj = JsonObject.construct_from_dict(parsed)
+                        if obj is not None:
+                            node[index] = obj
+                            continue
+                        else:
+                            node[index] = parsed
+                            continue
+                    except Exception as e:
+                        dice_log(f"[DataManager] [Load] 解析列表中字符串JSON为对象时出错 {e}")
+
+            if isinstance(value, dict):
+                try:
+                    obj = JsonObject.construct_from_dict(value)
+                    if obj is not None:
+                        node[index] = obj
+                        continue
+                except Exception as e:
+                    dice_log(f"[DataManager] [Load] 从列表中构造 JsonObject 时出错 {e}")
+
+        for index in reversed(invalid_index):
+            del node[index]
+
+
 DC_VERSION_LATEST = "1.0"  # 格式版本
 
 
@@ -70,6 +176,7 @@ class DataChunkBase(metaclass=abc.ABCMeta):
     """
     identifier = "basic_data"
     include_json_object = False
+    lazy_load = False
 
     def __init__(self):
         self.version_base: str = DC_VERSION_LATEST  # 如果修改了相关的代码, 可以通过版本号来将旧版本的数据转换到新版本
@@ -95,111 +202,6 @@ class DataChunkBase(metaclass=abc.ABCMeta):
         Returns:
             obj: 生成的实例
         """
-
-        # noinspection PyBroadException
-        def deserialize_json_object_in_node(node: Any) -> None:
-            """
-            递归地将节点中的 JsonObject 字符串或可推断的 dict 转换为 JsonObject 实例。
-            - 处理字符串形式的 JsonObject（以 JSON_OBJECT_PREFIX 开头）
-            - 处理字符串形式的裸 JSON（如 '{...}'），尝试 json.loads 后再推断
-            - 处理已经是 dict 的旧格式，使用 construct_from_dict 做启发式匹配
-            """
-            if isinstance(node, dict):
-                invalid_key = []
-                for key, value in list(node.items()):
-                    # Recurse into nested containers first
-                    if isinstance(value, (dict, list)):
-                        deserialize_json_object_in_node(value)
-                        continue
-
-                    # Case A: explicit JsonObject encoded with prefix
-                    if isinstance(value, str) and value.find(JSON_OBJECT_PREFIX) == 0:
-                        try:
-                            node[key] = JsonObject.construct_from_json(value)
-                            continue
-                        except Exception as e:
-                            dice_log(f"[DataManager] [Load] 从字典中加载{key}: {value}时出现错误 {e}")
-                            invalid_key.append(key)
-                            continue
-
-                    # Case B: string that looks like JSON (old formats)
-                    if isinstance(value, str) and value and value[0] in ('{', '['):
-                        try:
-                            parsed = json.loads(value)
-                        except Exception:
-                            parsed = None
-                        if isinstance(parsed, dict):
-                            # try to construct JsonObject from dict
-                            try:
-                                obj = JsonObject.construct_from_dict(parsed)
-                                if obj is not None:
-                                    node[key] = obj
-                                    continue
-                                else:
-                                    # if not a JsonObject, keep parsed dict
-                                    node[key] = parsed
-                                    continue
-                            except Exception as e:
-                                dice_log(f"[DataManager] [Load] 解析字符串JSON为对象时出错 {e}")
-
-                    # Case C: dict in place of JsonObject (older dumps)
-                    if isinstance(value, dict):
-                        try:
-                            obj = JsonObject.construct_from_dict(value)
-                            if obj is not None:
-                                node[key] = obj
-                                continue
-                        except Exception as e:
-                            dice_log(f"[DataManager] [Load] 从字典构造 JsonObject 时出错 {e}")
-
-                for key in invalid_key:
-                    del node[key]
-
-            elif isinstance(node, list):
-                invalid_index = []
-                for index, value in enumerate(list(node)):
-                    if isinstance(value, (dict, list)):
-                        deserialize_json_object_in_node(value)
-                        continue
-
-                    if isinstance(value, str) and value.find(JSON_OBJECT_PREFIX) == 0:
-                        try:
-                            node[index] = JsonObject.construct_from_json(value)
-                            continue
-                        except Exception as e:
-                            dice_log(f"[DataManager] [Load] 从列表中加载{index}: {value}时出现错误 {e}")
-                            invalid_index.append(index)
-                            continue
-
-                    if isinstance(value, str) and value and value[0] in ('{', '['):
-                        try:
-                            parsed = json.loads(value)
-                        except Exception:
-                            parsed = None
-                        if isinstance(parsed, dict):
-                            try:
-                                obj = JsonObject.construct_from_dict(parsed)
-                                if obj is not None:
-                                    node[index] = obj
-                                    continue
-                                else:
-                                    node[index] = parsed
-                                    continue
-                            except Exception as e:
-                                dice_log(f"[DataManager] [Load] 解析列表中字符串JSON为对象时出错 {e}")
-
-                    if isinstance(value, dict):
-                        try:
-                            obj = JsonObject.construct_from_dict(value)
-                            if obj is not None:
-                                node[index] = obj
-                                continue
-                        except Exception as e:
-                            dice_log(f"[DataManager] [Load] 从列表中构造 JsonObject 时出错 {e}")
-
-                for index in reversed(invalid_index):
-                    del node[index]
-
         obj = cls()
         for k, v in json_dict.items():
             obj.__setattr__(k, v)
@@ -256,12 +258,15 @@ DATA_CHUNK_TYPES: List[Type[DataChunkBase]] = []  # 记录所有DataChunk的子
 
 
 def custom_data_chunk(identifier: str,
-                      include_json_object=False):
+                      include_json_object=False,
+                      lazy_load=False):
     """
     类修饰器, 将自定义DataChunk注册到列表中
     Args:
         identifier: 一个字符串, 作为储存该DataChunk实例的名字, 应当是一个有区分度的名字, 不能含有空格, 也不能含有文件名中的非法字符
         include_json_object: 是否会含有Json Object类型, 如果为否, 在序列化时不会进行检查
+        lazy_load: 是否按需载入, 为真时root下的每个一级节点(如每个用户/群聊)单独保存为一个文件, 只在被访问时读入内存,
+            长时间不访问的节点会在写回硬盘后被移出内存. 适用于以用户或群号为一级索引的数据
     """
 
     def custom_inner(cls):
@@ -278,6 +283,7 @@ def custom_data_chunk(identifier: str,
             assert dc.identifier != identifier
         cls.identifier = identifier
         cls.include_json_object = include_json_object
+        cls.lazy_load = lazy_load
         cls.__name__ = "DataChunkClass" + identifier
         DATA_CHUNK_TYPES.append(cls)
         return cls
@@ -5,16 +5,52 @@
 
 import os
 import copy
+import json
 import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from json import JSONDecodeError
 from typing import Tuple, List, Dict, Any, Optional, Callable
+from urllib.parse import quote, unquote
 
 from utils.logger import dice_log
-from utils.localdata import update_json_async, read_json
+from utils.localdata import read_json
+from utils.metrics import METRICS, METRIC_DATA_GET_TOTAL, METRIC_DATA_SET_TOTAL, METRIC_DATA_SAVE, METRIC_DATA_SAVE_BYTES
 
 from core.config import DATA_PATH as ROOT_DATA_PATH
 
-from core.data.data_chunk import DATA_CHUNK_TYPES, DataChunkBase
+from core.data.data_chunk import DATA_CHUNK_TYPES, DataChunkBase, deserialize_json_object_in_node
+from core.data.json_object import JsonObject
+from core.data.residency import LazyChunkState, ResidencyCache
+
+
+def _serialize_json_object(obj: Any) -> str:
+    """json.dumps的default参数, 将JsonObject序列化为字符串, 避免为了序列化而深拷贝整个节点"""
+    if isinstance(obj, JsonObject):
+        return obj.to_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+NodeWrite = Tuple[str, str, str, str]  # (DataChunk名称, 一级节点, 文件路径, 序列化后的内容)
+ChunkWrite = Tuple[str, str, str]  # (DataChunk名称, 文件路径, 序列化后的内容)
+
+
+def _write_text(path: str, content: str) -> None:
+    """先写入临时文件再替换, 读取时不会读到写了一半的文件"""
+    path_tmp = path + ".tmp"
+    with open(path_tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(path_tmp, path)
+
+
+def synchronized(func):
+    """DataManager的公开接口可能被指令线程池中的线程调用, 用可重入锁保证每次操作的原子性"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return func(self, *args, **kwargs)
+    return wrapper
 
 
 class DataManager:
@@ -30,16 +66,25 @@ class DataManager:
             data_path: 存放所有持久化数据的文件目录
         """
         self.dataPath = data_path
+        self.lock = threading.RLock()
         if not os.path.exists(data_path):
             os.makedirs(data_path)
             dice_log(f"[DataManager] [Init] 创建文件夹: {data_path.replace(ROOT_DATA_PATH, '~')}")
 
         self.__dataChunks: Dict[str, DataChunkBase] = {}
+        self.__lazy_states: Dict[str, LazyChunkState] = {}  # 按需载入的DataChunk的状态
+        self.__residency = ResidencyCache()
+        self.__write_versions: Dict[str, int] = {}  # 每个DataChunk通过set_data/delete_data被修改的次数
+        # 已经序列化但还没有写入文件的一级节点, 在写入完成前从这里读取, 避免读到旧的文件
+        self.__pending_nodes: Dict[Tuple[str, str], str] = {}
+        # 所有文件的写入与删除都在同一个线程上按提交的顺序执行, 写入时不持有锁
+        self.__writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DiceDataWriter")
         self.load_data()
 
+    @synchronized
     def get_data(self, target: str, path: List[str],
                  default_val: Optional[Any] = None, default_gen: Optional[Callable[[], Any]] = None,
-                 get_ref: bool = False) -> Any:
+                 get_ref: bool = False, read_only: bool = False) -> Any:
         """
         从DataManager中取得数据, 若该数据不存在, 则用defaultVal创建该数据并返回
         如果不指定defaultVal, 访问不存在的数据将会抛出一个异常
@@ -50,13 +95,37 @@ class DataManager:
             default_val(Optional[Any]): 数据默认值, 如果给出默认值, 在访问不存在的数据时会自动创建该数据, 否则抛出异常
             default_gen(Optional[Callable[]]): 数据默认值生成器, 如果有数据默认值, 则以默认值优先, 否则调用生成器得到默认值
             get_ref(bool): 返回数据的拷贝还是引用, 默认返回拷贝, 返回引用容易污染数据
+            read_only(bool): 与get_ref一同使用, 表示不会通过返回的引用修改数据, 按需载入的节点不会因此在保存时被重新写入
         Returns:
             data(Any): 取得的数据
         """
         if len(path) > 1 and not path[-1]:
             raise DataManagerError(f"[GetData] 叶子结点的名称不能为空 完整路径: {path}")
+        if METRICS.enabled:
+            METRICS.inc(METRIC_DATA_GET_TOTAL, target=target)
 
         data_chunk = self.__get_data_chunk(target)
+        lazy_state = self.__lazy_states.get(target)
+        if lazy_state is not None:
+            if not path:
+                return self.__get_lazy_root(data_chunk, lazy_state, get_ref)
+            self.__load_lazy_node(target, data_chunk, lazy_state, path[0])
+            created = False
+            try:
+                result, created = self.__get_data_inner(data_chunk, path, default_val, default_gen, get_ref)
+                return result
+            finally:
+                # 取得可修改的引用或者确实用默认值创建了新节点时, 才视为该节点被修改过; 只读的访问不会导致重新写入文件
+                touched = (get_ref and not read_only) or created
+                self.__on_lazy_node_access(target, data_chunk, lazy_state, path[0], touched=touched)
+        return self.__get_data_inner(data_chunk, path, default_val, default_gen, get_ref)[0]
+
+    @staticmethod
+    def __get_data_inner(data_chunk: DataChunkBase, path: List[str],
+                         default_val: Optional[Any], default_gen: Optional[Callable[[], Any]],
+                         get_ref: bool) -> Tuple[Any, bool]:
+        """返回取得的数据以及是否用默认值创建了新的节点"""
+        created = False
         strict_check = data_chunk.strict_check
         parent_node = data_chunk.root
         cur_node = parent_node
@@ -82,6 +151,7 @@ class DataManager:
                     raise DataManagerError(f"[GetData] 尝试在不给出默认值的情况下访问不存在的路径! 路径: {path}")
                 parent_node[cur_path] = default_val_cur
                 data_chunk.dirty = True
+                created = True
             cur_node = parent_node[cur_path]
             if strict_check:  # 检查是否与默认值拥有相同类型
                 if default_val_cur is not None and type(cur_node) != type(default_val_cur):
@@ -91,10 +161,11 @@ class DataManager:
             parent_node = cur_node
 
         if get_ref:
-            return cur_node
+            return cur_node, created
         else:  # 默认返回拷贝
-            return copy.deepcopy(cur_node)
+            return copy.deepcopy(cur_node), created
 
+    @synchronized
     def set_data(self, target: str, path: List[str], new_val: Any) -> None:
         """
         设置DataManager中保存的数据
@@ -105,8 +176,23 @@ class DataManager:
         """
         if len(path) > 1 and not path[-1]:
             raise DataManagerError(f"[SetData] 叶子结点的名称不能为空 完整路径: {path}")
+        if METRICS.enabled:
+            METRICS.inc(METRIC_DATA_SET_TOTAL, target=target)
 
         data_chunk = self.__get_data_chunk(target)
+        self.__write_versions[target] = self.__write_versions.get(target, 0) + 1
+        lazy_state = self.__lazy_states.get(target)
+        if lazy_state is not None and path:
+            self.__load_lazy_node(target, data_chunk, lazy_state, path[0])
+            try:
+                self.__set_data_inner(data_chunk, path, new_val)
+            finally:
+                self.__on_lazy_node_access(target, data_chunk, lazy_state, path[0], touched=True)
+            return
+        self.__set_data_inner(data_chunk, path, new_val)
+
+    @staticmethod
+    def __set_data_inner(data_chunk: DataChunkBase, path: List[str], new_val: Any) -> None:
         strict_check = data_chunk.strict_check
         parent_node = data_chunk.root
         for i in range(len(path)):
@@ -137,6 +223,7 @@ class DataManager:
             parent_node = parent_node[cur_path]  # 继续访问下一节点
         return
 
+    @synchronized
     def delete_data(self, target: str, path: List[str], force_delete: bool = False, ignore_miss: bool = True) -> Any:
         """
         从DataManager中删除数据, 若该数据不存在且ignore_miss为False, 则会抛出异常
@@ -150,16 +237,35 @@ class DataManager:
             data(Any): 被删除的数据
         """
         data_chunk = self.__get_data_chunk(target)
+        self.__write_versions[target] = self.__write_versions.get(target, 0) + 1
+        lazy_state = self.__lazy_states.get(target)
         parent_node = data_chunk.root
         cur_node = parent_node
 
         if not path:
             if force_delete:
                 data_chunk.root = {}
+                if lazy_state is not None:
+                    self.__clear_lazy_chunk(target, lazy_state)
                 return cur_node
             else:
                 raise DataManagerError(f"[DeleteData] 尝试非安全地删除所有数据!")
 
+        if lazy_state is not None:
+            self.__load_lazy_node(target, data_chunk, lazy_state, path[0])
+            try:
+                return self.__delete_data_inner(data_chunk, path, ignore_miss)
+            finally:
+                if path[0] in data_chunk.root:
+                    self.__on_lazy_node_access(target, data_chunk, lazy_state, path[0], touched=True)
+                else:
+                    self.__forget_lazy_node(target, lazy_state, path[0])
+        return self.__delete_data_inner(data_chunk, path, ignore_miss)
+
+    @staticmethod
+    def __delete_data_inner(data_chunk: DataChunkBase, path: List[str], ignore_miss: bool) -> Any:
+        parent_node = data_chunk.root
+        cur_node = parent_node
         for i in range(len(path)):
             is_last = (i == len(path) - 1)
 
@@ -181,6 +287,7 @@ class DataManager:
 
         return cur_node
     
+    @synchronized
     def delete_data_all(self, path: List[str], force_delete: bool = False, ignore_miss: bool = True):
         """
         从DataManager中删除全部某路径的数据, 若该数据不存在且ignore_miss为False, 则会抛出异常
@@ -195,7 +302,7 @@ class DataManager:
                 # 清空所有数据块
                 for _name, _chunk in self.__dataChunks.items():
                     if issubclass(type(_chunk), DataChunkBase):
-                        _chunk.root = {}
+                        self.delete_data(_name, [], force_delete=True)
                 return None
             else:
                 raise DataManagerError(f"[DeleteData] 尝试非安全地删除所有数据!")
@@ -208,12 +315,31 @@ class DataManager:
                     if not ignore_miss:
                         raise
 
+    def get_write_version(self, target: str) -> int:
+        """返回DataChunk通过set_data/delete_data被修改的次数, 用来判断之前读取的结果是否仍然有效"""
+        return self.__write_versions.get(target, 0)
+
+    @synchronized
     def get_keys(self, target: str, path: List[str]):
         """类似get_data, 但是不会返回数据的拷贝, 而是返回当前path的所有key, 当前path不存在或不是dict则抛出异常"""
         if len(path) > 1 and not path[-1]:
             raise DataManagerError(f"[GetData] 叶子结点的名称不能为空 完整路径: {path}")
 
         data_chunk = self.__get_data_chunk(target)
+        lazy_state = self.__lazy_states.get(target)
+        if lazy_state is not None:
+            if not path:  # 按需载入的DataChunk使用索引, 不需要把所有节点读入内存
+                # 返回拷贝, 遍历时读取节点可能会从索引中移除无法读取的文件
+                return list(lazy_state.keys)
+            self.__load_lazy_node(target, data_chunk, lazy_state, path[0])
+            try:
+                return self.__get_keys_inner(data_chunk, path)
+            finally:
+                self.__on_lazy_node_access(target, data_chunk, lazy_state, path[0], touched=False)
+        return self.__get_keys_inner(data_chunk, path)
+
+    @staticmethod
+    def __get_keys_inner(data_chunk: DataChunkBase, path: List[str]):
         parent_node = data_chunk.root
         cur_node = parent_node
         for i in range(len(path)):
@@ -238,11 +364,178 @@ class DataManager:
             raise DataManagerError(f"[GetDataChunk] 找到的变量({type(data_chunk)})不是继承于{DataChunkBase}!")
         return data_chunk
 
+    def __get_lazy_node_path(self, lazy_state: LazyChunkState, key: str) -> str:
+        return os.path.join(lazy_state.dir_path, f"{quote(key, safe='')}.json")
+
+    def __load_lazy_node(self, target: str, data_chunk: DataChunkBase, lazy_state: LazyChunkState, key: str) -> None:
+        """确保按需载入的DataChunk的一级节点在内存中, 不存在的节点不做处理"""
+        if key in data_chunk.root:
+            self.__residency.hit_count += 1
+            return
+        if key not in lazy_state.keys:
+            return
+        self.__residency.miss_count += 1
+        value, size = self.__read_lazy_node(target, data_chunk, lazy_state, key)
+        if value is None:
+            return
+        data_chunk.root[key] = value
+        self.__residency.touch(target, key, size)
+
+    def __read_lazy_node(self, target: str, data_chunk: DataChunkBase, lazy_state: LazyChunkState,
+                         key: str) -> Tuple[Any, int]:
+        """读取一级节点与它的大小, 还没写入文件的节点直接使用序列化后的内容, 失败时会将该节点从索引中移除并返回None"""
+        node_path = self.__get_lazy_node_path(lazy_state, key)
+        content = self.__pending_nodes.get((target, key))
+        try:
+            if content is not None:
+                value, size = json.loads(content), len(content)
+            else:
+                value, size = read_json(node_path), os.path.getsize(node_path)
+        except (OSError, JSONDecodeError) as e:
+            dice_log(f"[DataManager] [Load] 无法从{node_path.replace(ROOT_DATA_PATH, '~')}中载入{key}: {e.args}")
+            del lazy_state.keys[key]
+            return None, 0
+        if data_chunk.include_json_object:
+            wrapper = {key: value}
+            deserialize_json_object_in_node(wrapper)
+            value = wrapper.get(key)
+        return value, size
+
+    def __serialize_lazy_node(self, target: str, data_chunk: DataChunkBase, lazy_state: LazyChunkState,
+                              key: str) -> Optional[NodeWrite]:
+        """
+        序列化需要写回的一级节点, 返回交给写入线程的任务, 节点已不存在或序列化失败时返回None
+        节点不在内存中时说明上次写入失败, 重新提交上次序列化的内容
+        """
+        node_path = self.__get_lazy_node_path(lazy_state, key)
+        if key not in data_chunk.root:
+            lazy_state.touched.discard(key)
+            content = self.__pending_nodes.get((target, key))
+            return (target, key, node_path, content) if content is not None else None
+        try:
+            content = json.dumps(data_chunk.root[key], ensure_ascii=False, default=_serialize_json_object)
+        except (TypeError, ValueError) as e:
+            dice_log(f"[DataManager] [SaveData] 无法序列化{node_path.replace(ROOT_DATA_PATH, '~')}: {e.args}")
+            return None
+        lazy_state.touched.discard(key)
+        self.__pending_nodes[(target, key)] = content
+        self.__residency.flush_count += 1
+        self.__residency.update_size(target, key, len(content))
+        if METRICS.enabled:
+            METRICS.inc(METRIC_DATA_SAVE_BYTES, len(content.encode("utf-8")), target=target)
+        return target, key, node_path, content
+
+    def __on_lazy_node_access(self, target: str, data_chunk: DataChunkBase, lazy_state: LazyChunkState,
+                              key: str, touched: bool) -> None:
+        """访问按需载入的一级节点后更新索引与LRU记录, 必要时淘汰最久未使用的节点"""
+        if key not in data_chunk.root:
+            return
+        if key not in lazy_state.keys:
+            lazy_state.keys[key] = None
+            touched = True
+        if touched:
+            lazy_state.touched.add(key)
+        self.__residency.touch(target, key)
+        if self.__residency.is_over_limit():
+            self.__evict_lazy_nodes()
+
+    def __forget_lazy_node(self, target: str, lazy_state: LazyChunkState, key: str) -> None:
+        """一级节点被删除后, 同时删除对应的文件和记录, 文件在写入线程上删除, 保证在之前提交的写入之后"""
+        lazy_state.touched.discard(key)
+        self.__residency.remove(target, key)
+        self.__pending_nodes.pop((target, key), None)
+        if key in lazy_state.keys:
+            del lazy_state.keys[key]
+            self.__writer.submit(self.__remove_file, self.__get_lazy_node_path(lazy_state, key))
+
+    @staticmethod
+    def __remove_file(path: str) -> None:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            dice_log(f"[DataManager] [DeleteData] 无法删除文件{path.replace(ROOT_DATA_PATH, '~')}: {e.args}")
+
+    def __clear_lazy_chunk(self, target: str, lazy_state: LazyChunkState) -> None:
+        for key in list(lazy_state.keys.keys()):
+            self.__forget_lazy_node(target, lazy_state, key)
+
+    def __get_lazy_root(self, data_chunk: DataChunkBase, lazy_state: LazyChunkState, get_ref: bool) -> dict:
+        """读取按需载入的DataChunk的所有数据, 不在内存中的节点直接从文件读取, 不会加入驻留记录"""
+        if get_ref:
+            raise DataManagerError(f"[GetData] 按需载入的DataChunk不能获取根节点的引用: {data_chunk.get_identifier()}")
+        result = {}
+        for key in list(lazy_state.keys.keys()):
+            if key in data_chunk.root:
+                result[key] = copy.deepcopy(data_chunk.root[key])
+            else:
+                value = self.__read_lazy_node(data_chunk.get_identifier(), data_chunk, lazy_state, key)[0]
+                if value is not None:
+                    result[key] = value
+        return result
+
+    def __evict_lazy_nodes(self) -> None:
+        """淘汰最久未使用的一级节点直到满足上限, 被修改过的节点会先交给写入线程写回硬盘"""
+        while self.__residency.is_over_limit():
+            target, key = self.__residency.pop_victim()
+            data_chunk, lazy_state = self.__dataChunks[target], self.__lazy_states[target]
+            if key in lazy_state.touched:
+                node_write = self.__serialize_lazy_node(target, data_chunk, lazy_state, key)
+                if node_write is None and key in lazy_state.touched:
+                    self.__residency.touch(target, key)  # 无法序列化则保留在内存中
+                    break
+                if node_write:
+                    self.__writer.submit(self.__write_files, [node_write], [])
+            data_chunk.root.pop(key, None)
+            self.__residency.evict_count += 1
+
+    def __init_lazy_chunk(self, target: str, data_chunk: DataChunkBase) -> None:
+        """建立按需载入的DataChunk的索引, 并把旧版本中整体保存的数据迁移为单独的文件"""
+        dir_path = os.path.join(self.dataPath, target)
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        lazy_state = LazyChunkState(dir_path)
+        for file_name in os.listdir(dir_path):
+            if file_name.endswith(".json"):
+                lazy_state.keys[unquote(file_name[:-len(".json")])] = None
+        for key in list(data_chunk.root.keys()):
+            if key in lazy_state.keys:  # 单独保存的文件总是比整体保存的数据更新
+                del data_chunk.root[key]
+                continue
+            lazy_state.keys[key] = None
+            lazy_state.touched.add(key)
+            data_chunk.dirty = True
+            self.__residency.touch(target, key)
+        self.__lazy_states[target] = lazy_state
+
+    @synchronized
+    def set_residency_limit(self, max_entry: int, max_size_kb: int) -> None:
+        """
+        设置按需载入的数据在内存中驻留的上限, 超过上限时会淘汰最久未使用的数据
+        Args:
+            max_entry: 最多驻留的一级节点数量, 为0代表不限制
+            max_size_kb: 最多驻留的估计内存占用, 单位为KB, 为0代表不限制
+        """
+        self.__residency.set_limit(max_entry, max_size_kb * 1024)
+        if self.__residency.is_over_limit():
+            self.__evict_lazy_nodes()
+
+    def get_residency_info(self) -> List[str]:
+        """返回按需载入的数据的驻留统计信息"""
+        info = self.__residency.get_info()
+        for target, lazy_state in self.__lazy_states.items():
+            info.append(f"{target}: {len(self.__dataChunks[target].root)}/{len(lazy_state.keys)}")
+        return info
+
     def load_data(self):
         """
         从本地文件中读取数据, 会完全用本地文件覆盖内存中的信息
         """
+        self.__writer.submit(lambda: None).result()  # 等待之前提交的写入完成
+        self.__pending_nodes.clear()
         self.__dataChunks: Dict[str, DataChunkBase] = dict()
+        self.__lazy_states: Dict[str, LazyChunkState] = dict()
+        self.__residency.clear()
         for dcType in DATA_CHUNK_TYPES:
             dc_name = dcType.get_identifier()
             json_path = os.path.join(self.dataPath, f"{dc_name}.json")
@@ -269,24 +562,81 @@ class DataManager:
             # 文件不存在则用默认构造函数生成一个数据对象
             self.__dataChunks[dc_name] = dcType()
             # logger.dice_log(f"[DataManager] [Init] 找不到{json_path_readable}, 使用空白数据")
+        for dc_name, data_chunk in self.__dataChunks.items():
+            if data_chunk.lazy_load:
+                self.__init_lazy_chunk(dc_name, data_chunk)
 
     async def save_data_async(self):
+        """
+        在锁内把需要保存的数据序列化为字符串, 然后释放锁, 在写入线程上写入文件
+        写入文件时其他线程与协程可以继续读写数据, 之后的修改会在下一次保存时写入
+        """
+        with METRICS.timer(METRIC_DATA_SAVE):
+            with self.lock:
+                node_writes, chunk_writes = self.__serialize_for_save()
+            # 总是提交一次写入, 等待它完成时之前因淘汰而提交的写入也都已经完成
+            await asyncio.wrap_future(self.__writer.submit(self.__write_files, node_writes, chunk_writes))
+            with self.lock:  # 写回后再淘汰超出上限的节点
+                if self.__residency.is_over_limit():
+                    self.__evict_lazy_nodes()
+
+    def __serialize_for_save(self) -> Tuple[List[NodeWrite], List[ChunkWrite]]:
+        """序列化被修改过的一级节点与DataChunk, 必须在持有锁时调用"""
+        node_writes: List[NodeWrite] = []
+        # 按需载入的DataChunk先写回被访问过的一级节点
+        for dc_name, lazy_state in self.__lazy_states.items():
+            data_chunk = self.__dataChunks[dc_name]
+            for key in list(lazy_state.touched):
+                node_write = self.__serialize_lazy_node(dc_name, data_chunk, lazy_state, key)
+                if node_write:
+                    node_writes.append(node_write)
+        chunk_writes: List[ChunkWrite] = []
         for dataChunk in self.__dataChunks.values():
             if not dataChunk.dirty:  # 没有被修改过则不需要更新
                 continue
-            dataChunk.dirty = False
             dc_name = dataChunk.get_identifier()
-            dataChunk.hash_code = hash(dataChunk)
-            json_path = os.path.join(self.dataPath, f"{dc_name}.json")
+            if dataChunk.lazy_load:  # 一级节点已经单独保存, 只需要保存其他信息
+                json_dict = {k: v for k, v in dataChunk.__dict__.items() if k != "root"}
+                json_dict["root"] = {}
+            else:
+                dataChunk.hash_code = hash(dataChunk)
+                json_dict = dataChunk.to_json()
+            try:
+                content = json.dumps(json_dict, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                dice_log(f"[SaveData] 序列化{dc_name}的过程中出现错误: {e.args}")
+                continue
+            dataChunk.dirty = False
+            chunk_writes.append((dc_name, os.path.join(self.dataPath, f"{dc_name}.json"), content))
+        return node_writes, chunk_writes
+
+    def __write_files(self, node_writes: List[NodeWrite], chunk_writes: List[ChunkWrite]) -> None:
+        """在写入线程上写入文件, 不持有锁, 失败的数据标记为需要在下一次保存时重新写入"""
+        for target, key, node_path, content in node_writes:
+            try:
+                _write_text(node_path, content)
+                success = True
+            except OSError as e:
+                dice_log(f"[DataManager] [SaveData] 无法保存{node_path.replace(ROOT_DATA_PATH, '~')}: {e.args}")
+                success = False
+            with self.lock:
+                if self.__pending_nodes.get((target, key)) is not content:  # 之后又提交了新的内容或者节点已被删除
+                    continue
+                if success:
+                    del self.__pending_nodes[(target, key)]
+                elif target in self.__lazy_states:
+                    self.__lazy_states[target].touched.add(key)
+        for dc_name, json_path, content in chunk_writes:
             # 为了安全起见, 先将文件保存在临时文件中
             json_path_readable = json_path.replace(ROOT_DATA_PATH, "~")
             json_path_tmp = json_path + ".tmp"
             json_path_tmp_readable = json_path_tmp.replace(ROOT_DATA_PATH, "~")
             try:
-                await update_json_async(dataChunk.to_json(), json_path_tmp)
-            except JSONDecodeError as e:
-                dice_log(f"[SaveData] 序列化过程中出现错误: {e.msg}")
-                dataChunk.dirty = True
+                with open(json_path_tmp, "w", encoding="utf-8") as f:
+                    f.write(content)
+            except OSError as e:
+                dice_log(f"[SaveData] 无法写入文件{json_path_tmp_readable}: {e.args}")
+                self.__mark_chunk_dirty(dc_name)
                 continue
             # 删除正式文件
             try:
@@ -294,15 +644,22 @@ class DataManager:
                     os.remove(json_path)
             except OSError as e:
                 dice_log(f"[SaveData] 无法删除文件{json_path_readable}: {e.args}")
-                dataChunk.dirty = True
+                self.__mark_chunk_dirty(dc_name)
                 continue
             # 重命名临时文件
             try:
                 os.rename(json_path_tmp, json_path)
             except OSError as e:
                 dice_log(f"[SaveData] 无法重命名文件{json_path_tmp_readable} -> {json_path_readable} 原因: {e.args}")
-                dataChunk.dirty = True
+                self.__mark_chunk_dirty(dc_name)
                 continue
+            if METRICS.enabled:
+                METRICS.inc(METRIC_DATA_SAVE_BYTES, len(content.encode("utf-8")), target=dc_name)
+
+    @synchronized
+    def __mark_chunk_dirty(self, dc_name: str) -> None:
+        if dc_name in self.__dataChunks:
+            self.__dataChunks[dc_name].dirty = True
 
     def save_data(self):
         """
@@ -0,0 +1,103 @@
+"""
+按需载入的DataChunk所使用的驻留管理, 记录哪些一级节点在内存中, 并按照最近最少使用(LRU)的顺序淘汰
+"""
+
+from collections import OrderedDict
+from typing import Dict, Set, Tuple, List
+
+RESIDENT_ENTRY_MIN = 64  # 设置上限时至少保留的驻留节点数量, 避免同一条消息处理过程中持有的引用被淘汰
+RESIDENT_ENTRY_SIZE_DEFAULT = 1024  # 尚未写入过硬盘的节点的估计大小, 单位为字节
+
+
+class LazyChunkState:
+    """
+    记录一个按需载入的DataChunk的状态
+    """
+    def __init__(self, dir_path: str):
+        """
+        Args:
+            dir_path: 存放该DataChunk所有一级节点文件的文件夹
+        """
+        self.dir_path: str = dir_path
+        self.keys: Dict[str, None] = {}  # 所有存在的一级节点(无论是否在内存中), 用字典保证顺序
+        self.touched: Set[str] = set()  # 上次写回后被访问过引用或修改过的一级节点, 写回或淘汰时需要保存
+
+
+class ResidencyCache:
+    """
+    在所有按需载入的DataChunk之间共享的LRU记录, 以(DataChunk名称, 一级节点)为键, 值为估计的内存占用
+    """
+    def __init__(self):
+        self.entries: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self.total_size: int = 0
+        self.max_entry: int = 0  # 为0代表不限制
+        self.max_size: int = 0  # 单位为字节, 为0代表不限制
+
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+        self.evict_count: int = 0
+        self.flush_count: int = 0
+
+    def set_limit(self, max_entry: int, max_size: int) -> None:
+        """
+        Args:
+            max_entry: 最多驻留的节点数量, 为0代表不限制
+            max_size: 最多驻留的估计内存占用, 单位为字节, 为0代表不限制
+        """
+        self.max_entry = max(max_entry, RESIDENT_ENTRY_MIN) if max_entry > 0 else 0
+        self.max_size = max(max_size, 0)
+
+    def touch(self, dc_name: str, key: str, size: int = -1) -> None:
+        """标记一个节点最近被使用过, 若节点不在记录中则加入记录, size小于0代表沿用之前的估计大小"""
+        entry = (dc_name, key)
+        if entry in self.entries:
+            self.entries.move_to_end(entry)
+            if size >= 0:
+                self.total_size += size - self.entries[entry]
+                self.entries[entry] = size
+        else:
+            size = size if size >= 0 else RESIDENT_ENTRY_SIZE_DEFAULT
+            self.entries[entry] = size
+            self.total_size += size
+
+    def update_size(self, dc_name: str, key: str, size: int) -> None:
+        """更新节点的估计大小, 不改变使用顺序"""
+        entry = (dc_name, key)
+        if entry in self.entries:
+            self.total_size += size - self.entries[entry]
+            self.entries[entry] = size
+
+    def remove(self, dc_name: str, key: str) -> None:
+        size = self.entries.pop((dc_name, key), None)
+        if size is not None:
+            self.total_size -= size
+
+    def clear(self) -> None:
+        """清空驻留记录, 不影响上限与统计数据"""
+        self.entries.clear()
+        self.total_size = 0
+
+    def is_over_limit(self) -> bool:
+        if len(self.entries) <= RESIDENT_ENTRY_MIN:
+            return False
+        if self.max_entry and len(self.entries) > self.max_entry:
+            return True
+        if self.max_size and self.total_size > self.max_size:
+            return True
+        return False
+
+    def pop_victim(self) -> Tuple[str, str]:
+        """弹出最久没有使用过的节点"""
+        entry, size = self.entries.popitem(last=False)
+        self.total_size -= size
+        return entry
+
+    def get_info(self) -> List[str]:
+        """返回可读的统计信息"""
+        access_count = self.hit_count + self.miss_count
+        hit_rate = f"{self.hit_count / access_count * 100:.1f}%" if access_count else "N/A"
+        max_entry = str(self.max_entry) if self.max_entry else "不限"
+        max_size = f"{self.max_size // 1024}KB" if self.max_size else "不限"
+        return [f"驻留节点: {len(self.entries)}/{max_entry} 估计占用: {self.total_size // 1024}KB/{max_size}",
+                f"命中: {self.hit_count} 缺失: {self.miss_count} 命中率: {hit_rate}",
+                f"淘汰: {self.evict_count} 写回: {self.flush_count}"]
@@ -1,5 +1,6 @@
 import unittest
 import os
+import threading
 
 from core.data.manager import DataManager, DataManagerError
 from core.data.data_chunk import DataChunkBase, custom_data_chunk
@@ -139,6 +140,99 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(dumb_obj_1.strField, "CBA")
         self.assertEqual(dumb_obj_2.strField, "")
 
+    def test3_lazy(self):
+        print("开始测试按需载入")
+
+        @custom_data_chunk(identifier=f"Test_Lazy", lazy_load=True)
+        class _(DataChunkBase):
+            def __init__(self):
+                super().__init__()
+        from core.data.residency import RESIDENT_ENTRY_MIN
+        entry_num = RESIDENT_ENTRY_MIN * 2
+        self.data_manager = DataManager(test_path)
+        self.data_manager.set_residency_limit(RESIDENT_ENTRY_MIN, 0)
+        for i in range(entry_num):
+            self.data_manager.set_data("Test_Lazy", [f"User/{i}", "Attr"], i)
+        self.data_manager.get_data("Test_Lazy", ["User/0"], get_ref=True)["Attr"] = -1  # 通过引用修改被淘汰的节点
+        self.assertEqual(len(self.data_manager.get_keys("Test_Lazy", [])), entry_num)
+        for i in range(1, entry_num):
+            self.assertEqual(self.data_manager.get_data("Test_Lazy", [f"User/{i}", "Attr"]), i)
+        self.assertEqual(self.data_manager.get_data("Test_Lazy", ["User/0", "Attr"]), -1)
+        self.data_manager.delete_data("Test_Lazy", ["User/1"])
+        self.data_manager.save_data()
+        print("超出上限的节点写回后被移出内存")
+
+        data_manager_new = DataManager(test_path)
+        self.assertEqual(len(data_manager_new.get_keys("Test_Lazy", [])), entry_num - 1)
+        self.assertEqual(data_manager_new.get_data("Test_Lazy", ["User/0", "Attr"]), -1)
+        self.assertEqual(data_manager_new.get_data("Test_Lazy", [f"User/{entry_num - 1}", "Attr"]), entry_num - 1)
+        self.assertEqual(len(data_manager_new.get_data("Test_Lazy", [])), entry_num - 1)
+        self.assertRaises(DataManagerError, data_manager_new.get_data, "Test_Lazy", ["User/1", "Attr"])
+        self.assertRaises(DataManagerError, data_manager_new.get_data, "Test_Lazy", [], get_ref=True)
+        print("\n".join(data_manager_new.get_residency_info()))
+        print("重新读取的数据正确!")
+
+    def test4_lazy_touch(self):
+        print("开始测试按需载入节点的写回")
+        data_manager = DataManager(test_path)
+        lazy_dir = os.path.join(test_path, "Test_Lazy")
+        mtime_dict = {name: os.stat(os.path.join(lazy_dir, name)).st_mtime_ns for name in os.listdir(lazy_dir)}
+        data_manager.get_data("Test_Lazy", ["User/0", "Attr"], 0)  # 节点已存在, 只是给出默认值
+        data_manager.get_data("Test_Lazy", ["User/2", "Attr"], default_gen=lambda: 0)
+        data_manager.get_data("Test_Lazy", ["User/3"], get_ref=True, read_only=True)  # 只读的引用
+        data_manager.get_data("Test_Lazy", ["User/New", "Attr"], 0)  # 用默认值创建了新节点
+        data_manager.save_data()
+        new_mtime_dict = {name: os.stat(os.path.join(lazy_dir, name)).st_mtime_ns for name in os.listdir(lazy_dir)}
+        self.assertEqual(set(new_mtime_dict.keys()) - set(mtime_dict.keys()), {"User%2FNew.json"})
+        for name, mtime in mtime_dict.items():
+            self.assertEqual(new_mtime_dict[name], mtime, f"{name}没有被修改却被重新写入")
+        print("只读取的节点不会被重新写入")
+
+        keys = data_manager.get_keys("Test_Lazy", [])
+        self.assertIsInstance(keys, list)
+        for key in keys:  # 遍历时读取节点不会影响遍历
+            data_manager.get_data("Test_Lazy", [key], {})
+        print("get_keys返回的是拷贝")
+
+    def test5_save_unlocked(self):
+        print("开始测试写入文件时不持有锁")
+
+        @custom_data_chunk(identifier=f"Test_Lazy_Save", lazy_load=True)
+        class _(DataChunkBase):
+            def __init__(self):
+                super().__init__()
+        from core.data.residency import RESIDENT_ENTRY_MIN
+        entry_num = RESIDENT_ENTRY_MIN * 2
+        data_manager = DataManager(test_path)
+        data_manager.set_data("Test_Lazy_Save", ["User/0", "Attr"], 0)
+        writer_gate = threading.Event()
+        data_manager._DataManager__writer.submit(writer_gate.wait)  # 让写入线程停住, 模拟很慢的硬盘
+        save_thread = threading.Thread(target=data_manager.save_data)
+        save_thread.start()
+        save_thread.join(0.2)
+        self.assertTrue(save_thread.is_alive())
+        # 保存还没有完成时其他线程仍然可以读写数据
+        data_manager.set_data("Test_Lazy_Save", ["User/0", "Attr"], -1)
+        data_manager.set_residency_limit(RESIDENT_ENTRY_MIN, 0)
+        for i in range(1, entry_num):
+            data_manager.set_data("Test_Lazy_Save", [f"User/{i}", "Attr"], i)
+        # 被淘汰但还没写入文件的节点读取的是最新的内容
+        for i in range(1, entry_num):
+            self.assertEqual(data_manager.get_data("Test_Lazy_Save", [f"User/{i}", "Attr"]), i)
+        data_manager.delete_data("Test_Lazy_Save", ["User/1"])
+        writer_gate.set()
+        save_thread.join()
+        data_manager.save_data()
+        print("保存过程中可以读写数据")
+
+        data_manager_new = DataManager(test_path)
+        self.assertEqual(data_manager_new.get_data("Test_Lazy_Save", ["User/0", "Attr"]), -1)
+        self.assertEqual(len(data_manager_new.get_keys("Test_Lazy_Save", [])), entry_num - 1)
+        self.assertRaises(DataManagerError, data_manager_new.get_data, "Test_Lazy_Save", ["User/1", "Attr"])
+        for i in range(2, entry_num):
+            self.assertEqual(data_manager_new.get_data("Test_Lazy_Save", [f"User/{i}", "Attr"]), i)
+        print("保存过程中的修改在下一次保存时写入")
+
     def test9_exception(self):
         print("开始测试异常")
         self.data_manager = DataManager(test_path)
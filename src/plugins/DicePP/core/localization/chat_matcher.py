@@ -0,0 +1,103 @@
+"""
+自定义对话关键字的匹配器, 在读取自定义对话时编译一次, 之后每条消息只需要做少量的查询与一次合并后的正则匹配
+匹配结果与对每个关键字分别调用re.match完全一致
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from utils.logger import dice_log
+
+REGEX_META_CHARS = frozenset(".^$*+?{}[]\\|()")
+# 含有这些写法的正则无法安全地合并进一个大的正则(编号引用会错位, 组名可能重复, 全局标记只能出现在开头), 需要单独匹配
+UNMERGEABLE_PATTERN = re.compile(r"\\[1-9]|\(\?P|\(\?\(|\(\?[aiLmsux]+\)")
+
+
+def get_literal(key: str) -> Tuple[Optional[str], bool]:
+    """
+    若关键字等价于一个普通字符串的前缀匹配或全字匹配, 返回该字符串以及是否为全字匹配, 否则返回None
+    """
+    body = key[1:] if key.startswith("^") else key
+    is_exact = body.endswith("$") and not body.endswith("\\$")
+    if is_exact:
+        body = body[:-1]
+    if REGEX_META_CHARS.isdisjoint(body):
+        return body, is_exact
+    return None, False
+
+
+class ChatMatcher:
+    """
+    将自定义对话的关键字分为三类:
+    普通字符串的全字匹配(如^你好$)用字典查询, 普通字符串的前缀匹配按首字建立索引,
+    其余的正则表达式合并为一个带命名分组的大正则, 用来快速排除不可能匹配的消息并找到第一个可能匹配的关键字
+    """
+    def __init__(self, keys: Iterable[str] = ()):
+        self.key_order: Dict[str, int] = {}
+        self.exact_dict: Dict[str, List[str]] = {}
+        self.prefix_dict: Dict[str, List[Tuple[str, str]]] = {}  # 首字 -> (关键字, 前缀)
+        self.prefix_empty: List[str] = []  # 空字符串可以匹配任何消息
+        self.regex_list: List[Tuple[str, Pattern]] = []
+        self.regex_combined: Optional[Pattern] = None
+        self.regex_single: List[Tuple[str, Pattern]] = []  # 无法合并的正则
+
+        for key in keys:
+            self.add_key(key)
+        self.compile()
+
+    def add_key(self, key: str) -> None:
+        if key in self.key_order:
+            return
+        self.key_order[key] = len(self.key_order)
+        literal, is_exact = get_literal(key)
+        if literal is not None:
+            if is_exact:
+                self.exact_dict.setdefault(literal, []).append(key)
+            elif literal:
+                self.prefix_dict.setdefault(literal[0], []).append((key, literal))
+            else:
+                self.prefix_empty.append(key)
+            return
+        try:
+            pattern = re.compile(key)
+        except re.error as e:
+            dice_log(f"[Local] [Chat] 无效的自定义对话关键字 {key}: {e}")
+            return
+        if UNMERGEABLE_PATTERN.search(key):
+            self.regex_single.append((key, pattern))
+        else:
+            self.regex_list.append((key, pattern))
+
+    def compile(self) -> None:
+        """将可以合并的正则合并为一个, 若合并失败则全部改为单独匹配"""
+        if not self.regex_list:
+            self.regex_combined = None
+            return
+        try:
+            self.regex_combined = re.compile("|".join(f"(?P<k{index}>{key})" for index, (key, _) in enumerate(self.regex_list)))
+        except re.error as e:
+            dice_log(f"[Local] [Chat] 无法合并自定义对话关键字, 将逐个匹配: {e}")
+            self.regex_combined = None
+            self.regex_single += self.regex_list
+            self.regex_list = []
+
+    def match(self, msg: str) -> List[str]:
+        """返回所有能与msg匹配(re.match)的关键字, 顺序与加入时的顺序相同"""
+        result: List[str] = list(self.prefix_empty)
+        if msg in self.exact_dict:
+            result += self.exact_dict[msg]
+        if msg.endswith("\n") and msg[:-1] in self.exact_dict:  # $也能匹配末尾的换行符
+            result += self.exact_dict[msg[:-1]]
+        if msg:
+            result += [key for key, literal in self.prefix_dict.get(msg[0], ()) if msg.startswith(literal)]
+        if self.regex_combined:
+            combined_match = self.regex_combined.match(msg)
+            if combined_match:
+                # 合并后的正则会依次尝试每个关键字, 排在第一个匹配的关键字之前的关键字一定无法匹配
+                first_index = int(combined_match.lastgroup[1:])
+                result.append(self.regex_list[first_index][0])
+                result += [key for key, pattern in self.regex_list[first_index + 1:] if pattern.match(msg)]
+        result += [key for key, pattern in self.regex_single if pattern.match(msg)]
+        if len(result) > 1:
+            result.sort(key=self.key_order.__getitem__)
+        return result
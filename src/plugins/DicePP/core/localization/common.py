@@ -11,6 +11,18 @@ LOC_PERMISSION_DENIED_NOTICE = "group_permission_denied_notice"
 COMMON_LOCAL_TEXT[LOC_PERMISSION_DENIED_NOTICE] = "您使用该指令的权限不足。"
 COMMON_LOCAL_COMMENT[LOC_PERMISSION_DENIED_NOTICE] = "当用户企图执行一条其权限不足的命令时返回的提示"
 
+LOC_COMMAND_BUSY_NOTICE = "command_busy_notice"
+COMMON_LOCAL_TEXT[LOC_COMMAND_BUSY_NOTICE] = "骰娘正忙, 请稍后再试。"
+COMMON_LOCAL_COMMENT[LOC_COMMAND_BUSY_NOTICE] = "同时执行的耗时指令过多时返回的提示"
+
+LOC_COMMAND_TIMEOUT_NOTICE = "command_timeout_notice"
+COMMON_LOCAL_TEXT[LOC_COMMAND_TIMEOUT_NOTICE] = "指令执行超时。"
+COMMON_LOCAL_COMMENT[LOC_COMMAND_TIMEOUT_NOTICE] = "耗时指令执行超时时返回的提示"
+
+LOC_COMMAND_LOADING_NOTICE = "command_loading_notice"
+COMMON_LOCAL_TEXT[LOC_COMMAND_LOADING_NOTICE] = "骰娘刚刚启动, 相关数据还在读取中, 请稍后再试。"
+COMMON_LOCAL_COMMENT[LOC_COMMAND_LOADING_NOTICE] = "启动后指令所需的数据(牌库, 查询数据库等)还没有读取完成时返回的提示"
+
 LOC_FRIEND_ADD_NOTICE = "friend_add_notice"
 COMMON_LOCAL_TEXT[LOC_FRIEND_ADD_NOTICE] = "现在你是我的好友啦！"
 COMMON_LOCAL_COMMENT[LOC_FRIEND_ADD_NOTICE] = "用户成功添加机器人为好友时发送的语句"
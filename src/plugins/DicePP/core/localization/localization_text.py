@@ -1,38 +1,104 @@
 from pathlib import Path
+from string import Formatter
+from typing import Dict, FrozenSet, List, Optional
 import re
 import random
 
 from core.config import LOCAL_IMG_PATH
 from utils.logger import dice_log
-from utils.cq_code import get_cq_image
+from utils.asset import get_cached_cq_image
+
+LOC_IMAGE_PREFIXES = ("IMG(", "图片(")
+
+
+def replace_local_image(loc_text: str) -> str:
+    """将本地化字符串中的IMG(文件名)和图片(文件名)替换为图片CQ码"""
+    def replace_image_code(match):
+        key = match.group(1)
+        file_path = Path(LOCAL_IMG_PATH) / key
+        cq_image = get_cached_cq_image(file_path)
+        if cq_image is None:
+            dice_log(f"[LocalImage] 找不到图片 {file_path}")
+            return match.group(0)
+        return cq_image
+
+    loc_text = re.sub(r"IMG\((.{1,50}?\.[A-Za-z]{1,10}?)\)", replace_image_code, loc_text)
+    loc_text = re.sub(r"图片\((.{1,50}?\.[A-Za-z]{1,10}?)\)", replace_image_code, loc_text)
+    return loc_text
+
+
+class LocalizationTemplate:
+    """
+    预先解析过的本地化字符串, 格式化的结果与str.format相同
+    读取时解析一次, 记录用到的参数名与是否包含图片; 没有参数的字符串直接返回缓存的结果
+    有参数时仍由str.format_map完成替换, C实现的解析比在Python中逐段拼接更快
+    """
+    def __init__(self, text: str):
+        self.text = text
+        self.has_image: bool = any(prefix in text for prefix in LOC_IMAGE_PREFIXES)
+        self.fields: FrozenSet[str] = frozenset()  # 用到的参数名, 属性或下标访问只记录最前面的名字
+        self.constant: Optional[str] = None  # 没有任何参数时格式化的结果
+        self.positional: bool = False  # 是否有位置参数, format_map不支持位置参数, 需要用str.format得到相同的异常
+        self.error: str = ""  # 无法解析时的错误信息
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError as e:
+            self.error = str(e)
+            return
+        self.fields = frozenset(re.split(r"[.\[]", name, 1)[0] for _, name, _, _ in parsed if name is not None)
+        if all(name is None for _, name, _, _ in parsed):
+            self.constant = "".join(literal for literal, _, _, _ in parsed)
+        self.positional = any(not field or field.isdigit() for field in self.fields)
+
+    def render(self, kwargs: Dict) -> str:
+        """与format_loc_text的约定相同, 没有给出任何参数时返回原始字符串"""
+        if self.has_image:
+            loc_text = replace_local_image(self.text)
+            return loc_text.format(**kwargs) if kwargs else loc_text
+        if not kwargs:
+            return self.text
+        if self.constant is not None:
+            return self.constant
+        if self.positional:
+            return self.text.format(**kwargs)
+        return self.text.format_map(kwargs)
 
 
 class LocalizationText:
     def __init__(self, key: str, default_text: str = "", comment: str = ""):
         self.key = key
-        self.loc_texts: list = [default_text] if default_text else []
+        self.loc_texts: list = []
+        self.templates: List[LocalizationTemplate] = []
         self.comment = comment
+        if default_text:
+            self.add(default_text)
 
     def add(self, text: str) -> None:
         """
         增加一个可选择的本地化字符串, 调用get可以随机返回一个可选择的本地化字符串
         """
         self.loc_texts.append(text)
+        self.templates.append(LocalizationTemplate(text))
+
+    def choose(self) -> Optional[LocalizationTemplate]:
+        if len(self.templates) == 1:
+            return self.templates[0]
+        return random.choice(self.templates) if self.templates else None
 
     def get(self) -> str:
         """
         返回一个可选择的本地化字符串, 若没有可用的本地化字符串, 返回空字符串
         """
-        def replace_image_code(match):
-            key = match.group(1)
-            file_path = Path(LOCAL_IMG_PATH) / key
-            if file_path.exists():
-                return get_cq_image(file_path.read_bytes())
-            else:
-                dice_log(f"[LocalImage] 找不到图片 {file_path}")
-                return match.group(0)
-
-        loc_text = random.choice(self.loc_texts) if self.loc_texts else ""
-        loc_text = re.sub(r"IMG\((.{1,50}?\.[A-Za-z]{1,10}?)\)", replace_image_code, loc_text)
-        loc_text = re.sub(r"图片\((.{1,50}?\.[A-Za-z]{1,10}?)\)", replace_image_code, loc_text)
-        return loc_text
+        template = self.choose()
+        return template.render({}) if template else ""
+
+    def format(self, **kwargs) -> str:
+        """
+        随机选择一个可选择的本地化字符串并用kwargs格式化, 若没有可用的本地化字符串, 返回空字符串
+        """
+        template = self.choose()
+        return template.render(kwargs) if template else ""
+
+    def get_fields(self) -> FrozenSet[str]:
+        """所有可选择的本地化字符串用到的参数名"""
+        return frozenset().union(*(template.fields for template in self.templates))
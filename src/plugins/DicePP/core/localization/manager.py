@@ -1,6 +1,5 @@
-from typing import Dict, Optional
+from typing import Dict, FrozenSet, Optional
 import os
-import re
 import random
 
 import openpyxl
@@ -14,6 +13,7 @@ from core.communication import preprocess_msg
 
 from core.localization.common import COMMON_LOCAL_TEXT, COMMON_LOCAL_COMMENT
 from core.localization.localization_text import LocalizationText
+from core.localization.chat_matcher import ChatMatcher
 
 LOCAL_FILE_PATH = "localization.xlsx"
 CHAT_FILE_PATH = "chat.xlsx"
@@ -32,6 +32,9 @@ class LocalizationManager:
         self.identifier = identifier
         self.all_local_texts: Dict[str, LocalizationText] = {}
         self.all_chat_texts: Dict[str, LocalizationText] = {}
+        self.default_fields: Dict[str, FrozenSet[str]] = {}  # 默认本地化语句用到的参数名, 用来检查自定义的语句
+        self.chat_matcher: ChatMatcher = ChatMatcher()
+        self.local_file_synced: bool = False  # 本地化文件是否已包含所有关键字与最新的注释, 为True时启动时不需要重新保存
 
         # 通用的本地化语句
         for key in COMMON_LOCAL_TEXT.keys():
@@ -43,14 +46,22 @@ class LocalizationManager:
         if not workbook:
             dice_log(f"[Local] [Load] 无法找到本地化文件 {self.data_path.replace(ROOT_DATA_PATH, '~')} {self.identifier}")
             return
+        # 先在副本中读取, 再整体替换, 运行中重新读取时其他调用方看到的一直是完整的本地化语句
+        new_texts: Dict[str, LocalizationText] = dict(self.all_local_texts)
+        synced_keys = set()
         for row in local_sheet.iter_rows():
             key = str(row[0].value)  # 第一个元素为关键字
-            if key not in self.all_local_texts:  # 无效的关键字
+            if key not in new_texts:  # 无效的关键字
                 continue
-            comment: str = self.all_local_texts[key].comment  # 沿用原来的注释, 不用文件里的
-            self.all_local_texts[key] = LocalizationText(key, comment=comment)
+            comment: str = new_texts[key].comment  # 沿用原来的注释, 不用文件里的
+            if comment == (row[0].comment.text if row[0].comment else ""):
+                synced_keys.add(key)
+            new_texts[key] = LocalizationText(key, comment=comment)
             for text in [str(cell.value) for cell in row[1:] if cell.value and cell.value.strip()]:
-                self.all_local_texts[key].add(text)
+                new_texts[key].add(text)
+            self.check_loc_text(new_texts[key], self.default_fields.get(key))
+        self.all_local_texts = new_texts
+        self.local_file_synced = (len(synced_keys) == len(new_texts) == local_sheet.max_row)
         dice_log(f"[Local] [Load] 成功读取本地化文件 {self.data_path.replace(ROOT_DATA_PATH, '~')}")
         workbook.close()
 
@@ -68,30 +79,35 @@ class LocalizationManager:
         workbook.close()
 
     def load_chat(self):
-        """从xlsx中读取自定义对话文件"""
+        """从xlsx中读取自定义对话文件, 读取完成后整体替换之前的自定义对话"""
+        new_texts: Dict[str, LocalizationText] = {}
+
         def add_default_chat():
             """增加默认自定义对话"""
-            self.all_chat_texts[DEFAULT_CHAT_KEY] = LocalizationText(DEFAULT_CHAT_KEY, comment=DEFAULT_CHAT_COMMENT)
+            new_texts[DEFAULT_CHAT_KEY] = LocalizationText(DEFAULT_CHAT_KEY, comment=DEFAULT_CHAT_COMMENT)
             for default_text in DEFAULT_CHAT_TEXT:
-                self.all_chat_texts[DEFAULT_CHAT_KEY].add(default_text)
+                new_texts[DEFAULT_CHAT_KEY].add(default_text)
 
         workbook, chat_sheet = load_sheet_from_path(self.chat_data_path, self.identifier)
         if not workbook:
             dice_log(f"[Local] [ChatLoad] 无法找到自定义对话文件 {self.chat_data_path.replace(ROOT_DATA_PATH, '.')} {self.identifier}")
             add_default_chat()
+            self.all_chat_texts, self.chat_matcher = new_texts, ChatMatcher(new_texts.keys())
             return
 
         for row in chat_sheet.iter_rows():
             key = str(row[0].value)  # 第一个元素为关键字
             key = preprocess_msg(key)  # 对key做一下预处理, 因为匹配的目标是预处理过后的
             comment: str = row[0].comment  # 沿用文件里的注释
-            self.all_chat_texts[key] = LocalizationText(key, comment=comment)
+            new_texts[key] = LocalizationText(key, comment=comment)
             for text in [str(cell.value) for cell in row[1:] if cell.value and str(cell.value).strip()]:
-                self.all_chat_texts[key].add(text)
+                new_texts[key].add(text)
+            self.check_loc_text(new_texts[key])
 
-        has_chat: bool = (len(self.all_chat_texts) != 0)
+        has_chat: bool = (len(new_texts) != 0)
         if not has_chat:
             add_default_chat()
+        self.all_chat_texts, self.chat_matcher = new_texts, ChatMatcher(new_texts.keys())
         dice_log(f"[Local] [ChatLoad] 成功读取自定义对话文件 {self.chat_data_path.replace(ROOT_DATA_PATH, '~')}")
         workbook.close()
 
@@ -117,6 +133,22 @@ class LocalizationManager:
             comment: 对本地化语句的注释
         """
         self.all_local_texts[key] = LocalizationText(key, default_text, comment)
+        self.default_fields[key] = self.all_local_texts[key].get_fields()
+
+    @staticmethod
+    def check_loc_text(loc_text: LocalizationText, valid_fields: Optional[FrozenSet[str]] = None):
+        """
+        读取时检查本地化语句能否正常格式化, 有问题时仅记录日志, 不影响读取
+        Args:
+            loc_text: 要检查的本地化语句
+            valid_fields: 可以使用的参数名, 一般为默认语句中的参数, 为None时不检查参数名
+        """
+        for template in loc_text.templates:
+            if template.error:
+                dice_log(f"[Local] [Check] {loc_text.key} 的语句无法解析({template.error}): {template.text}")
+            elif valid_fields is not None and not template.fields <= valid_fields:
+                unknown_fields = ", ".join(sorted(template.fields - valid_fields))
+                dice_log(f"[Local] [Check] {loc_text.key} 的语句中有默认语句没有的参数 {unknown_fields}: {template.text}")
 
     def get_loc_text(self, key: str) -> LocalizationText:
         """
@@ -133,11 +165,7 @@ class LocalizationManager:
             key: 本地化语句的关键字
             **kwargs: 本地化语句需要的参数, 可以传不会用到的参数
         """
-        loc_text: LocalizationText = self.get_loc_text(key)
-        if kwargs:
-            return loc_text.get().format(**kwargs)
-        else:
-            return loc_text.get()
+        return self.get_loc_text(key).format(**kwargs)
 
     def process_chat(self, msg: str, **kwargs) -> str:
         """
@@ -148,18 +176,13 @@ class LocalizationManager:
         Returns:
             如果msg能与任意自定义聊天关键字匹配, 返回一个随机回复, 否则返回空字符串
         """
-        valid_loc_text_list = []
-        for key, loc_text in self.all_chat_texts.items():
-            result = re.match(key, msg)
-            if result:
-                valid_loc_text_list.append(loc_text)
+        # 重新读取时两者先后被替换, 匹配到的关键字可能暂时不在all_chat_texts中
+        all_chat_texts = self.all_chat_texts
+        valid_loc_text_list = [all_chat_texts[key] for key in self.chat_matcher.match(msg) if key in all_chat_texts]
 
         loc_text: Optional[LocalizationText] = random.choice(valid_loc_text_list) if valid_loc_text_list else None
         if loc_text:
-            if kwargs:
-                return loc_text.get().format(**kwargs)
-            else:
-                return loc_text.get()
+            return loc_text.format(**kwargs)
         return ""
 
 
@@ -0,0 +1,118 @@
+import unittest
+import random
+import re
+import sys
+from typing import Dict, List
+
+from core.localization.chat_matcher import ChatMatcher
+from core.localization.localization_text import LocalizationTemplate, replace_local_image
+
+CHAT_KEYS = [
+    "^你好$", "你好", "^你好", "早上好$", "^晚安\\$", "^$", "", "^", "$",
+    "^abc\n$", "^(早|晚)上好", ".*骰子.*", "^.r", "\\.r\\d+", "^hello$|^hi$", "(?i)hello", "(?i:HI)",
+    "^(a)\\1$", "^(?P<name>x)y", "^(?(1)a|b)", "a{2,}", "[你我]们", "^在吗[?？]?$", "(?=abc)a",
+    "你好", "^你好$",  # 重复的关键字
+]
+CHAT_MESSAGES = [
+    "", "\n", "你好", "你好\n", "你好啊", "早上好", "早上好\n", "晚上好", "晚安$", "晚安", "abc\n", "abc\n\n", "abc",
+    ".r", ".r20", ".rd", "扔骰子吧", "hello", "HELLO", "hi", "HI", "hi\n", "aa", "a", "xy", "b", "我们", "在吗", "在吗？",
+]
+
+LOC_TEXTS = [
+    "", "普通文本", "{{转义的括号}}", "}}{{", "{name}掷出了{result}", "{name}{name}", "{name!r:>10}", "{value:.2f}",
+    "{a.real}+{a.imag}", "{b[0]}与{b[1]}", "{c[key]}", "{}", "{0}", "{name}和{}", "{不存在}", "{", "}", "{name",
+    "{name}{{", "IMG(不存在的图片.png)", "IMG(不存在的图片.png){name}", "图片(不存在.jpg){{}}",
+]
+LOC_KWARGS = [{}, {"name": "小明", "result": 20, "value": 3.14159, "a": 1 + 2j, "b": ["x", "y"], "c": {"key": "v"}},
+              {"name": "小明"}, {"unused": 0}]
+
+
+def legacy_match(keys: List[str], msg: str) -> List[str]:
+    """之前逐个调用re.match的写法"""
+    result = []
+    for key in dict.fromkeys(keys):
+        try:
+            if re.match(key, msg):
+                result.append(key)
+        except re.error:
+            pass
+    return result
+
+
+def legacy_render(text: str, kwargs: Dict) -> str:
+    """之前每次都替换图片再调用str.format的写法"""
+    loc_text = replace_local_image(text)
+    return loc_text.format(**kwargs) if kwargs else loc_text
+
+
+class MyTestCase(unittest.TestCase):
+    def test0_chat_matcher(self):
+        print("开始测试自定义对话匹配")
+        matcher = ChatMatcher(CHAT_KEYS)
+        for msg in CHAT_MESSAGES:
+            self.assertEqual(matcher.match(msg), legacy_match(CHAT_KEYS, msg), f"消息: {msg!r}")
+        self.assertTrue(matcher.regex_single)  # 含有编号引用, 命名分组等的关键字单独匹配
+        self.assertIsNotNone(matcher.regex_combined)
+        print("自定义对话匹配结果正确")
+
+    def test1_chat_matcher_fallback(self):
+        print("开始测试无法合并时的匹配")
+        keys = ["^x", "^y+", "(?i)ab"]
+        matcher = ChatMatcher(keys[:2])
+        # 跳过add_key的检查, 直接加入一个合并后会出现在中间的全局标记, 模拟合并失败
+        matcher.key_order[keys[2]] = len(matcher.key_order)
+        matcher.regex_list.append((keys[2], re.compile(keys[2])))
+        matcher.compile()
+        if sys.version_info >= (3, 11):  # 更早的版本中只会警告, 合并不会失败
+            self.assertIsNone(matcher.regex_combined)
+        for msg in ["ab", "AB", "x", "yy", "z"]:
+            self.assertEqual(matcher.match(msg), legacy_match(keys, msg), f"消息: {msg!r}")
+        print("无法合并时的匹配结果正确")
+
+    def test2_chat_matcher_random(self):
+        print("开始测试随机关键字匹配")
+        rng = random.Random(0)
+        parts = ["a", "b", "你", "^", "$", ".", "*", "+", "?", "\\$", "\\.", "[ab]", "(a|b)", "\n", "{2}"]
+        keys = []
+        while len(keys) < 300:
+            key = "".join(rng.choice(parts) for _ in range(rng.randint(0, 4)))
+            try:
+                re.compile(key)
+            except re.error:  # 无效的关键字在读取时就会被忽略
+                continue
+            keys.append(key)
+        matcher = ChatMatcher(keys)
+        messages = ["".join(rng.choice(["a", "b", "你", "$", ".", "\n"]) for _ in range(rng.randint(0, 4)))
+                    for _ in range(500)]
+        for msg in messages:
+            self.assertEqual(matcher.match(msg), legacy_match(keys, msg), f"消息: {msg!r}")
+        print("随机关键字匹配结果正确")
+
+    def test3_loc_template(self):
+        print("开始测试本地化字符串格式化")
+        for text in LOC_TEXTS:
+            template = LocalizationTemplate(text)
+            for kwargs in LOC_KWARGS:
+                try:
+                    expected = legacy_render(text, kwargs)
+                except Exception as e:
+                    with self.assertRaises(type(e), msg=f"文本: {text!r} 参数: {kwargs}"):
+                        template.render(kwargs)
+                    continue
+                self.assertEqual(template.render(kwargs), expected, f"文本: {text!r} 参数: {kwargs}")
+        print("格式化结果与之前相同")
+
+    def test4_loc_template_parse(self):
+        print("开始测试本地化字符串解析")
+        self.assertEqual(LocalizationTemplate("{{a}}").constant, "{a}")
+        self.assertEqual(LocalizationTemplate("{a.real}{b[0]}{c!r}").fields, {"a", "b", "c"})
+        self.assertTrue(LocalizationTemplate("{}").positional)
+        self.assertTrue(LocalizationTemplate("{0}").positional)
+        self.assertFalse(LocalizationTemplate("{a}").positional)
+        self.assertTrue(LocalizationTemplate("IMG(a.png)").has_image)
+        self.assertTrue(LocalizationTemplate("{").error)
+        print("本地化字符串解析正确")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,3 +2,7 @@ from core.statistics.basic_stat import StatElementBase, UserCommandStatInfo, Rol
     MetaStatInfo
 from core.statistics.user_stat import UserMetaInfo, UserStatInfo
 from core.statistics.group_stat import GroupMetaInfo, GroupStatInfo
+from core.statistics.history import StatHistory, STAT_HISTORY_FILE, STAT_KIND_META, STAT_KIND_USER, STAT_KIND_GROUP,\
+    METRIC_MSG, METRIC_ROLL, METRIC_CMD_PREFIX, METRIC_D20_PREFIX
+from core.statistics.activity import ActivityIndex
+from core.statistics.aggregator import StatAggregator
@@ -0,0 +1,156 @@
+"""
+用户与群聊的活跃度索引, 记录每个统计目标最后活跃和最后使用指令的日期
+每日统计更新只需要处理索引中有未归零计数的目标, 过期清理只需要对最后使用指令的日期做区间查询
+"""
+
+import sqlite3
+from typing import Iterable, List, Set, Tuple
+
+from utils.logger import dice_log
+
+from core.statistics.history import StatHistory
+
+ACTIVITY_DIRTY_MAX = 2  # 有新计数的目标需要经过两次每日更新(当日->昨日->清零)才会不再需要更新
+
+ActivityRow = Tuple[str, int, int]  # entity, active_day, cmd_day
+RolloverRow = Tuple[str, int, int]  # entity, roll_day, dirty
+
+
+class ActivityIndex:
+    """
+    与统计历史共用同一个sqlite数据库, 每个统计目标一行:
+    active_day为最后一次收到消息, 指令或掷骰的日期, cmd_day为最后一次使用指令的日期,
+    roll_day为上一次进行每日更新的日期, dirty为还需要进行每日更新的次数
+    """
+    def __init__(self, history: StatHistory):
+        self.history = history
+        self.__is_init = False
+
+    def get_connection(self) -> sqlite3.Connection:
+        conn = self.history.get_connection()
+        if not self.__is_init:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stat_activity (
+                    kind TEXT NOT NULL,
+                    entity TEXT NOT NULL,
+                    active_day INTEGER NOT NULL,
+                    cmd_day INTEGER NOT NULL,
+                    roll_day INTEGER NOT NULL,
+                    dirty INTEGER NOT NULL,
+                    PRIMARY KEY (kind, entity)
+                ) WITHOUT ROWID;
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stat_activity_cmd ON stat_activity(kind, cmd_day);")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stat_activity_dirty ON stat_activity(kind, dirty, roll_day);")
+            conn.commit()
+            self.__is_init = True
+        return conn
+
+    def record(self, day: int, kind: str, active_entities: Iterable[str], cmd_entities: Iterable[str]) -> None:
+        """
+        记录统计目标在day这一天有新的计数, cmd_entities中的目标同时还使用了指令
+        之前计数已经归零的目标, 其计数从day开始算起
+        """
+        cmd_set = set(cmd_entities)
+        params = [(kind, entity, day, day if entity in cmd_set else 0, day, ACTIVITY_DIRTY_MAX) for entity in active_entities]
+        if not params:
+            return
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO stat_activity(kind, entity, active_day, cmd_day, roll_day, dirty) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(kind, entity) DO UPDATE SET active_day = MAX(active_day, excluded.active_day), "
+                    "cmd_day = MAX(cmd_day, excluded.cmd_day), "
+                    "roll_day = CASE WHEN dirty = 0 THEN excluded.roll_day ELSE roll_day END, dirty = excluded.dirty;",
+                    params,
+                )
+        except sqlite3.Error as e:
+            dice_log(f"[Statistics] [Activity] 写入活跃度索引失败: {e}")
+
+    def insert(self, kind: str, rows: Iterable[ActivityRow]) -> None:
+        """
+        为尚未加入索引的统计目标建立索引, 已经在索引中的目标不受影响
+        """
+        params = [(kind, entity, active_day, cmd_day, active_day, ACTIVITY_DIRTY_MAX if active_day else 0)
+                  for entity, active_day, cmd_day in rows]
+        if not params:
+            return
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO stat_activity(kind, entity, active_day, cmd_day, roll_day, dirty) "
+                    "VALUES (?, ?, ?, ?, ?, ?);",
+                    params,
+                )
+        except sqlite3.Error as e:
+            dice_log(f"[Statistics] [Activity] 建立活跃度索引失败: {e}")
+
+    def delete(self, kind: str, entities: Iterable[str]) -> None:
+        params = [(kind, entity) for entity in entities]
+        if not params:
+            return
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.executemany("DELETE FROM stat_activity WHERE kind = ? AND entity = ?;", params)
+        except sqlite3.Error as e:
+            dice_log(f"[Statistics] [Activity] 删除活跃度索引失败: {e}")
+
+    def get_entities(self, kind: str) -> Set[str]:
+        """返回索引中某一类的所有统计目标"""
+        cursor = self.get_connection().execute("SELECT entity FROM stat_activity WHERE kind = ?;", (kind,))
+        return {entity for entity, in cursor.fetchall()}
+
+    def query_rollover(self, kind: str, today: int) -> List[RolloverRow]:
+        """查询今天还没有进行每日更新, 且仍有未归零计数的统计目标"""
+        cursor = self.get_connection().execute(
+            "SELECT entity, roll_day, dirty FROM stat_activity WHERE kind = ? AND dirty > 0 AND roll_day < ?;",
+            (kind, today),
+        )
+        return cursor.fetchall()
+
+    def mark_rolled(self, kind: str, today: int, rows: Iterable[Tuple[str, int]]) -> None:
+        """
+        记录统计目标已经在today完成了每日更新
+        Args:
+            kind: 统计目标的种类
+            today: 当前的日期序号
+            rows: (entity, dirty)的列表, dirty为更新后还需要进行每日更新的次数
+        """
+        params = [(today, dirty, kind, entity) for entity, dirty in rows]
+        if not params:
+            return
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.executemany("UPDATE stat_activity SET roll_day = ?, dirty = ? WHERE kind = ? AND entity = ?;", params)
+        except sqlite3.Error as e:
+            dice_log(f"[Statistics] [Activity] 更新活跃度索引失败: {e}")
+
+    def query_inactive(self, kind: str, before_day: int, limit: int = 0) -> List[Tuple[str, int]]:
+        """
+        查询在before_day之前(不含)最后一次使用指令的统计目标, 按最后使用指令的日期从早到晚排序
+        Args:
+            kind: 统计目标的种类
+            before_day: 日期序号
+            limit: 最多返回多少个, 为0代表不限制
+        Returns:
+            (entity, cmd_day)的列表, 从未使用过指令的目标cmd_day为0
+        """
+        sql = "SELECT entity, cmd_day FROM stat_activity WHERE kind = ? AND cmd_day < ? ORDER BY cmd_day"
+        params: Tuple = (kind, before_day)
+        if limit > 0:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return self.get_connection().execute(sql + ";", params).fetchall()
+
+    def count_inactive(self, kind: str, before_day: int) -> int:
+        """查询在before_day之前(不含)最后一次使用指令的统计目标数量"""
+        cursor = self.get_connection().execute(
+            "SELECT COUNT(*) FROM stat_activity WHERE kind = ? AND cmd_day < ?;", (kind, before_day)
+        )
+        return cursor.fetchone()[0]
@@ -0,0 +1,165 @@
+"""
+统计数据的批量累计器, 处理消息时只在内存中做整数自增, 定期合并到持久化的统计对象中
+"""
+
+from array import array
+from typing import Dict, List, Iterable, Optional
+
+from utils.logger import dice_log
+from utils.time import get_current_date_int, get_current_day_ordinal
+
+from core.data import DataManager, DataManagerError
+from core.data import DC_META, DC_USER_DATA, DC_GROUP_DATA, DCK_META_STAT, DCK_USER_STAT, DCK_GROUP_STAT
+from core.statistics.basic_stat import MetaStatInfo
+from core.statistics.user_stat import UserStatInfo
+from core.statistics.group_stat import GroupStatInfo
+from core.statistics.history import StatHistory, HistoryRow, STAT_KIND_META, STAT_KIND_USER, STAT_KIND_GROUP,\
+    METRIC_MSG, METRIC_ROLL, METRIC_CMD_PREFIX, METRIC_D20_PREFIX
+from core.statistics.activity import ActivityIndex
+
+D20_FACE = 20
+_D20_ZERO = array("q", [0] * D20_FACE)
+
+
+class StatCounterTable:
+    """
+    一类统计目标(用户或群聊)的计数表, 每个目标分配一个槽位, 计数保存在按槽位索引的数组中
+    """
+    def __init__(self):
+        self.slot_dict: Dict[str, int] = {}
+        self.msg = array("q")
+        self.roll = array("q")
+        self.d20 = array("q")  # 每个槽位占用D20_FACE个元素
+        self.cmd: Dict[int, Dict[int, int]] = {}  # 槽位 -> {指令标志: 次数}, 指令远少于消息, 用字典即可
+
+    def get_slot(self, key: str) -> int:
+        slot = self.slot_dict.get(key)
+        if slot is None:
+            slot = len(self.slot_dict)
+            self.slot_dict[key] = slot
+            self.msg.append(0)
+            self.roll.append(0)
+            self.d20.extend(_D20_ZERO)
+        return slot
+
+    def record_cmd(self, slot: int, flag: int) -> None:
+        flag_dict = self.cmd.get(slot)
+        if flag_dict is None:
+            flag_dict = self.cmd[slot] = {}
+        flag_dict[flag] = flag_dict.get(flag, 0) + 1
+
+    def record_roll(self, slot: int, times: int, d20_list: Iterable[int]) -> None:
+        self.roll[slot] += times
+        base = slot * D20_FACE - 1
+        for d20_val in d20_list:
+            if 1 <= d20_val <= D20_FACE:
+                self.d20[base + d20_val] += 1
+
+
+class StatAggregator:
+    """
+    累计消息数量, 指令次数与掷骰结果, 在flush时一次性合并到DataManager中的MetaStatInfo, UserStatInfo与GroupStatInfo
+    读取统计信息前应当先调用flush, 否则会看不到最近一段时间的数据
+    如果给出了history, 合并时还会把这段时间的计数追加到按天记录的统计历史中, 给出了activity则会同时更新活跃度索引
+    """
+    def __init__(self, data_manager: DataManager, history: Optional[StatHistory] = None,
+                 activity: Optional[ActivityIndex] = None):
+        self.data_manager = data_manager
+        self.history = history
+        self.activity = activity
+        self.suspended: bool = False  # 为True时暂不合并, 用于等待每日更新完成
+        self.meta_msg: int = 0
+        self.meta_cmd: Dict[int, int] = {}
+        self.user_table = StatCounterTable()
+        self.group_table = StatCounterTable()
+
+    def record_msg(self, user_id: str, group_id: str) -> None:
+        """记录收到一条消息, group_id为空代表私聊"""
+        self.meta_msg += 1
+        self.user_table.msg[self.user_table.get_slot(user_id)] += 1
+        if group_id:
+            self.group_table.msg[self.group_table.get_slot(group_id)] += 1
+
+    def record_cmd(self, user_id: str, group_id: str, flag: int) -> None:
+        """记录执行了一条拥有flag标志的指令"""
+        self.meta_cmd[flag] = self.meta_cmd.get(flag, 0) + 1
+        self.user_table.record_cmd(self.user_table.get_slot(user_id), flag)
+        if group_id:
+            self.group_table.record_cmd(self.group_table.get_slot(group_id), flag)
+
+    def record_roll(self, user_id: str, group_id: str, times: int, d20_list: List[int]) -> None:
+        """记录掷骰次数与单个D20的结果"""
+        self.user_table.record_roll(self.user_table.get_slot(user_id), times, d20_list)
+        if group_id:
+            self.group_table.record_roll(self.group_table.get_slot(group_id), times, d20_list)
+
+    def has_pending(self) -> bool:
+        return bool(self.meta_msg or self.meta_cmd or self.user_table.slot_dict or self.group_table.slot_dict)
+
+    def flush(self, force: bool = False) -> None:
+        """
+        将累计的数据合并到持久化的统计对象中并清空计数
+        Args:
+            force: 为True时即使处于暂停状态也会合并
+        """
+        if not self.has_pending() or (self.suspended and not force):
+            return
+        update_time = get_current_date_int()
+        meta_msg, meta_cmd = self.meta_msg, self.meta_cmd
+        user_table, group_table = self.user_table, self.group_table
+        self.meta_msg, self.meta_cmd = 0, {}
+        self.user_table, self.group_table = StatCounterTable(), StatCounterTable()
+
+        try:
+            meta_stat: MetaStatInfo = self.data_manager.get_data(DC_META, [DCK_META_STAT], default_gen=MetaStatInfo, get_ref=True)
+            if meta_msg:
+                meta_stat.msg.inc(meta_msg, update_time)
+            for flag, times in meta_cmd.items():
+                meta_stat.cmd.record_flag(flag, times, update_time)
+        except (DataManagerError, AttributeError) as e:
+            dice_log(f"[Statistics] [Flush] 无法更新全局统计: {e}")
+        self.__flush_table(user_table, DC_USER_DATA, DCK_USER_STAT, UserStatInfo, update_time)
+        self.__flush_table(group_table, DC_GROUP_DATA, DCK_GROUP_STAT, GroupStatInfo, update_time)
+
+        if self.history:
+            rows: List[HistoryRow] = [(STAT_KIND_META, "", METRIC_MSG, meta_msg)]
+            rows += [(STAT_KIND_META, "", f"{METRIC_CMD_PREFIX}{flag}", times) for flag, times in meta_cmd.items()]
+            rows += self.__get_history_rows(user_table, STAT_KIND_USER)
+            rows += self.__get_history_rows(group_table, STAT_KIND_GROUP)
+            self.history.append(get_current_day_ordinal(), rows)
+        if self.activity:
+            today = get_current_day_ordinal()
+            for table, kind in ((user_table, STAT_KIND_USER), (group_table, STAT_KIND_GROUP)):
+                cmd_entities = [key for key, slot in table.slot_dict.items() if slot in table.cmd]
+                self.activity.record(today, kind, table.slot_dict.keys(), cmd_entities)
+
+    @staticmethod
+    def __get_history_rows(table: StatCounterTable, kind: str) -> List[HistoryRow]:
+        rows: List[HistoryRow] = []
+        for key, slot in table.slot_dict.items():
+            rows.append((kind, key, METRIC_MSG, table.msg[slot]))
+            for flag, times in table.cmd.get(slot, {}).items():
+                rows.append((kind, key, f"{METRIC_CMD_PREFIX}{flag}", times))
+            if table.roll[slot]:
+                rows.append((kind, key, METRIC_ROLL, table.roll[slot]))
+                base = slot * D20_FACE
+                for index in range(D20_FACE):
+                    rows.append((kind, key, f"{METRIC_D20_PREFIX}{index + 1}", table.d20[base + index]))
+        return rows
+
+    def __flush_table(self, table: StatCounterTable, target: str, stat_key: str, stat_cls, update_time: int) -> None:
+        for key, slot in table.slot_dict.items():
+            try:
+                stat = self.data_manager.get_data(target, [key, stat_key], default_gen=stat_cls, get_ref=True)
+                if table.msg[slot]:
+                    stat.msg.inc(table.msg[slot], update_time)
+                for flag, times in table.cmd.get(slot, {}).items():
+                    stat.cmd.record_flag(flag, times, update_time)
+                if table.roll[slot]:
+                    stat.roll.times.inc(table.roll[slot], update_time)
+                    base = slot * D20_FACE
+                    for index in range(D20_FACE):
+                        if table.d20[base + index]:
+                            stat.roll.d20.record(index + 1, table.d20[base + index])
+            except (DataManagerError, AttributeError) as e:
+                dice_log(f"[Statistics] [Flush] 无法更新{target}中{key}的统计: {e}")
@@ -1,6 +1,6 @@
 import json
 import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from core.data import JsonObject, custom_json_object
 
@@ -34,10 +34,10 @@ class StatElementBase:
         res.update_time = max(self.update_time, other.update_time)
         return res
 
-    def inc(self, time: int = 1):
+    def inc(self, time: int = 1, update_time: Optional[int] = None):
         self.cur_day_val += time
         self.total_val += time
-        self.update_time = get_current_date_int()
+        self.update_time = update_time if update_time is not None else get_current_date_int()
 
     def clr(self):
         self.cur_day_val = 0
@@ -88,13 +88,20 @@ class UserCommandStatInfo:
         return res
 
     def record(self, command):
-        from core.command import UserCommandBase, DPP_COMMAND_FLAG_DICT
+        from core.command import UserCommandBase
         command: UserCommandBase
+        self.record_flag(command.flag)
+
+    def record_flag(self, command_flag: int, times: int = 1, update_time: Optional[int] = None):
+        """
+        记录拥有command_flag的指令被执行了times次
+        """
+        from core.command import DPP_COMMAND_FLAG_DICT
         for flag in DPP_COMMAND_FLAG_DICT.keys():
-            if flag & command.flag:
-                if command.flag not in self.flag_dict:
-                    self.flag_dict[command.flag] = StatElementBase()
-                self.flag_dict[command.flag].inc()
+            if flag & command_flag:
+                if command_flag not in self.flag_dict:
+                    self.flag_dict[command_flag] = StatElementBase()
+                self.flag_dict[command_flag].inc(times, update_time)
 
     def update(self, past_days: int = 1):
         for elem in self.flag_dict.values():
@@ -119,14 +126,14 @@ class D20StatInfo:
         self.last_list = [0] * 20
         self.total_list = [0] * 20
 
-    def record(self, d20_val: int):
+    def record(self, d20_val: int, times: int = 1):
         if d20_val < 1 or d20_val > 20:
             return
-        self.cur_list[d20_val-1] += 1
-        self.total_list[d20_val-1] += 1
+        self.cur_list[d20_val-1] += times
+        self.total_list[d20_val-1] += times
 
-    def update(self):
-        self.last_list = self.cur_list
+    def update(self, past_days: int = 1):
+        self.last_list = self.cur_list if past_days == 1 else [0] * 20
         self.cur_list = [0] * 20
 
 
@@ -150,9 +157,9 @@ class RollStatInfo:
         self.times.inc()
         self.d20.record(d20_val)
 
-    def update(self):
-        self.times.update()
-        self.d20.update()
+    def update(self, past_days: int = 1):
+        self.times.update(past_days)
+        self.d20.update(past_days)
 
 
 @custom_json_object
@@ -68,7 +68,7 @@ class GroupStatInfo(JsonObject):
     def is_valid(self):
         raise NotImplementedError()
 
-    def daily_update(self):
-        self.msg.update()
-        self.cmd.update()
-        self.roll.update()
+    def daily_update(self, past_days: int = 1):
+        self.msg.update(past_days)
+        self.cmd.update(past_days)
+        self.roll.update(past_days)
@@ -0,0 +1,154 @@
+"""
+按天保存统计计数的时序数据库, 用于查询一段时间内的统计信息
+数据由StatAggregator在合并统计时追加, 超过一定天数的数据会被合并为按周的数据, 更早的数据会被删除
+"""
+
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.logger import dice_log
+
+STAT_HISTORY_FILE = "stat_history.db"
+
+STAT_KIND_META = "meta"
+STAT_KIND_USER = "user"
+STAT_KIND_GROUP = "group"
+
+METRIC_MSG = "msg"
+METRIC_ROLL = "roll"
+METRIC_CMD_PREFIX = "cmd_"  # 后接指令标志
+METRIC_D20_PREFIX = "d20_"  # 后接D20的点数
+
+SPAN_DAY = 1
+SPAN_WEEK = 7
+
+HistoryRow = Tuple[str, str, str, int]  # kind, entity, metric, value
+
+
+class StatHistory:
+    """
+    每一行记录某个统计目标在某一天(或某一周)的某项计数, 以(kind, metric, day)建立索引方便做区间查询
+    """
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: sqlite数据库文件路径
+        """
+        self.db_path = db_path
+        self.__conn: Optional[sqlite3.Connection] = None
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self.__conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.isdir(db_dir):
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL;")
+                conn.execute("PRAGMA synchronous=NORMAL;")
+            except sqlite3.Error:
+                pass
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stat_history (
+                    kind TEXT NOT NULL,
+                    entity TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    day INTEGER NOT NULL, -- date.toordinal(), 按周保存时为该周第一天
+                    span INTEGER NOT NULL, -- 1为按天, 7为按周
+                    val INTEGER NOT NULL,
+                    PRIMARY KEY (kind, entity, metric, day, span)
+                ) WITHOUT ROWID;
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stat_history_metric ON stat_history(kind, metric, day);")
+            conn.commit()
+            self.__conn = conn
+        return self.__conn
+
+    def close(self) -> None:
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+    def append(self, day: int, rows: Iterable[HistoryRow]) -> None:
+        """
+        将计数累加到day对应的记录中
+        Args:
+            day: 日期序号
+            rows: (kind, entity, metric, value)的列表
+        """
+        params = [(kind, entity, metric, day, SPAN_DAY, val) for kind, entity, metric, val in rows if val]
+        if not params:
+            return
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO stat_history(kind, entity, metric, day, span, val) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(kind, entity, metric, day, span) DO UPDATE SET val = val + excluded.val;",
+                    params,
+                )
+        except sqlite3.Error as e:
+            dice_log(f"[Statistics] [History] 写入统计历史失败: {e}")
+
+    def query_daily(self, kind: str, entity: str, metric: str, start_day: int, end_day: int) -> Dict[int, int]:
+        """
+        查询[start_day, end_day]区间内某项计数的每日数据, 已经按周合并的数据记在该周的第一天
+        """
+        cursor = self.get_connection().execute(
+            "SELECT day, SUM(val) FROM stat_history WHERE kind = ? AND entity = ? AND metric = ? "
+            "AND day BETWEEN ? AND ? GROUP BY day ORDER BY day;",
+            (kind, entity, metric, start_day, end_day),
+        )
+        return {day: val for day, val in cursor.fetchall()}
+
+    def query_total(self, kind: str, entity: str, start_day: int, end_day: int) -> Dict[str, int]:
+        """
+        查询[start_day, end_day]区间内某个统计目标所有计数的总和, 返回metric到总和的字典
+        """
+        cursor = self.get_connection().execute(
+            "SELECT metric, SUM(val) FROM stat_history WHERE kind = ? AND entity = ? "
+            "AND day BETWEEN ? AND ? GROUP BY metric;",
+            (kind, entity, start_day, end_day),
+        )
+        return {metric: val for metric, val in cursor.fetchall()}
+
+    def query_top(self, kind: str, metric: str, start_day: int, end_day: int, limit: int) -> List[Tuple[str, int]]:
+        """
+        查询[start_day, end_day]区间内某项计数总和最高的limit个统计目标
+        """
+        cursor = self.get_connection().execute(
+            "SELECT entity, SUM(val) AS total FROM stat_history WHERE kind = ? AND metric = ? "
+            "AND day BETWEEN ? AND ? GROUP BY entity ORDER BY total DESC LIMIT ?;",
+            (kind, metric, start_day, end_day, limit),
+        )
+        return [(entity, total) for entity, total in cursor.fetchall()]
+
+    def maintain(self, today: int, keep_day: int, downsample_day: int) -> None:
+        """
+        合并与清理历史数据
+        Args:
+            today: 当前的日期序号
+            keep_day: 保留多少天内的数据, 为0代表永久保留
+            downsample_day: 超过多少天的按天数据会被合并为按周的数据, 为0代表不合并
+        """
+        try:
+            conn = self.get_connection()
+            with conn:
+                if downsample_day > 0:
+                    border = today - downsample_day
+                    # date.toordinal()为1的日期是星期一, 因此(day - 1) % 7即为星期几
+                    conn.execute(
+                        "INSERT INTO stat_history(kind, entity, metric, day, span, val) "
+                        "SELECT kind, entity, metric, day - (day - 1) % 7, ?, SUM(val) FROM stat_history "
+                        "WHERE span = ? AND day < ? GROUP BY kind, entity, metric, day - (day - 1) % 7 "
+                        "ON CONFLICT(kind, entity, metric, day, span) DO UPDATE SET val = val + excluded.val;",
+                        (SPAN_WEEK, SPAN_DAY, border),
+                    )
+                    conn.execute("DELETE FROM stat_history WHERE span = ? AND day < ?;", (SPAN_DAY, border))
+                if keep_day > 0:
+                    conn.execute("DELETE FROM stat_history WHERE day < ?;", (today - keep_day,))
+        except sqlite3.Error as e:
+            dice_log(f"[Statistics] [History] 整理统计历史失败: {e}")
@@ -0,0 +1,78 @@
+import unittest
+import os
+import shutil
+
+from core.statistics.history import StatHistory, STAT_KIND_USER, STAT_KIND_GROUP
+from core.statistics.activity import ActivityIndex, ACTIVITY_DIRTY_MAX
+
+test_path = os.path.join(os.path.dirname(__file__), 'test_data')
+
+TODAY = 740000  # 任意的日期序号
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.history = StatHistory(os.path.join(test_path, "stat_history.db"))
+        self.activity = ActivityIndex(self.history)
+
+    def tearDown(self) -> None:
+        self.history.close()
+        shutil.rmtree(test_path, ignore_errors=True)
+
+    def get_row(self, kind: str, entity: str):
+        return self.activity.get_connection().execute(
+            "SELECT active_day, cmd_day, roll_day, dirty FROM stat_activity WHERE kind = ? AND entity = ?;", (kind, entity)
+        ).fetchone()
+
+    def test0_record(self):
+        print("开始测试记录活跃度")
+        self.activity.record(TODAY - 3, STAT_KIND_USER, ["A", "B"], ["A"])
+        self.assertEqual(self.get_row(STAT_KIND_USER, "A"), (TODAY - 3, TODAY - 3, TODAY - 3, ACTIVITY_DIRTY_MAX))
+        self.assertEqual(self.get_row(STAT_KIND_USER, "B"), (TODAY - 3, 0, TODAY - 3, ACTIVITY_DIRTY_MAX))
+        # 计数还没有归零时, 再次记录不改变上一次每日更新的日期
+        self.activity.record(TODAY - 1, STAT_KIND_USER, ["A"], [])
+        self.assertEqual(self.get_row(STAT_KIND_USER, "A"), (TODAY - 1, TODAY - 3, TODAY - 3, ACTIVITY_DIRTY_MAX))
+        # 计数归零后, 从新的日期开始算起
+        self.activity.mark_rolled(STAT_KIND_USER, TODAY - 1, [("B", 0)])
+        self.activity.record(TODAY, STAT_KIND_USER, ["B"], ["B"])
+        self.assertEqual(self.get_row(STAT_KIND_USER, "B"), (TODAY, TODAY, TODAY, ACTIVITY_DIRTY_MAX))
+        # 不同种类互不影响
+        self.assertIsNone(self.get_row(STAT_KIND_GROUP, "A"))
+        print("记录活跃度正确")
+
+    def test1_insert(self):
+        print("开始测试建立索引")
+        self.activity.record(TODAY, STAT_KIND_USER, ["A"], ["A"])
+        self.activity.insert(STAT_KIND_USER, [("A", 1, 1), ("B", TODAY - 5, TODAY - 6), ("C", 0, 0)])
+        self.assertEqual(self.get_row(STAT_KIND_USER, "A"), (TODAY, TODAY, TODAY, ACTIVITY_DIRTY_MAX))
+        self.assertEqual(self.get_row(STAT_KIND_USER, "B"), (TODAY - 5, TODAY - 6, TODAY - 5, ACTIVITY_DIRTY_MAX))
+        self.assertEqual(self.get_row(STAT_KIND_USER, "C"), (0, 0, 0, 0))
+        self.assertEqual(self.activity.get_entities(STAT_KIND_USER), {"A", "B", "C"})
+        self.activity.delete(STAT_KIND_USER, ["B", "D"])
+        self.assertEqual(self.activity.get_entities(STAT_KIND_USER), {"A", "C"})
+        print("建立索引正确")
+
+    def test2_rollover(self):
+        print("开始测试每日更新查询")
+        self.activity.insert(STAT_KIND_USER, [("A", TODAY - 1, 0), ("B", TODAY - 4, 0), ("C", 0, 0)])
+        self.assertEqual(sorted(self.activity.query_rollover(STAT_KIND_USER, TODAY)),
+                         [("A", TODAY - 1, ACTIVITY_DIRTY_MAX), ("B", TODAY - 4, ACTIVITY_DIRTY_MAX)])
+        self.activity.mark_rolled(STAT_KIND_USER, TODAY, [("A", ACTIVITY_DIRTY_MAX - 1), ("B", 0)])
+        self.assertEqual(self.activity.query_rollover(STAT_KIND_USER, TODAY), [])  # 同一天不会重复更新
+        self.assertEqual(self.activity.query_rollover(STAT_KIND_USER, TODAY + 1), [("A", TODAY, ACTIVITY_DIRTY_MAX - 1)])
+        print("每日更新查询正确")
+
+    def test3_inactive(self):
+        print("开始测试不活跃查询")
+        self.activity.insert(STAT_KIND_GROUP, [("A", TODAY, TODAY - 10), ("B", TODAY, TODAY - 9),
+                                               ("C", TODAY, 0), ("D", TODAY, TODAY)])
+        self.assertEqual(self.activity.query_inactive(STAT_KIND_GROUP, TODAY - 9), [("C", 0), ("A", TODAY - 10)])
+        self.assertEqual(self.activity.query_inactive(STAT_KIND_GROUP, TODAY - 9, limit=1), [("C", 0)])
+        self.assertEqual(self.activity.count_inactive(STAT_KIND_GROUP, TODAY - 9), 2)
+        self.assertEqual(self.activity.count_inactive(STAT_KIND_GROUP, TODAY + 1), 4)
+        self.assertEqual(self.activity.count_inactive(STAT_KIND_USER, TODAY + 1), 0)
+        print("不活跃查询正确")
+
+
+if __name__ == '__main__':
+    unittest.main()
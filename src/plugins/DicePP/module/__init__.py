@@ -1,12 +1,30 @@
-import module.common
+"""
+导入所有功能模块, 导入时各模块会注册自己的指令, DataChunk和本地化语句等
+依次导入并记录每个模块的耗时, 启动完成后由Bot汇报; 第一个导入的模块的耗时包含core等公共依赖
+"""
 
-import module.roll
-import module.query
-import module.deck
-import module.dice_hub
+import importlib
+import time
+from typing import Dict
 
-import module.character
-import module.initiative
+FEATURE_MODULES = [
+    "module.common",
 
-import module.fastapi
-import module.misc
+    "module.roll",
+    "module.query",
+    "module.deck",
+    "module.dice_hub",
+
+    "module.character",
+    "module.initiative",
+
+    "module.fastapi",
+    "module.misc",
+]
+
+MODULE_IMPORT_TIME: Dict[str, float] = {}  # 模块名 -> 导入耗时, 单位为秒
+
+for _module_name in FEATURE_MODULES:
+    _begin_time = time.perf_counter()
+    importlib.import_module(_module_name)
+    MODULE_IMPORT_TIME[_module_name] = time.perf_counter() - _begin_time
@@ -9,4 +9,4 @@ from .welcome_command import WelcomeCommand, DC_WELCOME, LOC_WELCOME_DEFAULT
 from .master_command import MasterCommand, DC_CTRL
 from .macro_command import MacroCommand
 from .variable_command import VariableCommand
-from .log_command import LogCommand, LogRecorderCommand, LogStatCommand, DC_LOG_SESSION
+from .log_command import LogCommand, LogRecorderCommand, LogStatCommand, DC_LOG_SESSION, flush_log_records, flush_log_records_async
@@ -4,14 +4,14 @@ bot [on/off], dismiss
 
 from typing import List, Tuple, Any, Literal
 
-from core.bot import Bot
+from core.bot import Bot, get_message_context
 from core.data import custom_data_chunk, DataChunkBase, DataManagerError
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand, BotLeaveGroupCommand
 from core.communication import MessageMetaData, PrivateMessagePort, GroupMessagePort
 from core.localization import LOC_PERMISSION_DENIED_NOTICE
-from core.config import BOT_DESCRIBE, BOT_VERSION
+from core.config import BOT_DESCRIBE, BOT_VERSION, CONFIG_TYPE_BOOL
 from utils.time import get_current_date_str
 
 LOC_BOT_SHOW = "bot_show"
@@ -53,18 +53,16 @@ class ActivateCommand(UserCommandBase):
         bot.loc_helper.register_loc_text(LOC_BOT_OFF, "DicePP现已关闭。", ".bot off时回应的语句（需要群管理/骰管理）")
         bot.loc_helper.register_loc_text(LOC_BOT_DISMISS, "再见啦。", ".dismiss时回应的语句")
 
-        bot.cfg_helper.register_config(CFG_BOT_DEF_ENABLE, "1", "新加入群聊时是否默认开启(.bot on)")
+        bot.cfg_helper.register_config(CFG_BOT_DEF_ENABLE, "1", "新加入群聊时是否默认开启(.bot on)", CONFIG_TYPE_BOOL)
 
     def can_process_msg(self, msg_str: str, meta: MessageMetaData) -> Tuple[bool, bool, Any]:
         if meta.group_id:
+            context = get_message_context(self.bot, meta)
             try:
-                activate_data = self.bot.data_manager.get_data(DC_ACTIVATE, [meta.group_id])
+                activate_data = context.get_data(DC_ACTIVATE, [meta.group_id])
             except DataManagerError:
-                try:
-                    default_enable: bool = bool(int(self.bot.cfg_helper.get_config(CFG_BOT_DEF_ENABLE)[0]))
-                except (IndexError, ValueError):
-                    default_enable = True
-                activate_data = self.bot.data_manager.get_data(DC_ACTIVATE, [meta.group_id], default_gen=lambda: get_default_activate_data(default_enable))
+                default_enable: bool = self.bot.cfg_helper.get_value(CFG_BOT_DEF_ENABLE)
+                activate_data = context.get_data(DC_ACTIVATE, [meta.group_id], default_gen=lambda: get_default_activate_data(default_enable))
         else:
             activate_data = None
         should_pass: bool = False
@@ -1,18 +1,20 @@
-from typing import List, Tuple, Any
-import datetime
+from typing import List, Tuple, Any, Dict
+import time
 
-from core.bot import Bot
-from core.data import custom_data_chunk, DataChunkBase, DataManagerError
+from core.bot import Bot, get_message_context
+from core.data import custom_data_chunk, DataChunkBase
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand
+from core.config import CONFIG_TYPE_INT
 from core.communication import MessageMetaData, PrivateMessagePort, GroupMessagePort
 from .groupconfig_command import DC_GROUPCONFIG
-from utils.time import get_current_date_str, get_current_date_raw, str_to_datetime, datetime_to_str
 
 CFG_CHAT_INTER = "chat_interval"
 
-# 增加自定义DataChunk
+CHAT_RECORD_PRUNE_SIZE = 1024  # 内存中记录的触发时间超过这个数量时清理已经冷却完毕的记录
+
+# 旧版本在这里记录自定义对话的触发时间, 现在触发时间只保存在内存中, 保留定义以兼容已有的数据文件
 DC_CHAT_RECORD = "chat_record"
 DCK_CHAT_TIME = "time"
 
@@ -23,12 +25,6 @@ class _(DataChunkBase):
         super().__init__()
 
 
-def get_default_chat_time(interval: int) -> str:
-    cur_time = get_current_date_raw()
-    cur_time = cur_time - datetime.timedelta(seconds=interval+1)
-    return datetime_to_str(cur_time)
-
-
 @custom_user_command(readable_name="自定义对话指令", priority=DPP_COMMAND_PRIORITY_TRIVIAL,
                      flag=DPP_COMMAND_FLAG_FUN | DPP_COMMAND_FLAG_CHAT)
 class ChatCommand(UserCommandBase):
@@ -38,50 +34,28 @@ class ChatCommand(UserCommandBase):
 
     def __init__(self, bot: Bot):
         super().__init__(bot)
-        bot.cfg_helper.register_config(CFG_CHAT_INTER, "20", "自定义聊天触发间隔, 单位:秒")
-        self.interval: int = -1
-        self.interval_delta: datetime.timedelta = datetime.timedelta(seconds=20)
+        bot.cfg_helper.register_config(CFG_CHAT_INTER, "20", "自定义聊天触发间隔, 单位:秒", CONFIG_TYPE_INT)
+        self.chat_time: Dict[str, float] = {}  # 群号或用户账号 -> 上次触发的时间(time.monotonic)
         # 自定义对话的开关由groupconifg_command操控
 
     def can_process_msg(self, msg_str: str, meta: MessageMetaData) -> Tuple[bool, bool, Any]:
-        should_proc: bool = False
+        # 冷却中直接返回, 不需要进行任何匹配
+        target: str = meta.group_id if meta.group_id else meta.user_id
+        cur_time = time.monotonic()
+        last_time = self.chat_time.get(target)
+        if last_time is not None and cur_time - last_time < self.get_interval():
+            return False, False, ""
         # 如果没开chat，那就别处理了
-        if not self.bot.data_manager.get_data(DC_GROUPCONFIG,[meta.group_id,"chat"],default_val=True):
+        if not get_message_context(self.bot, meta).get_data(DC_GROUPCONFIG, [meta.group_id, "chat"], default_val=True):
             return False, False, ""
-        target: str = meta.group_id if meta.group_id else meta.user_id
-        try:
-            time_str = self.bot.data_manager.get_data(DC_CHAT_RECORD, [target, DCK_CHAT_TIME])
-        except DataManagerError:
-            default_time = get_default_chat_time(self.get_interval())
-            time_str = self.bot.data_manager.get_data(DC_CHAT_RECORD, [target, DCK_CHAT_TIME], default_val=default_time)
-        feedback = ""
-        # 兼容旧格式：可能存成 YYYY_MM_DD_HH_MM_SS（下划线）
-        parse_ok = False
-        dt_base = None
-        try:
-            dt_base = str_to_datetime(time_str)
-            parse_ok = True
-        except Exception:
-            # 尝试自动修补：将下划线替换为 / 和 :
-            if '_' in time_str and time_str.count('_') >= 5:
-                parts = time_str.split('_')
-                if len(parts) >= 6:
-                    # YYYY_MM_DD_HH_MM_SS -> YYYY/MM/DD HH:MM:SS
-                    repaired = f"{parts[0]}/{parts[1]}/{parts[2]} {parts[3]}:{parts[4]}:{parts[5]}"
-                    try:
-                        dt_base = str_to_datetime(repaired)
-                        # 写回修复后的标准格式，防止下次再解析失败
-                        self.bot.data_manager.set_data(DC_CHAT_RECORD, [target, DCK_CHAT_TIME], repaired)
-                        parse_ok = True
-                    except Exception:
-                        pass
-        if parse_ok and get_current_date_raw() >= dt_base + self.get_interval_delta():
-            feedback = self.bot.loc_helper.process_chat(msg_str)
-        if feedback:
-            should_proc = True
-            self.bot.data_manager.set_data(DC_CHAT_RECORD, [target, DCK_CHAT_TIME], get_current_date_str())
-        should_pass: bool = False
-        return should_proc, should_pass, feedback
+        feedback = self.bot.loc_helper.process_chat(msg_str)
+        if not feedback:
+            return False, False, ""
+        if len(self.chat_time) >= CHAT_RECORD_PRUNE_SIZE:
+            interval = self.get_interval()
+            self.chat_time = {key: val for key, val in self.chat_time.items() if cur_time - val < interval}
+        self.chat_time[target] = cur_time
+        return True, False, feedback
 
     def process_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> List[BotCommandBase]:
         port = GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)
@@ -95,17 +69,5 @@ class ChatCommand(UserCommandBase):
         return ""
 
     def get_interval(self) -> int:
-        if self.interval >= 0:
-            return self.interval
-        try:
-            self.interval = int(self.bot.cfg_helper.get_config(CFG_CHAT_INTER)[0])
-        except (ValueError, IndexError):
-            self.interval = 20
-        self.interval_delta = datetime.timedelta(seconds=self.interval)
-        return self.interval
-
-    def get_interval_delta(self) -> datetime.timedelta:
-        if self.interval >= 0:
-            return self.interval_delta
-        self.get_interval()
-        return self.interval_delta
+        # 每次都从配置快照中读取, 重新读取配置文件后立即生效
+        return self.bot.cfg_helper.get_value(CFG_CHAT_INTER)
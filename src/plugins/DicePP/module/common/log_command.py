@@ -1,10 +1,14 @@
+import asyncio
+import heapq
+import itertools
 import json
 import os
 import re
 import time
 import uuid
 import zlib
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 try:
     import requests  # type: ignore
@@ -20,6 +24,7 @@ from core.command import UserCommandBase, custom_user_command
 from core.communication import GroupMessagePort, MessageMetaData
 from utils.time import get_current_date_str, str_to_datetime
 from utils.logger import dice_log
+from utils.metrics import METRICS, METRIC_LOG_DB_WRITE, METRIC_LOG_DB_RECORDS
 
 # 日志数据库后端（将记录存入 SQLite，导出从 DB 读取）
 try:
@@ -456,68 +461,70 @@ def _append_record_to_entry(log_entry: Dict[str, Any], record: Dict[str, Any], *
     log_entry[LOG_KEY_UPDATED_AT] = record.get("time", _now_str())
 
 
-def _append_record_to_db(group_id: str, log_id: str, log_entry: Dict[str, Any], record: Dict[str, Any], *, source_is_bot: bool) -> None:
-    """将记录写入数据库，同时在内存里仅维护必要的统计与配色，避免内存暴涨。"""
-    # 1) 确保日志元数据存在（旧日志可能在 DB 中尚未建档）
-    if get_connection and upsert_log:
+def _build_log_meta(group_id: str, log_id: str, log_entry: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """生成写入 logs 表的元数据快照（旧日志可能在 DB 中尚未建档）。"""
+    record_time = record.get("time", _now_str())
+    upload = log_entry.get(LOG_KEY_UPLOAD, {})
+    return {
+        "id": log_id,
+        "group_id": group_id,
+        "name": log_entry.get(LOG_KEY_NAME, log_id),
+        "created_at": log_entry.get(LOG_KEY_CREATED_AT, record_time),
+        "updated_at": record_time,
+        "recording": True if log_entry.get(LOG_KEY_RECORDING) else False,
+        "record_begin_at": log_entry.get(LOG_KEY_RECORD_BEGIN_AT, record_time),
+        "last_warn": log_entry.get(LOG_KEY_LAST_WARN, log_entry.get(LOG_KEY_RECORD_BEGIN_AT, record_time)),
+        "filter_outside": 0,
+        "filter_command": 0,
+        "filter_bot": 0,
+        "filter_media": 0,
+        "filter_forum_code": 0,
+        "upload_time": upload.get(LOG_KEY_UPLOAD_TIME),
+        "upload_file": upload.get(LOG_KEY_UPLOAD_FILE),
+        "upload_note": upload.get(LOG_KEY_UPLOAD_NOTE),
+        "url": upload.get("url"),
+    }
+
+
+def _write_record_to_db(conn: Any, log_meta: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """在给定连接上写入元数据与记录，不提交；conn 为 None 时（数据库不可用）直接跳过。"""
+    if conn is None:
+        return
+    if upsert_log:
         try:
-            conn = get_connection()
-            try:
-                # 取 filters 快照，便于后续导出/查看
-                filters = log_entry.get(LOG_KEY_UPLOAD)  # dummy to satisfy type checker
-            except Exception:
-                filters = None
-            finally:
-                # 重置，真实 filters 从调用方 payload 中难以直接传入，这里尽量填充已有字段
-                pass
-            try:
-                upsert_log(conn, {
-                    "id": log_id,
-                    "group_id": group_id,
-                    "name": log_entry.get(LOG_KEY_NAME, log_id),
-                    "created_at": log_entry.get(LOG_KEY_CREATED_AT, record.get("time", _now_str())),
-                    "updated_at": record.get("time", _now_str()),
-                    "recording": True if log_entry.get(LOG_KEY_RECORDING) else False,
-                    "record_begin_at": log_entry.get(LOG_KEY_RECORD_BEGIN_AT, record.get("time", _now_str())),
-                    "last_warn": log_entry.get(LOG_KEY_LAST_WARN, log_entry.get(LOG_KEY_RECORD_BEGIN_AT, record.get("time", _now_str()))),
-                    "filter_outside": 0,
-                    "filter_command": 0,
-                    "filter_bot": 0,
-                    "filter_media": 0,
-                    "filter_forum_code": 0,
-                    "upload_time": log_entry.get(LOG_KEY_UPLOAD, {}).get(LOG_KEY_UPLOAD_TIME),
-                    "upload_file": log_entry.get(LOG_KEY_UPLOAD, {}).get(LOG_KEY_UPLOAD_FILE),
-                    "upload_note": log_entry.get(LOG_KEY_UPLOAD, {}).get(LOG_KEY_UPLOAD_NOTE),
-                    "url": log_entry.get(LOG_KEY_UPLOAD, {}).get("url"),
-                })
-                conn.commit()
-            finally:
-                conn.close()
+            upsert_log(conn, log_meta)
         except Exception as e:
             dice_log(f"[LogDB] upsert before insert error: {e}")
-
-    # 2) 写入记录
-    if get_connection and insert_record:
+    if insert_record:
         try:
-            conn = get_connection()
-            try:
-                insert_record(
-                    conn,
-                    log_id,
-                    time=record.get("time", _now_str()),
-                    user_id=str(record.get("user_id") or ""),
-                    nickname=record.get("nickname") or str(record.get("user_id") or ""),
-                    content=record.get("content", ""),
-                    source=record.get(LOG_KEY_SOURCE, "user"),
-                    message_id=record.get("message_id"),
-                )
-                conn.commit()
-            finally:
-                conn.close()
+            insert_record(
+                conn,
+                log_meta["id"],
+                time=record.get("time", _now_str()),
+                user_id=str(record.get("user_id") or ""),
+                nickname=record.get("nickname") or str(record.get("user_id") or ""),
+                content=record.get("content", ""),
+                source=record.get(LOG_KEY_SOURCE, "user"),
+                message_id=record.get("message_id"),
+            )
         except Exception as e:
             dice_log(f"[LogDB] insert_record error: {e}")
 
-    # 3) 内存：只维护统计与颜色映射
+
+def _append_record_to_db(group_id: str, log_id: str, log_entry: Dict[str, Any], record: Dict[str, Any], *,
+                         source_is_bot: bool, batch: Optional[List["LogDbWrite"]] = None) -> None:
+    """将记录写入数据库，同时在内存里仅维护必要的统计与配色，避免内存暴涨。
+    给出 batch 时（写入队列批量处理中）加入该批次，否则加入写入队列，由后台批量写入。"""
+    log_meta = _build_log_meta(group_id, log_id, log_entry, record)
+
+    def write(conn: Any) -> None:
+        _write_record_to_db(conn, log_meta, record)
+    if batch is not None:
+        batch.append(write)
+    else:
+        _log_write_queue.push_write(record.get("time", _now_str()), write)
+
+    # 内存：只维护统计与颜色映射
     color_map = log_entry.setdefault(LOG_KEY_COLOR_MAP, {})
     _pick_color(color_map, record.get("user_id", ""))
     stats = log_entry.setdefault(LOG_KEY_STATS, _empty_stats())
@@ -526,6 +533,120 @@ def _append_record_to_db(group_id: str, log_id: str, log_entry: Dict[str, Any],
     log_entry[LOG_KEY_UPDATED_AT] = record.get("time", _now_str())
 
 
+LOG_WRITE_DELAY = 0.5  # 日志记录最多在内存中等待多少秒后写入数据库
+
+LogDbWrite = Callable[[Any], None]  # 在写入线程中执行, 参数为数据库连接, 数据库不可用时为None
+LogWriteJob = Callable[[List[LogDbWrite]], None]  # 在事件循环中执行, 读取或修改日志数据后把数据库写入操作加入列表
+
+
+class _LogWriteQueue:
+    """日志写入队列：按 (时间, 序号) 排序，积累一小段时间后批量处理。
+    读取与修改日志数据的部分仍在事件循环中按顺序执行，数据库 I/O 交给单独的写入线程，用自己的连接在同一个事务中批量写入；
+    只有一个写入线程，各批次按提交顺序写入。骰娘自己发出的消息也会整条放入队列，发送流程不需要等待读取日志数据或数据库 I/O。"""
+
+    def __init__(self):
+        self.pending: List[Tuple[str, int, LogWriteJob]] = []
+        self.seq = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+        self.writer: Optional[ThreadPoolExecutor] = None
+
+    def push(self, record_time: str, job: LogWriteJob) -> None:
+        heapq.heappush(self.pending, (record_time, next(self.seq), job))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # 没有事件循环（调试环境）时直接写入
+            self.flush()
+            return
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self._flush_later())
+
+    def push_write(self, record_time: str, write: LogDbWrite) -> None:
+        """加入一条不需要读取日志数据的数据库写入"""
+        self.push(record_time, lambda batch: batch.append(write))
+
+    def get_writer(self) -> ThreadPoolExecutor:
+        if self.writer is None:
+            self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DiceLogDB")
+        return self.writer
+
+    async def _flush_later(self) -> None:
+        # 写入期间加入的记录在下一轮处理
+        while self.pending:
+            await asyncio.sleep(LOG_WRITE_DELAY)
+            batch = self.prepare()
+            if batch:
+                await asyncio.get_running_loop().run_in_executor(self.get_writer(), self.write, batch)
+
+    def prepare(self) -> List[LogDbWrite]:
+        """在调用者的线程中按时间顺序执行等待中的任务，返回需要写入数据库的操作"""
+        batch: List[LogDbWrite] = []
+        # 任务执行时可能继续加入新的记录，同样在本批次中处理
+        while self.pending:
+            _, _, job = heapq.heappop(self.pending)
+            try:
+                job(batch)
+            except Exception as e:
+                dice_log(f"[LogDB] batch prepare error: {e}")
+        return batch
+
+    @staticmethod
+    def write(batch: List[LogDbWrite]) -> None:
+        """在同一个连接与事务中执行一批数据库写入"""
+        if not batch:
+            return
+        metrics_enabled = METRICS.enabled
+        if metrics_enabled:
+            begin_time = time.perf_counter()
+        conn = None
+        if get_connection:
+            try:
+                conn = get_connection()
+            except Exception as e:
+                dice_log(f"[LogDB] batch connect error: {e}")
+        try:
+            for write in batch:
+                try:
+                    write(conn)
+                except Exception as e:
+                    dice_log(f"[LogDB] batch write error: {e}")
+            if conn is not None:
+                conn.commit()
+        except Exception as e:
+            dice_log(f"[LogDB] batch commit error: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+            if metrics_enabled:
+                METRICS.observe_since(METRIC_LOG_DB_WRITE, begin_time)
+                METRICS.inc(METRIC_LOG_DB_RECORDS, len(batch))
+
+    def flush(self) -> None:
+        """立即写入所有等待中的记录并等待写入完成，会阻塞调用者的线程，只在关闭、重启或没有事件循环时使用。"""
+        batch = self.prepare()
+        if batch or self.writer is not None:
+            # 写入线程中可能还有没写完的批次，排在它们之后写入才能保证顺序
+            self.get_writer().submit(self.write, batch).result()
+
+    async def flush_async(self) -> None:
+        """与 flush 相同，但等待写入时不阻塞事件循环；指令读取日志数据库之前需要先等待它完成。"""
+        batch = self.prepare()
+        if batch or self.writer is not None:
+            await asyncio.wrap_future(self.get_writer().submit(self.write, batch))
+
+
+_log_write_queue = _LogWriteQueue()
+
+
+def flush_log_records() -> None:
+    """将等待中的日志记录立即写入数据库，在关闭或重启前调用。"""
+    _log_write_queue.flush()
+
+
+async def flush_log_records_async() -> None:
+    """将等待中的日志记录写入数据库并等待完成，不阻塞事件循环。"""
+    await _log_write_queue.flush_async()
+
+
 def _trim_records_if_needed(bot: Bot, entry: Dict[str, Any]) -> None:
     """根据配置裁剪过多的历史记录，避免内存无限增长。
     - 读取配置 CFG_LOG_MAX_RECORDS（默认 5000）。
@@ -588,20 +709,25 @@ def _generate_forum_code_log(records: List[Dict[str, Any]]) -> str:
     return "\n".join(forum_code)
 
 
-def append_log_record(bot: Bot, group_id: str, user_id: str, nickname: str, content: str,
+def append_log_record(bot: Bot, group_id: str, user_id: str, nickname: Optional[str], content: str,
                       message_id: Optional[str] = None):
-    try:
+    """记录骰娘发出的消息：只记下发送时间后放入写入队列，读取日志数据与写数据库都在后台批量进行。
+    nickname 为 None 时在写入时再查询昵称。"""
+    record_time = _now_str()
+
+    def job(batch: List[LogDbWrite]) -> None:
         record_incoming_message(
             bot,
             group_id,
             str(user_id or ""),
-            nickname or ("骰娘" if user_id == bot.account else user_id),
+            nickname if nickname is not None else (bot.get_nickname(str(user_id), group_id) or "Bot"),
             content,
             message_id,
             is_bot=True,
+            record_time=record_time,
+            batch=batch,
         )
-    except Exception:
-        pass
+    _log_write_queue.push(record_time, job)
 
 
 class _StatsFormatter:
@@ -786,7 +912,15 @@ def record_incoming_message(bot: Bot,
                             content: str,
                             message_id: Optional[str],
                             *,
-                            is_bot: bool) -> List[BotCommandBase]:
+                            is_bot: bool,
+                            record_time: Optional[str] = None,
+                            batch: Optional[List[LogDbWrite]] = None) -> List[BotCommandBase]:
+    """
+    记录一条群消息到当前日志
+    Args:
+        record_time: 消息的时间, 为None时使用当前时间
+        batch: 日志写入队列批量处理时的数据库写入列表, 为None时记录会加入写入队列
+    """
     if not group_id:
         return []
 
@@ -805,7 +939,7 @@ def record_incoming_message(bot: Bot,
         return []
 
     record = {
-        "time": _now_str(),
+        "time": record_time or _now_str(),
         "user_id": str(user_id or ""),
         "nickname": nickname or ("骰娘" if str(user_id) == bot.account else user_id),
         "content": content,
@@ -839,7 +973,7 @@ def record_incoming_message(bot: Bot,
             ))
             entry[LOG_KEY_LAST_WARN] = now_time
 
-    _append_record_to_db(group_id, current_id, entry, record, source_is_bot=is_bot)
+    _append_record_to_db(group_id, current_id, entry, record, source_is_bot=is_bot, batch=batch)
     # 不再堆积内存 records，仅保留统计；裁剪留作安全网（不会影响）
     _trim_records_if_needed(bot, entry)
     payload[LOG_GROUP_LOGS][current_id] = entry
@@ -896,6 +1030,9 @@ class LogCommand(UserCommandBase):
         name = " ".join(args[2:]).strip()
         return True, False, (action.lower(), name)
 
+    async def prepare_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> None:
+        await flush_log_records_async()  # 先写入等待中的记录, 之后读到的日志才是完整的
+
     def process_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> List[BotCommandBase]:
         if not meta.group_id:
             return []
@@ -1670,23 +1807,21 @@ class LogCommand(UserCommandBase):
 
 # 提供给适配器：按消息撤回删除对应 DB 记录
 def delete_log_record_by_message_id(bot: Bot, group_id: str, message_id: str) -> None:
-    try:
+    """删除操作放入写入队列，排在之前收到的记录之后执行，不需要等待写入完成。"""
+    if not delete_records_by_message_id:
+        return
+
+    def job(batch: List[LogDbWrite]) -> None:
         payload = _load_group_payload(bot, group_id)
         current_id = payload.get(LOG_GROUP_CURRENT, "")
         if not current_id:
             return
-        if get_connection and delete_records_by_message_id:
-            conn = get_connection()
-            try:
+
+        def write(conn: Any) -> None:
+            if conn is not None:
                 delete_records_by_message_id(conn, current_id, str(message_id))
-                conn.commit()
-            finally:
-                conn.close()
-    except Exception as e:
-        try:
-            dice_log(f"[LogDB] delete by message_id error: {e}")
-        except Exception:
-            pass
+        batch.append(write)
+    _log_write_queue.push(_now_str(), job)
 
 
 @custom_user_command(readable_name="跑团日志记录器", priority=DPP_COMMAND_PRIORITY_USUAL_LOWER_BOUND - 10,
@@ -1746,6 +1881,9 @@ class LogStatCommand(UserCommandBase):
             return True, False, name
         return False, False, None
 
+    async def prepare_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> None:
+        await flush_log_records_async()  # 先写入等待中的记录, 之后读到的日志才是完整的
+
     def process_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> List[BotCommandBase]:
         if not meta.group_id:
             return []
@@ -67,6 +67,7 @@ class MacroCommand(UserCommandBase):
             macro_key = arg_str[3:].strip()
             if macro_key == "all":
                 self.bot.data_manager.delete_data(DC_MACRO, [meta.user_id])
+                self.bot.macro_cache.invalidate(meta.user_id)
                 feedback = self.format_loc(LOC_DEFINE_DEL, macro=str([macro.key for macro in macro_list]))
             else:
                 del_index = -1
@@ -77,6 +78,7 @@ class MacroCommand(UserCommandBase):
                 if del_index != -1:
                     del macro_list[del_index]
                     self.bot.data_manager.set_data(DC_MACRO, [meta.user_id], macro_list)
+                    self.bot.macro_cache.invalidate(meta.user_id)
                     feedback = self.format_loc(LOC_DEFINE_DEL, macro=macro_key)
                 else:
                     feedback = self.format_loc(LOC_DEFINE_FAIL, error=f"找不到关键字为{macro_key}的宏")
@@ -106,6 +108,7 @@ class MacroCommand(UserCommandBase):
                         macro_list.remove(macro_prev)
                 macro_list.append(macro_new)
                 self.bot.data_manager.set_data(DC_MACRO, [meta.user_id], macro_list)
+                self.bot.macro_cache.invalidate(meta.user_id)
                 feedback = self.format_loc(LOC_DEFINE_SUCCESS, macro=macro_new.key, args=macro_new.args, target=macro_new.target)
 
         return [BotSendMsgCommand(self.bot.account, feedback, [port])]
@@ -2,15 +2,24 @@
 命令模板, 复制到新创建的文件里修改
 """
 
-from typing import List, Tuple, Any
+import asyncio
+import os
+import time
+from typing import List, Tuple, Any, Optional
 
-from core.bot import Bot
+from core.bot import Bot, get_expire_before_day
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
-from core.command import BotCommandBase, BotSendMsgCommand
+from core.command import BotCommandBase, BotSendMsgCommand, BotSendFileCommand
 from core.communication import MessageMetaData, PrivateMessagePort, GroupMessagePort
-from core.config import CFG_MASTER, CFG_ADMIN
-from core.data import custom_data_chunk, DataChunkBase
+from core.config import CFG_MASTER, CFG_ADMIN, CFG_GROUP_EXPIRE_DAY, PROJECT_PATH
+from core.data import custom_data_chunk, DataChunkBase, DataManagerError, DC_GROUP_DATA, DCK_GROUP_STAT
+from core.statistics import GroupStatInfo, STAT_KIND_GROUP
+from utils.time import get_current_day_ordinal, day_ordinal_to_str
+from module.common.log_command import flush_log_records
+from utils.asset import ASSET_CACHE
+from utils.metrics import METRICS
+from utils.profiler import SamplingProfiler
 
 LOC_REBOOT = "master_reboot"
 LOC_SEND_MASTER = "master_send_to_master"
@@ -21,6 +30,11 @@ LOC_LOG_STATUS_DONE = "master_log_status_done"
 
 DC_CTRL = "master_control"
 
+INACTIVE_SHOW_NUM = 20  # .m inactive最多列出的群聊数量
+PROFILE_DEFAULT_SECONDS = 30  # .m profile默认的采样时长
+PROFILE_MAX_SECONDS = 300  # .m profile最长的采样时长
+PROFILE_TOP_NUM = 5  # 采样结束后在消息中列出的函数数量
+
 @custom_data_chunk(identifier=DC_CTRL,
                    include_json_object=True)
 class _(DataChunkBase):
@@ -46,6 +60,7 @@ class MasterCommand(UserCommandBase):
         bot.loc_helper.register_loc_text(LOC_LOG_CLEAN, "开始清理日志文件...", "Master清理日志时开始提示")
         bot.loc_helper.register_loc_text(LOC_LOG_CLEAN_DONE, "日志清理完成，共删除 {count} 个文件。", "Master清理日志完成提示")
         bot.loc_helper.register_loc_text(LOC_LOG_STATUS_DONE, "日志状态：文件 {count} 个，总计 {size_kb} KB。最近文件：\n{recent}", "Master查看日志状态")
+        self.profiler: Optional[SamplingProfiler] = None
 
     def can_process_msg(self, msg_str: str, meta: MessageMetaData) -> Tuple[bool, bool, Any]:
         should_proc: bool = False
@@ -72,6 +87,7 @@ class MasterCommand(UserCommandBase):
             self.bot.data_manager.set_data(DC_CTRL, ["rebooter"], meta.user_id)
             # noinspection PyBroadException
             try:
+                flush_log_records()
                 self.bot.reboot()
                 feedback = self.format_loc(LOC_REBOOT)
             except Exception:
@@ -100,12 +116,7 @@ class MasterCommand(UserCommandBase):
             self.bot.register_task(async_task, timeout=60, timeout_callback=lambda: [BotSendMsgCommand(self.bot.account, "更新超时!", [port])])
             feedback = "更新开始..."
         elif arg_str == "clean":
-            async def clear_expired_data():
-                res = await self.bot.clear_expired_data()
-                return res
-
-            self.bot.register_task(clear_expired_data, timeout=3600)
-            feedback = "清理开始..."
+            feedback = "清理开始..." if self.bot.clear_expired_data() else "清理正在进行中..."
         elif arg_str == "debug-tick":
             feedback = f"异步任务状态: {self.bot.tick_task.get_name()} Done:{self.bot.tick_task.done()} Cancelled:{self.bot.tick_task.cancelled()}\n" \
                        f"{self.bot.tick_task}"
@@ -114,6 +125,24 @@ class MasterCommand(UserCommandBase):
             self.bot.tick_task = asyncio.create_task(self.bot.tick_loop())
             self.bot.todo_tasks = {}
             feedback = "Redo tick finish!"
+        elif arg_str.startswith("inactive"):
+            feedback = self.get_inactive_group_info(arg_str[8:].strip(), meta)
+        elif arg_str == "cache":
+            feedback = "数据驻留状态:\n" + "\n".join(self.bot.data_manager.get_residency_info())
+        elif arg_str == "status":
+            status_list = [self.bot.proxy.get_status_info() if self.bot.proxy else "", self.bot.command_executor.get_status_info(),
+                           ASSET_CACHE.get_status_info()]
+            feedback = "\n".join(info for info in status_list if info)
+        elif arg_str.startswith("profile"):
+            feedback = self.start_profile(arg_str[7:].strip(), meta)
+        elif arg_str.startswith("metrics"):
+            if arg_str[7:].strip() == "reset":
+                METRICS.reset()
+                feedback = "已清空运行指标"
+            elif not METRICS.enabled:
+                feedback = "运行指标未启用, 请在配置文件中将metrics_enable设为1"
+            else:
+                feedback = "\n".join(METRICS.render_summary()) or "暂无运行指标"
         elif arg_str == "log-clean":
             # 立即删除本Bot data_path/logs 下所有文件
             import os, shutil
@@ -169,6 +198,11 @@ class MasterCommand(UserCommandBase):
         if keyword == "m":  # help后的接着的内容
          return ".m reboot 重启骰娘\n" \
              ".m send 命令骰娘发送信息\n" \
+             ".m cache 查看数据驻留状态\n" \
+             ".m status 查看发送队列与指令线程池等运行状态\n" \
+             ".m metrics [reset] 查看或清空运行指标\n" \
+             ".m profile [秒数] 采样分析骰娘的运行情况, 结束后私聊发送结果文件(仅Master)\n" \
+             ".m inactive [天数] 列出长时间没有使用指令的群聊\n" \
              ".m log-clean 清空日志目录\n" \
              ".m log status 查看日志状态"
         if keyword.startswith("m"):
@@ -176,7 +210,75 @@ class MasterCommand(UserCommandBase):
                 return "该指令将重启DicePP进程"
             elif keyword.endswith("send"):
                 return ".m send [user/group]:[账号/群号]:[消息内容]"
+            elif keyword.endswith("profile"):
+                return f".m profile [秒数] 在接下来的一段时间内(默认{PROFILE_DEFAULT_SECONDS}秒, 最多{PROFILE_MAX_SECONDS}秒)定期记录调用栈, " \
+                       f"结束后私聊发送collapsed stack格式的文件, 可以用flamegraph.pl或speedscope查看"
+            elif keyword.endswith("inactive"):
+                return ".m inactive [天数] 列出超过天数没有使用过指令的群聊, 不给出天数时使用自动清理的天数"
         return ""
 
+    def start_profile(self, arg_str: str, meta: MessageMetaData) -> str:
+        """开始采样, 经过指定的秒数后停止并私聊发送结果"""
+        if meta.permission < 4:
+            return "只有Master可以使用采样分析"
+        if self.profiler and self.profiler.running:
+            return "已经在采样中, 请等待本次采样结束"
+        try:
+            seconds = int(arg_str) if arg_str else PROFILE_DEFAULT_SECONDS
+            assert 0 < seconds <= PROFILE_MAX_SECONDS
+        except (ValueError, AssertionError):
+            return f"采样时长应为1~{PROFILE_MAX_SECONDS}之间的整数"
+        self.profiler = SamplingProfiler(PROJECT_PATH)
+        self.profiler.start()
+        user_id = meta.user_id
+
+        async def finish_profile() -> List[BotCommandBase]:
+            await asyncio.sleep(seconds)
+            return self.finish_profile(user_id)
+        self.bot.register_task(finish_profile, timeout=0)
+        return f"开始采样, {seconds}秒后将结果私聊发送给你"
+
+    def finish_profile(self, user_id: str) -> List[BotCommandBase]:
+        """停止采样, 保存结果并返回发送文件的指令"""
+        profiler, self.profiler = self.profiler, None
+        if not profiler:
+            return []
+        profiler.stop()
+        port = PrivateMessagePort(user_id)
+        if not profiler.stacks:
+            return [BotSendMsgCommand(self.bot.account, f"采样结束, 共采样{profiler.sample_count}次, 没有记录到骰娘的调用栈", [port])]
+        file_name = f"profile_{time.strftime('%Y%m%d_%H%M%S')}.folded"
+        file_path = profiler.save(os.path.join(self.bot.data_path, "logs", file_name))
+        top_info = "\n".join(f"{name} {count}" for name, count in profiler.get_top_functions(PROFILE_TOP_NUM))
+        feedback = f"采样结束, 共采样{profiler.sample_count}次, 最常位于栈顶的函数:\n{top_info}"
+        return [BotSendMsgCommand(self.bot.account, feedback, [port]),
+                BotSendFileCommand(self.bot.account, file_path, file_name, [port])]
+
+    def get_inactive_group_info(self, arg_str: str, meta: MessageMetaData) -> str:
+        """根据活跃度索引列出不活跃的群聊, 只需要读取列出的群聊的数据"""
+        try:
+            day_num = int(arg_str) if arg_str else self.bot.cfg_helper.get_value(CFG_GROUP_EXPIRE_DAY)
+            assert day_num > 0
+        except (ValueError, IndexError, AssertionError):
+            return f"非法输入\n使用方法: {self.get_help('m inactive', meta)}"
+        self.bot.stat_aggregator.flush()
+        before_day = get_expire_before_day(get_current_day_ordinal(), day_num)
+        total_num = self.bot.stat_activity.count_inactive(STAT_KIND_GROUP, before_day)
+        if not total_num:
+            return f"没有超过{day_num}天未使用指令的群聊"
+        info_list = []
+        for group_id, cmd_day in self.bot.stat_activity.query_inactive(STAT_KIND_GROUP, before_day, INACTIVE_SHOW_NUM):
+            last_str = day_ordinal_to_str(cmd_day) if cmd_day else "从未使用"
+            try:
+                group_stat: GroupStatInfo = self.bot.data_manager.get_data(DC_GROUP_DATA, [group_id, DCK_GROUP_STAT])
+                info_list.append(f"{group_stat.meta.name}({group_id}) 最后使用指令:{last_str} "
+                                 f"群成员:{group_stat.meta.member_count} 已警告:{group_stat.meta.warn_time}次")
+            except DataManagerError:
+                info_list.append(f"未知({group_id}) 最后使用指令:{last_str}")
+        feedback = f"共有{total_num}个群聊超过{day_num}天未使用指令"
+        if total_num > len(info_list):
+            feedback += f", 最不活跃的{len(info_list)}个"
+        return feedback + ":\n" + "\n".join(info_list)
+
     def get_description(self) -> str:
         return ".m Master才能使用的指令"  # help指令中返回的内容
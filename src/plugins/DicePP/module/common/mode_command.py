@@ -2,7 +2,7 @@ from typing import Dict, Optional, List, Tuple, Any
 import openpyxl
 import os
 
-from core.bot import Bot
+from core.bot import Bot, get_message_context
 from core.data import DataChunkBase, custom_data_chunk, DC_USER_DATA
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
@@ -119,8 +119,9 @@ class ModeCommand(UserCommandBase):
             dc = DC_USER_DATA
             target_id = meta.user_id
 
-        if self.bot.data_manager.get_data(dc, [target_id, "mode"], default_val="") == "":
-            default_mode = str(self.bot.cfg_helper.get_config(CFG_MODE_DEFAULT)[0])
+        # 模式文件读取完成前不进行初始化, 否则会因为找不到模式而写入错误的设置
+        if self.ready and get_message_context(self.bot, meta).get_data(dc, [target_id, "mode"], default_val="") == "":
+            default_mode: str = self.bot.cfg_helper.get_value(CFG_MODE_DEFAULT)
             if default_mode != "":
                 # 指定 is_private 以便 switch_mode 写入正确的数据块
                 self.switch_mode(target_id, default_mode, is_private=(not meta.group_id))
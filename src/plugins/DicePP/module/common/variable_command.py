@@ -136,6 +136,8 @@ class VariableCommand(UserCommandBase):
                 self.bot.data_manager.delete_data(DC_VARIABLE, [meta.user_id, meta.group_id, var_name])
                 feedback = self.format_loc(LOC_VAR_DEL, name=var_name)
 
+        if cmd_type != "get":
+            self.bot.variable_cache.invalidate(meta.user_id, meta.group_id)
         return [BotSendMsgCommand(self.bot.account, feedback, [port])]
 
     def get_help(self, keyword: str, meta: MessageMetaData) -> str:
@@ -10,12 +10,12 @@ from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand
 from core.communication import MessageMetaData, PrivateMessagePort, GroupMessagePort, preprocess_msg
-from core.config import DATA_PATH, LOCAL_IMG_PATH
+from core.config import DATA_PATH, LOCAL_IMG_PATH, CONFIG_TYPE_BOOL
 from core.localization import LocalizationManager, LOC_FUNC_DISABLE
 from utils.localdata import read_xlsx, update_xlsx, col_based_workbook_to_dict, create_parent_dir, get_empty_col_based_workbook
 from utils.string import match_substring
 from utils.logger import dice_log
-from utils.cq_code import get_cq_image
+from utils.asset import get_cached_cq_image
 from module.roll import preprocess_roll_exp, is_roll_exp, exec_roll_exp
 
 
@@ -137,21 +137,22 @@ class DeckItem:
             file_path_relative = Path(source.path) / key
             file_path_absolute = Path(DATA_PATH) / DRAW_DATA_PATH / key
             file_path_local_img = Path(LOCAL_IMG_PATH) / key
-            if file_path_relative.exists():
-                return get_cq_image(file_path_relative.read_bytes())
-            elif file_path_absolute.exists():
-                return get_cq_image(file_path_absolute.read_bytes())
-            elif file_path_local_img.exists():
-                return get_cq_image(file_path_local_img.read_bytes())
-            else:
-                dice_log(f"[DeckImage] 找不到图片 {file_path_relative.resolve()}")
-                return key
+            for file_path in (file_path_relative, file_path_absolute, file_path_local_img):
+                cq_image = get_cached_cq_image(file_path)
+                if cq_image is not None:
+                    return cq_image
+            dice_log(f"[DeckImage] 找不到图片 {file_path_relative.resolve()}")
+            return key
 
         result = self.content.strip()
         if "ROLL" in result or "DRAW" in result or "IMG" in result:
-            result = re.sub(r"ROLL\((.{1,30}?)\)", handle_roll, result)
-            result = re.sub(r"DRAW\((.{1,30}?),\s*(.{1,30}?)\)", handle_draw, result)
-            result = re.sub(r"IMG\((.{1,50}?\.[A-Za-z]{1,10}?)\)", handle_img, result)
+            # 只对包含对应关键字的内容进行替换
+            if "ROLL" in result:
+                result = re.sub(r"ROLL\((.{1,30}?)\)", handle_roll, result)
+            if "DRAW" in result:
+                result = re.sub(r"DRAW\((.{1,30}?),\s*(.{1,30}?)\)", handle_draw, result)
+            if "IMG" in result:
+                result = re.sub(r"IMG\((.{1,50}?\.[A-Za-z]{1,10}?)\)", handle_img, result)
         else:
             result = loc_helper.format_loc_text(LOC_DRAW_RESULT_DESIGN,result=result)
         if self.final_type == 2:
@@ -216,7 +217,7 @@ class Deck:
 
 
 @custom_user_command(readable_name="抽卡指令", priority=DPP_COMMAND_PRIORITY_DEFAULT,
-                     flag=DPP_COMMAND_FLAG_DRAW)
+                     flag=DPP_COMMAND_FLAG_DRAW, executor=DPP_COMMAND_EXECUTOR_THREAD)
 class DeckCommand(UserCommandBase):
     """
     .draw 指令, 从牌库中抽取
@@ -242,7 +243,7 @@ class DeckCommand(UserCommandBase):
         bot.loc_helper.register_loc_text(LOC_DRAW_ERR_NO_DECK, "Cannot find deck {deck_name}", "找不到想要抽取的牌库")
         bot.loc_helper.register_loc_text(LOC_DRAW_ERR_VAGUE_DECK, "Possible decks: {deck_list}", "找到多个可能的牌库")
 
-        bot.cfg_helper.register_config(CFG_DECK_ENABLE, "1", "抽卡指令开关")
+        bot.cfg_helper.register_config(CFG_DECK_ENABLE, "1", "抽卡指令开关", CONFIG_TYPE_BOOL)
         bot.cfg_helper.register_config(CFG_DECK_DATA_PATH, f"./{DRAW_DATA_PATH}", "牌库指令的数据来源, .代表Data文件夹")
 
     def delay_init(self) -> List[str]:
@@ -274,7 +275,7 @@ class DeckCommand(UserCommandBase):
         port = GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)
         # 判断功能开关
         try:
-            assert (int(self.bot.cfg_helper.get_config(CFG_DECK_ENABLE)[0]) != 0)
+            assert self.bot.cfg_helper.get_value(CFG_DECK_ENABLE)
         except AssertionError:
             feedback = self.bot.loc_helper.format_loc_text(LOC_FUNC_DISABLE, func=self.readable_name)
             return [BotSendMsgCommand(self.bot.account, feedback, [port])]
@@ -7,7 +7,7 @@ from pathlib import Path
 import openpyxl
 
 from core.bot import Bot
-from core.config import DATA_PATH,CFG_MASTER, CFG_ADMIN
+from core.config import DATA_PATH, CONFIG_TYPE_BOOL
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand
@@ -28,7 +28,7 @@ META_FILE_NAME = "rule.xlsx"
 
 
 @custom_user_command(readable_name="随机生成器指令", priority=DPP_COMMAND_PRIORITY_DEFAULT,
-                     flag=DPP_COMMAND_FLAG_DRAW)
+                     flag=DPP_COMMAND_FLAG_DRAW, executor=DPP_COMMAND_EXECUTOR_THREAD)
 class RandomGeneratorCommand(UserCommandBase):
 
     def __init__(self, bot: Bot):
@@ -41,7 +41,7 @@ class RandomGeneratorCommand(UserCommandBase):
         bot.loc_helper.register_loc_text(LOC_RAND_GEN_MISS, "Cannot find {name} generator...", "找不到用户输入的随机生成器")
         bot.loc_helper.register_loc_text(LOC_RAND_GEN_VAGUE, "Maybe you want these generator? {list}", "用户输入的随机生成器名称有多个匹配可能")
 
-        bot.cfg_helper.register_config(CFG_RAND_GEN_ENABLE, "1", "随机生成器指令开关")
+        bot.cfg_helper.register_config(CFG_RAND_GEN_ENABLE, "1", "随机生成器指令开关", CONFIG_TYPE_BOOL)
         bot.cfg_helper.register_config(CFG_RAND_GEN_DATA_PATH, f"./{RAND_GEN_DATA_PATH}", "随机生成器指令的数据来源, .代表Data文件夹")
 
     def delay_init(self) -> List[str]:
@@ -71,10 +71,10 @@ class RandomGeneratorCommand(UserCommandBase):
 
     def process_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> List[BotCommandBase]:
         port = GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)
-        admin = (meta.user_id in self.bot.cfg_helper.get_config(CFG_MASTER)) or (meta.user_id in self.bot.cfg_helper.get_config(CFG_ADMIN))
+        admin = meta.permission >= 3  # 骰主或骰管理
         # 判断功能开关
         try:
-            assert (int(self.bot.cfg_helper.get_config(CFG_RAND_GEN_ENABLE)[0]) != 0)
+            assert self.bot.cfg_helper.get_value(CFG_RAND_GEN_ENABLE)
         except AssertionError:
             feedback = self.bot.loc_helper.format_loc_text(CFG_RAND_GEN_ENABLE, func=self.readable_name)
             return [BotSendMsgCommand(self.bot.account, feedback, [port])]
@@ -11,7 +11,7 @@ from openpyxl.comments import Comment
 from core.config import DATA_PATH
 from module.roll import is_roll_exp, exec_roll_exp
 from utils.time import get_current_date_raw, datetime_to_str_day, datetime_to_str_week, datetime_to_str_month
-from utils.cq_code import get_cq_image
+from utils.asset import get_cached_cq_image
 from utils.localdata import read_xlsx
 
 RAND_SOURCE_FIELD_NAME = "生成器名称"
@@ -185,7 +185,10 @@ class RandomItem:
                 if file_type == SourceFileType.TXT:
                     result += file_path.read_text()
                 elif file_type == SourceFileType.IMG:
-                    result += get_cq_image(file_path.read_bytes())
+                    cq_image = get_cached_cq_image(file_path)
+                    if cq_image is None:
+                        return f"数据文件{file_path.relative_to(DATA_PATH)}丢失"
+                    result += cq_image
                 else:
                     return "无效文件类型"
         elif self.source_type == RandomSourceType.Workbook:
@@ -1,9 +1,11 @@
 import os
-from typing import Tuple
-import rsa
+from typing import Tuple, TYPE_CHECKING
 import base64
 import zlib
 
+if TYPE_CHECKING:  # rsa库只在用到的函数中导入, 不拖慢启动
+    import rsa
+
 RSA_LEN = 1024
 ENCRYPT_SEG_LEN = RSA_LEN // 8
 CONTENT_SEG_LEN = ENCRYPT_SEG_LEN - 11
@@ -17,7 +19,8 @@ INT_TO_BYTE_RULE = {"length": HEADER_LEN, **BYTE_TO_INT_RULE}
 ENCODE_STYLE = "utf-8"
 
 
-def encrypt_rsa(text: str, public_key: rsa.PublicKey) -> str:
+def encrypt_rsa(text: str, public_key: "rsa.PublicKey") -> str:
+    import rsa
     byte_data = text.encode(ENCODE_STYLE)
     byte_data = zlib.compress(byte_data)
     assert len(byte_data) < MAX_TEXT_LEN
@@ -31,7 +34,8 @@ def encrypt_rsa(text: str, public_key: rsa.PublicKey) -> str:
     return result.decode(ENCODE_STYLE)
 
 
-def decrypt_rsa(rsa_str: str, private_key: rsa.PrivateKey) -> str:
+def decrypt_rsa(rsa_str: str, private_key: "rsa.PrivateKey") -> str:
+    import rsa
     decode_data = rsa_str.encode(ENCODE_STYLE)
     decode_data = base64.b64decode(decode_data)
     header, decode_data = decode_data[:HEADER_LEN], decode_data[HEADER_LEN:]
@@ -50,7 +54,8 @@ def decrypt_rsa(rsa_str: str, private_key: rsa.PrivateKey) -> str:
     return result.decode(ENCODE_STYLE)
 
 
-def create_rsa_key(name: str, path: str) -> Tuple[rsa.PublicKey, rsa.PrivateKey]:
+def create_rsa_key(name: str, path: str) -> Tuple["rsa.PublicKey", "rsa.PrivateKey"]:
+    import rsa
     public_key, private_key = rsa.newkeys(RSA_LEN)
     try:
         save_rsa_public_key(public_key, name, path)
@@ -60,7 +65,7 @@ def create_rsa_key(name: str, path: str) -> Tuple[rsa.PublicKey, rsa.PrivateKey]
     return public_key, private_key
 
 
-def save_rsa_public_key(public_key: rsa.PublicKey, name: str, path: str) -> str:
+def save_rsa_public_key(public_key: "rsa.PublicKey", name: str, path: str) -> str:
     public_path = os.path.join(path, name) + ".pub"
     try:
         with open(public_path, "w") as f:
@@ -70,7 +75,7 @@ def save_rsa_public_key(public_key: rsa.PublicKey, name: str, path: str) -> str:
     return public_path
 
 
-def save_rsa_private_key(private_key: rsa.PrivateKey, name: str, path: str) -> str:
+def save_rsa_private_key(private_key: "rsa.PrivateKey", name: str, path: str) -> str:
     private_path = os.path.join(path, name)
     try:
         with open(private_path, "w") as f:
@@ -80,7 +85,7 @@ def save_rsa_private_key(private_key: rsa.PrivateKey, name: str, path: str) -> s
     return private_path
 
 
-def load_rsa_public_key(name: str, path: str) -> rsa.PublicKey:
+def load_rsa_public_key(name: str, path: str) -> "rsa.PublicKey":
     public_path = os.path.join(path, name) + ".pub"
     try:
         with open(public_path, "r") as f:
@@ -90,7 +95,7 @@ def load_rsa_public_key(name: str, path: str) -> rsa.PublicKey:
     return load_rsa_public_key_from_str(key_str)
 
 
-def load_rsa_private_key(name: str, path: str) -> rsa.PrivateKey:
+def load_rsa_private_key(name: str, path: str) -> "rsa.PrivateKey":
     private_path = os.path.join(path, name)
     try:
         with open(private_path, "r") as f:
@@ -100,17 +105,19 @@ def load_rsa_private_key(name: str, path: str) -> rsa.PrivateKey:
     return load_rsa_private_key_from_str(key_str)
 
 
-def load_rsa_public_key_from_str(key_str: str) -> rsa.PublicKey:
+def load_rsa_public_key_from_str(key_str: str) -> "rsa.PublicKey":
+    import rsa
     return rsa.PublicKey.load_pkcs1(key_str.encode(ENCODE_STYLE))
 
 
-def load_rsa_private_key_from_str(key_str: str) -> rsa.PrivateKey:
+def load_rsa_private_key_from_str(key_str: str) -> "rsa.PrivateKey":
+    import rsa
     return rsa.PrivateKey.load_pkcs1(key_str.encode(ENCODE_STYLE))
 
 
-def save_rsa_public_key_as_str(public_key: rsa.PublicKey) -> str:
+def save_rsa_public_key_as_str(public_key: "rsa.PublicKey") -> str:
     return public_key.save_pkcs1().decode(ENCODE_STYLE)
 
 
-def save_rsa_private_key_as_str(private_key: rsa.PrivateKey) -> str:
+def save_rsa_private_key_as_str(private_key: "rsa.PrivateKey") -> str:
     return private_key.save_pkcs1().decode(ENCODE_STYLE)
@@ -13,6 +13,7 @@ from core.bot import Bot
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand, BotDelayCommand
+from core.config import CONFIG_TYPE_INT
 from core.communication import MessageMetaData, PrivateMessagePort, GroupMessagePort
 from utils.time import get_current_date_raw
 from utils.logger import dice_log
@@ -183,7 +184,7 @@ class HubCommand(UserCommandBase):
                                          "对方请求与自身建立连接时发送给master的提示, member_info为对方机器人的账号和昵称")
         bot.loc_helper.register_loc_text(LOC_HUB_MSG_IN, "Message from {member_info}:\n{msg}", "对方机器人发送给我方Master的信息, member_info为对方机器人的账号和昵称")
         bot.loc_helper.register_loc_text(LOC_HUB_LIST, "My friend list:\n{friends_info}", "查看列表时的回复, friends_info为自身的连接列表")
-        bot.cfg_helper.register_config(CFG_HUB_ENABLE, "1", "1为开启, 0为关闭")
+        bot.cfg_helper.register_config(CFG_HUB_ENABLE, "1", "1为开启, 0为关闭", CONFIG_TYPE_INT)
         bot.cfg_helper.register_config(CFG_HUB_NAME, CONST_UNDEFINED_NAME, "对其他人显示的名字, 填入机器人的名字")
 
         self.sync_timer = get_current_date_raw()
@@ -195,7 +196,7 @@ class HubCommand(UserCommandBase):
         should_pass: bool = False
         hint = None
         try:
-            assert int(self.bot.cfg_helper.get_config(CFG_HUB_ENABLE)[0]) == 1
+            assert self.bot.cfg_helper.get_value(CFG_HUB_ENABLE) == 1
         except (AssertionError, ValueError, IndexError):
             return should_proc, should_pass, hint
 
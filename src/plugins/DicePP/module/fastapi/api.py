@@ -1,8 +1,40 @@
-from fastapi import FastAPI, Path, Query
+"""
+DicePP的HTTP接口, 由适配器挂载到NoneBot的FastAPI应用上
+fastapi在第一次调用get_dpp_api时才导入, 不经过NoneBot运行(调试, 测试)时不需要承担导入的耗时
+"""
 
-dpp_api = FastAPI()
+from typing import Any, Optional
 
+from utils.metrics import METRICS
 
-@dpp_api.get("/")
-def test_api():
-    return {"Test": "This is a test api"}
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_dpp_api: Optional[Any] = None
+
+
+def get_dpp_api() -> Any:
+    """返回DicePP的FastAPI应用, 第一次调用时创建"""
+    global _dpp_api
+    if _dpp_api is None:
+        _dpp_api = _create_dpp_api()
+    return _dpp_api
+
+
+def _create_dpp_api() -> Any:
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+
+    dpp_api = FastAPI()
+
+    @dpp_api.get("/")
+    def test_api():
+        return {"Test": "This is a test api"}
+
+    @dpp_api.get("/metrics", response_class=PlainTextResponse)
+    def metrics_api():
+        """以Prometheus的文本格式输出运行指标, 未启用时返回404"""
+        if not METRICS.enabled:
+            return PlainTextResponse("metrics disabled\n", status_code=404)
+        return PlainTextResponse(METRICS.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    return dpp_api
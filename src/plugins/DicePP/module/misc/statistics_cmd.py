@@ -2,6 +2,7 @@
 统计指令, 返回用户或群聊的一些统计信息
 """
 
+import re
 from typing import List, Tuple, Any, Dict
 
 from core.bot import Bot
@@ -13,6 +14,12 @@ from core.communication import MessageMetaData, PrivateMessagePort, GroupMessage
 
 from core.data import DC_META, DC_NICKNAME, DC_MACRO, DC_VARIABLE, DC_USER_DATA, DC_GROUP_DATA, DCK_USER_STAT, DCK_GROUP_STAT
 from core.statistics import GroupStatInfo, UserStatInfo, UserCommandStatInfo, RollStatInfo
+from core.statistics import STAT_KIND_USER, STAT_KIND_GROUP, METRIC_MSG, METRIC_ROLL, METRIC_CMD_PREFIX, METRIC_D20_PREFIX
+from utils.time import get_current_day_ordinal, day_ordinal_to_str
+
+HISTORY_DAY_DEFAULT = 30
+HISTORY_DAY_MAX = 365
+HISTORY_TOP_NUM = 20
 
 # LOC_TEMP = "template_loc"
 
@@ -37,6 +44,7 @@ class StatisticsCommand(UserCommandBase):
         # 解析语句
         arg_str = hint
         feedback: str = ""
+        self.bot.stat_aggregator.flush()  # 先合并尚未写入的统计数据
         if not arg_str:  # 统计当前用户信息
             # 统计处理信息情况
             try:
@@ -106,18 +114,91 @@ class StatisticsCommand(UserCommandBase):
                 feedback += "\n".join([group_info[2] for group_info in group_info_list[:50]])
                 if len(group_info_list) > 50:
                     feedback += f"\n{len(group_info_list) - 50}条信息限于篇幅未显示完全"
+        else:
+            match = re.match(r"^(活跃群聊|群聊)?(d20)?\s*(\d*)$", arg_str)
+            if match and (match.group(3) or match.group(1) == "活跃群聊" or match.group(2)):
+                day_num = int(match.group(3)) if match.group(3) else HISTORY_DAY_DEFAULT
+                feedback = self.get_history_info(meta, match.group(1) or "", bool(match.group(2)), day_num)
 
         feedback = feedback.strip()
         return [BotSendMsgCommand(self.bot.account, feedback, [port])]
 
+    def get_history_info(self, meta: MessageMetaData, mode: str, show_d20: bool, day_num: int) -> str:
+        """
+        查询统计历史
+        Args:
+            meta: 消息信息
+            mode: 为空代表当前用户, 群聊代表当前群聊, 活跃群聊代表掷骰次数最多的群聊
+            show_d20: 是否显示D20的分布
+            day_num: 查询最近多少天的数据
+        """
+        day_num = min(max(day_num, 1), HISTORY_DAY_MAX)
+        end_day = get_current_day_ordinal()
+        start_day = end_day - day_num + 1
+        period_info = f"近{day_num}天({day_ordinal_to_str(start_day)}-{day_ordinal_to_str(end_day)})"
+        history = self.bot.stat_history
+
+        if mode == "活跃群聊":
+            if meta.user_id not in self.bot.get_master_ids():
+                return "权限不足"
+            top_list = history.query_top(STAT_KIND_GROUP, METRIC_ROLL, start_day, end_day, HISTORY_TOP_NUM)
+            if not top_list:
+                return f"{period_info}暂无掷骰记录"
+            info_list = [f"{period_info}掷骰次数最多的{len(top_list)}个群聊:"]
+            for group_id, roll_times in top_list:
+                try:
+                    group_name = self.bot.data_manager.get_data(DC_GROUP_DATA, [group_id, DCK_GROUP_STAT]).meta.name
+                except DataManagerError:
+                    group_name = "未知"
+                info_list.append(f"{group_id}({group_name}) 掷骰:{roll_times}")
+            return "\n".join(info_list)
+
+        if mode == "群聊":
+            if not meta.group_id:
+                return "当前不在群聊中..."
+            kind, entity = STAT_KIND_GROUP, meta.group_id
+        else:
+            kind, entity = STAT_KIND_USER, meta.user_id
+        total_dict = history.query_total(kind, entity, start_day, end_day)
+        if not total_dict:
+            return f"{period_info}暂无记录"
+
+        if show_d20:
+            d20_list = [total_dict.get(f"{METRIC_D20_PREFIX}{i + 1}", 0) for i in range(20)]
+            d20_num = sum(d20_list)
+            d20_avg = sum([(i + 1) * num for i, num in enumerate(d20_list)]) / d20_num if d20_num else 0
+            return f"{period_info}D20统计:{d20_list} 次数:{d20_num} 平均值: {d20_avg:.3f}"
+
+        msg_daily = history.query_daily(kind, entity, METRIC_MSG, start_day, end_day)
+        msg_total = total_dict.get(METRIC_MSG, 0)
+        feedback = f"{period_info}收到信息:{msg_total}, 日均:{msg_total / day_num:.1f}"
+        if msg_daily:
+            peak_day = max(msg_daily.keys(), key=lambda d: msg_daily[d])
+            feedback += f", 最多的一天:{day_ordinal_to_str(peak_day)}({msg_daily[peak_day]})"
+        feedback += f"\n掷骰次数:{total_dict.get(METRIC_ROLL, 0)}\n"
+        cmd_info_list = []
+        for flag, name in DPP_COMMAND_FLAG_DICT.items():
+            if flag & DPP_COMMAND_FLAG_SET_HIDE_IN_STAT:
+                continue
+            cmd_num = sum([val for metric, val in total_dict.items()
+                           if metric.startswith(METRIC_CMD_PREFIX) and int(metric[len(METRIC_CMD_PREFIX):]) & flag])
+            if cmd_num:
+                cmd_info_list.append(f"{name}:{cmd_num}")
+        feedback += f"指令记录: {', '.join(cmd_info_list) if cmd_info_list else '暂无记录'}"
+        return feedback
+
     def get_help(self, keyword: str, meta: MessageMetaData) -> str:
         if keyword == "统计":  # help后的接着的内容
             feedback: str = "可以统计用户和群聊的各种信息\n" \
                             ".统计 显示当前用户的统计信息\n" \
                             ".统计群聊 显示当前群聊的统计信息\n" \
+                            ".统计[天数] 显示当前用户最近一段时间的统计信息, 如.统计7 .统计30\n" \
+                            ".统计群聊[天数] 显示当前群聊最近一段时间的统计信息\n" \
+                            ".统计d20 [天数] / .统计群聊d20 [天数] 显示最近一段时间的D20分布, 默认为30天\n" \
                             "[Master专用]\n" \
                             ".统计所有用户 可以显示当前所有用户对指令的使用情况\n" \
-                            ".统计所有群聊 可以显示每一个群聊对指令的使用情况"
+                            ".统计所有群聊 可以显示每一个群聊对指令的使用情况\n" \
+                            ".统计活跃群聊 [天数] 显示最近一段时间掷骰次数最多的群聊, 默认为30天"
             return feedback
         return ""
 
@@ -13,7 +13,7 @@ from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand, BotSendForwardMsgCommand
 from core.communication import MessageMetaData, MessagePort, PrivateMessagePort, GroupMessagePort, preprocess_msg
 from core.localization import LOC_FUNC_DISABLE
-from core.config import DATA_PATH, CFG_MASTER, CFG_ADMIN
+from core.config import DATA_PATH
 from module.common import DC_GROUPCONFIG
 from module.query import create_empty_sqlite_database, load_data_from_xlsx_to_sqlite
 from utils.localdata import read_xlsx, update_xlsx, col_based_workbook_to_dict, create_parent_dir, get_empty_col_based_workbook
@@ -83,10 +83,9 @@ class HomebrewCommand(UserCommandBase):
         should_pass: bool = False
         mode: Optional[Literal["load","template","help","show","clean","on","off"]] = None
         arg_str: Optional[str] = None
-        admin: bool = (meta.user_id in self.bot.cfg_helper.get_config(CFG_MASTER)) or (meta.user_id in self.bot.cfg_helper.get_config(CFG_ADMIN))
 
-        # 常规查询指令
-        if admin:
+        # 常规查询指令, 仅骰主或骰管理可用; 先判断是否为指令, 普通消息不需要读取权限
+        if msg_str.startswith(".") and meta.permission >= 3:
             for key in ["私设", "房规", "homebrew", "hb"]:
                 if not should_proc and msg_str.startswith(f".{key}"):
                     arg_str = msg_str[1 + len(key):].strip()
@@ -132,7 +131,7 @@ class HomebrewCommand(UserCommandBase):
 
         # 判断功能开关
         try:
-            assert (int(self.bot.cfg_helper.get_config(CFG_QUERY_ENABLE)[0]) != 0)
+            assert self.bot.cfg_helper.get_value(CFG_QUERY_ENABLE)
         except AssertionError:
             feedback = self.bot.loc_helper.format_loc_text(LOC_FUNC_DISABLE, func=self.readable_name)
             return [BotSendMsgCommand(self.bot.account, feedback, [port])]
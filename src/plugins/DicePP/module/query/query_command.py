@@ -13,13 +13,14 @@ from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand, BotSendForwardMsgCommand
 from core.communication import MessageMetaData, MessagePort, PrivateMessagePort, GroupMessagePort, preprocess_msg
 from core.localization import LOC_FUNC_DISABLE
-from core.config import DATA_PATH, CFG_MASTER, CFG_ADMIN
+from core.config import DATA_PATH, CFG_MASTER, CFG_ADMIN, CONFIG_TYPE_BOOL
 from core.data import DC_USER_DATA
 from module.common import DC_GROUPCONFIG
 from module.query import create_empty_sqlite_database, load_data_from_xlsx_to_sqlite, QUERY_DATA_FIELD, QUERY_DATA_FIELD_LIST, QUERY_REDIRECT_FIELD, QUERY_REDIRECT_FIELD_LIST
 from utils.localdata import read_xlsx, update_xlsx, col_based_workbook_to_dict, create_parent_dir, get_empty_col_based_workbook
 from utils.time import get_current_date_raw
 from utils.data import yield_deduplicate
+from utils.metrics import METRICS, METRIC_QUERY_SQL
 
 from module.query.query_database import CONNECTED_QUERY_DATABASES, DATABASE_CURSOR, create_query_database, connect_query_database, disconnect_query_database, regexp_normalize
 
@@ -344,7 +345,7 @@ class QueryCommand(UserCommandBase):
         reg_loc(LOC_QUERY_CELL_REDIRECT, "\n重定向自：{redirect}",
                 "重定向展示格式，redirect: 重定向自*")
 
-        bot.cfg_helper.register_config(CFG_QUERY_ENABLE, "1", "查询指令开关")
+        bot.cfg_helper.register_config(CFG_QUERY_ENABLE, "1", "查询指令开关", CONFIG_TYPE_BOOL)
         bot.cfg_helper.register_config(CFG_QUERY_DATA_PATH, "./QueryData", "查询指令的数据来源，已弃用，请勿修改")
         bot.cfg_helper.register_config(CFG_QUERY_PRIVATE_DATABASE, "DND5E2014", "查询指令私聊时默认使用的数据库，群聊使用数据库以群配置为准")
         #已弃用，请使用mode_command那边的CFG。
@@ -442,7 +443,7 @@ class QueryCommand(UserCommandBase):
             if not should_proc and msg_str.startswith(f".{key}"):
                 should_proc, mode, arg_str = True, "database", msg_str[1 + len(key):].strip()
         
-        if meta.permission >= 3:# 需要3级权限（群管理/骰主）才能编辑资料库
+        if mode in ("redirect", "query", "search", "database") and meta.permission >= 3:# 需要3级权限（群管理/骰主）才能编辑资料库
             if mode == "redirect":
                 if arg_str.startswith("删除"):
                     arg_str = arg_str[2:].strip()
@@ -537,7 +538,7 @@ class QueryCommand(UserCommandBase):
 
         # 判断功能开关
         try:
-            assert (int(self.bot.cfg_helper.get_config(CFG_QUERY_ENABLE)[0]) != 0)
+            assert self.bot.cfg_helper.get_value(CFG_QUERY_ENABLE)
         except AssertionError:
             feedback = self.bot.loc_helper.format_loc_text(LOC_FUNC_DISABLE, func=self.readable_name)
             return [BotSendMsgCommand(self.bot.account, feedback, [port])]
@@ -934,10 +935,12 @@ class QueryCommand(UserCommandBase):
         else:
             return poss_result
         # 找到搜索候选
-        poss_result = self.search_item(database, query_command_list, search_mode)
+        with METRICS.timer(METRIC_QUERY_SQL, database=database):
+            poss_result = self.search_item(database, query_command_list, search_mode)
         # 找到私设候选（如果开的话）
         if homebrew_database != "":
-            homebrew_result = self.search_item(homebrew_database, query_command_list, search_mode)
+            with METRICS.timer(METRIC_QUERY_SQL, database=homebrew_database):
+                homebrew_result = self.search_item(homebrew_database, query_command_list, search_mode)
             for homebrew in homebrew_result[::-1]:
                 if len(poss_result) > 0:
                     for poss in poss_result[::-1]:
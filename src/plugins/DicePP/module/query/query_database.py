@@ -38,7 +38,7 @@ QUERY_DATA_FIELD_LIST = ["名称","英文","来源","分类","标签","内容"]
 QUERY_REDIRECT_FIELD = "名称,重定向"
 QUERY_REDIRECT_FIELD_LIST = ["名称","重定向"]
 
-# 已连接的数据库DICT
+# 已连接的数据库DICT, 启动时在线程池中连接, 之后在事件循环中使用, 所以不检查线程
 CONNECTED_QUERY_DATABASES: Dict[str, sqlite3.Connection] = {}
 DATABASE_CURSOR: Dict[str, sqlite3.Cursor] = {}
 
@@ -63,7 +63,7 @@ def create_query_database(path: str) -> str:
     create_parent_dir(path)  # 若父文件夹不存在需先创建父文件夹
     db = os.path.basename(path)[:-3]
     if create_empty_sqlite_database(path):
-        CONNECTED_QUERY_DATABASES[db] = sqlite3.connect(path)
+        CONNECTED_QUERY_DATABASES[db] = sqlite3.connect(path, check_same_thread=False)
         return f"已创建{path}"
     else:
         return f"创建{path}时遇到错误: 权限不足"
@@ -76,7 +76,7 @@ def connect_query_database(path: str) -> str:
             db = os.path.basename(path)[:-3]
             if db not in CONNECTED_QUERY_DATABASES.keys():
                 try:
-                    CONNECTED_QUERY_DATABASES[db] = sqlite3.connect(path)
+                    CONNECTED_QUERY_DATABASES[db] = sqlite3.connect(path, check_same_thread=False)
                     DATABASE_CURSOR[db] = CONNECTED_QUERY_DATABASES[db].cursor()
                     CONNECTED_QUERY_DATABASES[db].row_factory = sqlite3.Row
                     CONNECTED_QUERY_DATABASES[db].create_function('regexp', 2, regexp)
@@ -2,12 +2,12 @@ from typing import List, Tuple, Any
 import asyncio
 import math
 
-from core.bot import Bot
-from core.data import DC_USER_DATA, DC_GROUP_DATA, DCK_USER_STAT, DCK_GROUP_STAT, DataManagerError
-from core.statistics import UserStatInfo, GroupStatInfo
+from core.bot import Bot, get_message_context
+from core.data import DC_USER_DATA, DC_GROUP_DATA, DataManagerError
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand
+from core.config import CONFIG_TYPE_BOOL, CONFIG_TYPE_INT
 from core.communication import MessageMetaData, PrivateMessagePort, GroupMessagePort
 from core.localization import LOC_FUNC_DISABLE
 from module.common import try_use_point, DC_GROUPCONFIG
@@ -96,9 +96,9 @@ class RollDiceCommand(UserCommandBase):
         bot.loc_helper.register_loc_text(LOC_ROLL_EXP_START, "开始计算掷骰期望 ...", "计算掷骰表达式期望时的回复")
         bot.loc_helper.register_loc_text(LOC_ROLL_EXP, " {expression} 的期望为:\n{expectation}", "计算掷骰表达式期望时的回复")
 
-        bot.cfg_helper.register_config(CFG_ROLL_ENABLE, "1", "掷骰指令开关")
-        bot.cfg_helper.register_config(CFG_ROLL_HIDE_ENABLE, "1", "暗骰指令开关(暗骰会发送私聊信息, 可能增加风控风险)")
-        bot.cfg_helper.register_config(CFG_ROLL_EXP_COST, "10", "计算掷骰表达式期望(.rexp)所花费的点数")
+        bot.cfg_helper.register_config(CFG_ROLL_ENABLE, "1", "掷骰指令开关", CONFIG_TYPE_BOOL)
+        bot.cfg_helper.register_config(CFG_ROLL_HIDE_ENABLE, "1", "暗骰指令开关(暗骰会发送私聊信息, 可能增加风控风险)", CONFIG_TYPE_BOOL)
+        bot.cfg_helper.register_config(CFG_ROLL_EXP_COST, "10", "计算掷骰表达式期望(.rexp)所花费的点数", CONFIG_TYPE_INT)
 
     def can_process_msg(self, msg_str: str, meta: MessageMetaData) -> Tuple[bool, bool, Any]:
         should_proc: bool = msg_str.startswith(".r")
@@ -108,7 +108,7 @@ class RollDiceCommand(UserCommandBase):
     def process_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> List[BotCommandBase]:
         # 判断功能开关
         try:
-            assert (int(self.bot.cfg_helper.get_config(CFG_ROLL_ENABLE)[0]) != 0)
+            assert self.bot.cfg_helper.get_value(CFG_ROLL_ENABLE)
         except AssertionError:
             feedback = self.bot.loc_helper.format_loc_text(LOC_FUNC_DISABLE, func=self.readable_name)
             port = GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)
@@ -219,7 +219,7 @@ class RollDiceCommand(UserCommandBase):
         msg_str = msg_str.strip()
         # 判断暗骰开关
         try:
-            assert (not is_hidden or int(self.bot.cfg_helper.get_config(CFG_ROLL_HIDE_ENABLE)[0]) != 0)
+            assert (not is_hidden or self.bot.cfg_helper.get_value(CFG_ROLL_HIDE_ENABLE))
         except AssertionError:
             feedback = self.bot.loc_helper.format_loc_text(LOC_FUNC_DISABLE, func="暗骰指令")
             port = GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)
@@ -241,11 +241,12 @@ class RollDiceCommand(UserCommandBase):
         # 解析表达式并生成结果
         try:
             exp_str = preprocess_roll_exp(exp_str)
+            context = get_message_context(self.bot, meta)
             if meta.group_id:
-                stored_default = self.bot.data_manager.get_data(DC_GROUPCONFIG, [meta.group_id, "default_dice"], default_val="D20")
+                stored_default = context.get_data(DC_GROUPCONFIG, [meta.group_id, "default_dice"], default_val="D20")
             else:
                 # 私聊时尝试从用户配置读取默认骰面（支持私聊切换模式产生的设置）
-                stored_default = self.bot.data_manager.get_data(DC_USER_DATA, [meta.user_id, "default_dice"], default_val="D20")
+                stored_default = context.get_data(DC_USER_DATA, [meta.user_id, "default_dice"], default_val="D20")
             default_expr = format_default_expr_from_storage(stored_default)
             exp_str = apply_default_expr(exp_str, default_expr)
             default_type_hint = extract_default_type_hint(default_expr)
@@ -279,7 +280,7 @@ class RollDiceCommand(UserCommandBase):
 
         if compute_exp:  # 计算期望走单独的流程
             # 尝试扣除点数
-            cost_point = int(self.bot.cfg_helper.get_config(CFG_ROLL_EXP_COST)[0])
+            cost_point: int = self.bot.cfg_helper.get_value(CFG_ROLL_EXP_COST)
             res = try_use_point(self.bot, meta.user_id, cost_point)
             # 点数不足
             if res:
@@ -520,21 +521,5 @@ def get_roll_state_loc_text(bot: Bot, res_list: List[RollResult]):
 
 def record_roll_data(bot: Bot, meta: MessageMetaData, res_list: List[RollResult]):
     """统计掷骰数据"""
-    roll_times = len(res_list)
-    # 更新用户数据，缺失时使用 default_gen 初始化（避免 DataManagerError）
-    try:
-        user_stat: UserStatInfo = bot.data_manager.get_data(DC_USER_DATA, [meta.user_id, DCK_USER_STAT], get_ref=True)
-    except DataManagerError:
-        # 如果未初始化，创建一个新的 UserStatInfo 存入
-        user_stat: UserStatInfo = bot.data_manager.get_data(DC_USER_DATA, [meta.user_id, DCK_USER_STAT], default_gen=UserStatInfo, get_ref=True)
-    user_stat.roll.times.inc(roll_times)
-    for res in (res for res in res_list if res.d20_num == 1):
-        user_stat.roll.d20.record(int(res.val_list[0]))
-    # 更新群数据
-    if not meta.group_id:
-        return
-    group_stat: GroupStatInfo = bot.data_manager.get_data(DC_GROUP_DATA, [meta.group_id, DCK_GROUP_STAT], default_gen=GroupStatInfo, get_ref=True)
-    group_stat.roll.times.inc(roll_times)
-    for res in (res for res in res_list if res.d20_num == 1):
-        group_stat.roll.d20.record(int(res.val_list[0]))
-    return
+    d20_list = [int(res.val_list[0]) for res in res_list if res.d20_num == 1]
+    bot.stat_aggregator.record_roll(meta.user_id, meta.group_id, len(res_list), d20_list)
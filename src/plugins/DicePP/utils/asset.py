@@ -0,0 +1,82 @@
+"""
+图片资源缓存, 本地化语句, 牌库与随机生成器中引用的本地图片只在第一次使用或文件被修改后读取并编码
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+from utils.cq_code import get_cq_image
+
+ASSET_CACHE_SIZE = 64 * 1024 * 1024  # 缓存的图片CQ码总长度上限, 单位为字符
+
+AssetEntry = Tuple[int, int, str]  # (修改时间, 文件大小, 图片CQ码)
+
+
+class AssetCache:
+    """
+    以路径为键缓存图片CQ码, 每次取得时检查文件的修改时间与大小, 文件变化后重新读取
+    超出长度上限时淘汰最久未使用的图片; 可能被指令线程池中的线程同时访问, 用锁保护
+    """
+    def __init__(self, max_size: int = ASSET_CACHE_SIZE):
+        self.max_size = max_size
+        self.use_file_url: bool = False  # 为True时发送file://路径, 由OneBot客户端自己读取文件
+        self.entries: "OrderedDict[str, AssetEntry]" = OrderedDict()
+        self.total_size: int = 0
+        self.lock = threading.Lock()
+        # 统计信息
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+
+    def set_use_file_url(self, use_file_url: bool) -> None:
+        with self.lock:
+            if use_file_url != self.use_file_url:
+                self.use_file_url = use_file_url
+                self.entries.clear()
+                self.total_size = 0
+
+    def get_cq_image(self, path: Union[str, Path]) -> Optional[str]:
+        """返回图片的CQ码, 文件不存在或无法读取时返回None"""
+        key = os.fspath(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.entries.move_to_end(key)
+                self.hit_count += 1
+                return entry[2]
+            use_file_url = self.use_file_url
+        # 读取与编码不需要持有锁, 同时读取同一个文件只会多做一次无用功
+        try:
+            cq_image = get_cq_image(Path(key)) if use_file_url else get_cq_image(Path(key).read_bytes())
+        except OSError:
+            return None
+        with self.lock:
+            self.miss_count += 1
+            old_entry = self.entries.pop(key, None)
+            if old_entry:
+                self.total_size -= len(old_entry[2])
+            if len(cq_image) <= self.max_size:
+                self.entries[key] = (stat.st_mtime_ns, stat.st_size, cq_image)
+                self.total_size += len(cq_image)
+                while self.total_size > self.max_size:
+                    _, (_, _, evicted) = self.entries.popitem(last=False)
+                    self.total_size -= len(evicted)
+        return cq_image
+
+    def get_status_info(self) -> str:
+        return f"图片缓存: {len(self.entries)}张, {self.total_size / 1024 / 1024:.1f}MB, " \
+               f"命中{self.hit_count}次, 读取{self.miss_count}次"
+
+
+ASSET_CACHE = AssetCache()
+
+
+def get_cached_cq_image(path: Union[str, Path]) -> Optional[str]:
+    """返回图片的CQ码, 文件不存在或无法读取时返回None"""
+    return ASSET_CACHE.get_cq_image(path)
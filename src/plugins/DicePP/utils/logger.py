@@ -1,17 +1,170 @@
+"""
+基于logging的日志, 所有日志都记录在名为dicepp的logger及其子logger下
+未调用start_log_writer时直接输出到控制台; 调用后由后台线程负责格式化并写入控制台与滚动的日志文件, 记录日志的线程只需要把记录放入队列
+热路径上应使用get_logger得到的logger并以%格式传入参数(如logger.debug("%s", command)), 未启用对应级别时不会格式化参数
+"""
+
 import sys
 import traceback
 import re
-from typing import List
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Callable, Dict, Iterable, List, Optional
+
+LOGGER_NAME = "dicepp"
+CONSOLE_FORMAT = "logger:  %(message)s"
+FILE_FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件的大小上限
+LOG_FILE_BACKUP_COUNT = 5  # 最多保留多少个旧的日志文件
+
+_root_logger = logging.getLogger(LOGGER_NAME)
+_root_logger.setLevel(logging.INFO)
+_root_logger.propagate = False  # 不交给NoneBot等第三方库配置的根logger处理
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """与print一样输出到当前的sys.stdout, 以便sys.stdout被替换(如测试中捕获输出)后依然有效"""
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+_console_handler = _StdoutHandler(sys.stdout)
+_console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+_root_logger.addHandler(_console_handler)
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_module_levels: Dict[str, int] = {}  # 通过set_log_levels单独设置过级别的子logger
+
+
+class LazyStr:
+    """
+    在被格式化时才调用func生成字符串, 用于构造代价较高的日志参数, 如logger.debug("%s", LazyStr(lambda: ...))
+    """
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], str]):
+        self.func = func
+
+    def __str__(self) -> str:
+        return self.func()
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler默认会在记录日志的线程中格式化消息, 这里保留原始的记录, 留到后台线程中再格式化
+    记录都在同一进程中传递, 不需要保证可以序列化; 参数对象在格式化前被修改的话日志中会是修改后的值
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def get_logger(name: str = "") -> logging.Logger:
+    """
+    返回dicepp下的子logger, 可以通过set_log_levels单独设置级别
+    Args:
+        name: 子logger名称, 一般为模块路径, 如"adapter", "core.data", 为空时返回dicepp本身
+    """
+    return _root_logger.getChild(name) if name else _root_logger
 
 
-def dice_log(*args, **kwargs):
+def dice_log(*args, level: int = logging.INFO, logger_name: str = "", **kwargs):
     """
-    记录Log信息
+    记录Log信息, 参数会像print一样以空格连接
+    Args:
+        level: 日志级别, 默认为INFO
+        logger_name: 子logger名称, 见get_logger
     """
+    logger = get_logger(logger_name)
+    if not logger.isEnabledFor(level):
+        return
     if kwargs:
-        print("logger: ", *args, kwargs)
-    else:
-        print("logger: ", *args)
+        args = args + (kwargs,)
+    logger.log(level, " ".join(str(arg) for arg in args))
+
+
+def parse_log_level(text: str) -> int:
+    """将DEBUG/INFO/WARNING/ERROR/CRITICAL或数字转为日志级别, 无法识别时抛出ValueError"""
+    text = text.strip().upper()
+    if text.isdigit():
+        return int(text)
+    level = logging.getLevelName(text)
+    if not isinstance(level, int):
+        raise ValueError(f"未知的日志级别: {text}")
+    return level
+
+
+def set_log_levels(settings: Iterable[str]) -> List[str]:
+    """
+    设置日志级别, 每项为"级别"(设置dicepp本身)或"子logger名称=级别", 一项中也可以用;分隔多个设置
+    没有出现在settings中的子logger会恢复为继承dicepp的级别. 返回无法解析的设置项
+    Args:
+        settings: 如["INFO", "adapter=WARNING;core.data=DEBUG"]
+    """
+    global _module_levels
+    root_level = logging.INFO
+    module_levels: Dict[str, int] = {}
+    invalid_items: List[str] = []
+    for setting in settings:
+        for item in setting.split(";"):
+            item = item.strip()
+            if not item:
+                continue
+            try:
+                if "=" in item:
+                    name, level_text = item.split("=", 1)
+                    module_levels[name.strip()] = parse_log_level(level_text)
+                else:
+                    root_level = parse_log_level(item)
+            except ValueError:
+                invalid_items.append(item)
+    _root_logger.setLevel(root_level)
+    for name in _module_levels.keys() - module_levels.keys():
+        get_logger(name).setLevel(logging.NOTSET)
+    for name, level in module_levels.items():
+        get_logger(name).setLevel(level)
+    _module_levels = module_levels
+    return invalid_items
+
+
+def start_log_writer(file_path: str) -> None:
+    """
+    启动后台的日志线程, 之后的日志由该线程写入控制台与file_path处的滚动日志文件. 重复调用时不会有任何效果
+    Args:
+        file_path: 日志文件路径, 超过LOG_FILE_MAX_BYTES后会滚动为file_path.1, file_path.2...
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(file_path, maxBytes=LOG_FILE_MAX_BYTES,
+                                                        backupCount=LOG_FILE_BACKUP_COUNT, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, _console_handler, file_handler)
+    _root_logger.removeHandler(_console_handler)
+    _root_logger.addHandler(_LazyQueueHandler(log_queue))
+    _log_listener.start()
+    atexit.register(stop_log_writer)
+
+
+def stop_log_writer() -> None:
+    """写完队列中剩余的日志后停止后台线程, 之后的日志重新直接输出到控制台"""
+    global _log_listener
+    if _log_listener is None:
+        return
+    listener, _log_listener = _log_listener, None
+    for handler in list(_root_logger.handlers):
+        if isinstance(handler, _LazyQueueHandler):
+            _root_logger.removeHandler(handler)
+    _root_logger.addHandler(_console_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        if handler is not _console_handler:
+            handler.close()
 
 
 def get_exception_info() -> List[str]:
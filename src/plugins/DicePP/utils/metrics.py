@@ -0,0 +1,169 @@
+"""
+运行指标, 记录计数与耗时分布, 以Prometheus的文本格式输出
+默认不启用, 未启用时记录函数直接返回; 在热路径上调用方应先判断METRICS.enabled再计时, 避免多余的perf_counter调用
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Iterator
+
+# 耗时分布的区间上限, 单位为秒
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelKey = Tuple[Tuple[str, str], ...]  # 排序后的(标签名, 标签值)
+
+# 指标名称
+METRIC_MESSAGE_TOTAL = "dicepp_message_total"
+METRIC_MESSAGE_PHASE = "dicepp_message_phase_seconds"
+METRIC_COMMAND_MATCH = "dicepp_command_match_seconds"
+METRIC_COMMAND_PROCESS = "dicepp_command_process_seconds"
+METRIC_DATA_GET_TOTAL = "dicepp_data_get_total"
+METRIC_DATA_SET_TOTAL = "dicepp_data_set_total"
+METRIC_DATA_SAVE = "dicepp_data_save_seconds"
+METRIC_DATA_SAVE_BYTES = "dicepp_data_save_bytes_total"
+METRIC_LOG_DB_WRITE = "dicepp_log_db_write_seconds"
+METRIC_LOG_DB_RECORDS = "dicepp_log_db_records_total"
+METRIC_QUERY_SQL = "dicepp_query_sql_seconds"
+
+METRIC_HELP: Dict[str, str] = {
+    METRIC_MESSAGE_TOTAL: "Messages handled by Bot.process_message",
+    METRIC_MESSAGE_PHASE: "Time spent in each phase of Bot.process_message",
+    METRIC_COMMAND_MATCH: "Time spent in can_process_msg per command",
+    METRIC_COMMAND_PROCESS: "Time spent in process_msg per command",
+    METRIC_DATA_GET_TOTAL: "DataManager.get_data calls per data chunk",
+    METRIC_DATA_SET_TOTAL: "DataManager.set_data calls per data chunk",
+    METRIC_DATA_SAVE: "Time spent saving modified data chunks",
+    METRIC_DATA_SAVE_BYTES: "Bytes written when saving data chunks",
+    METRIC_LOG_DB_WRITE: "Time spent writing a batch of log records",
+    METRIC_LOG_DB_RECORDS: "Log records written to the log database",
+    METRIC_QUERY_SQL: "Time spent executing query database SQL",
+}
+
+
+class Histogram:
+    __slots__ = ("bucket_counts", "count", "total")
+
+    def __init__(self):
+        self.bucket_counts: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)  # 最后一项为超过所有区间的数量
+        self.count: int = 0
+        self.total: float = 0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+
+def make_label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(val)) for key, val in labels.items()))
+
+
+def format_labels(label_key: LabelKey, extra: str = "") -> str:
+    items = [f'{key}="{escape_label_value(val)}"' for key, val in label_key]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    计数器与耗时分布的集合, 可能被指令线程池中的线程同时记录, 用锁保护
+    """
+    def __init__(self):
+        self.enabled: bool = False
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """增加计数器的值"""
+        if not self.enabled:
+            return
+        label_key = make_label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[label_key] = series.get(label_key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """记录一次耗时, 单位为秒"""
+        if not self.enabled:
+            return
+        label_key = make_label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(label_key)
+            if histogram is None:
+                histogram = series[label_key] = Histogram()
+            histogram.observe(value)
+
+    def observe_since(self, name: str, begin_time: float, **labels: str) -> float:
+        """记录从begin_time(perf_counter)到现在的耗时, 返回现在的时间, 方便依次记录多个阶段"""
+        now = time.perf_counter()
+        self.observe(name, now - begin_time, **labels)
+        return now
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """记录with语句块的耗时"""
+        if not self.enabled:
+            yield
+            return
+        begin_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_since(name, begin_time, **labels)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def render(self) -> str:
+        """以Prometheus的文本格式输出所有指标"""
+        lines: List[str] = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for label_key, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(label_key)} {value:.15g}")
+            for name, series in sorted(self.histograms.items()):
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for label_key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.bucket_counts):
+                        cumulative += bucket_count
+                        bucket_labels = format_labels(label_key, f'le="{bound:g}"')
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    bucket_labels = format_labels(label_key, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{bucket_labels} {histogram.count}")
+                    lines.append(f"{name}_sum{format_labels(label_key)} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{format_labels(label_key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def render_summary(self, limit: int = 20) -> List[str]:
+        """返回便于在聊天中查看的摘要: 所有计数器与总耗时最多的limit项耗时分布"""
+        lines: List[str] = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                for label_key, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(label_key)} {value:.15g}")
+            timings = [(histogram.total, histogram.count, name, label_key)
+                       for name, series in self.histograms.items() for label_key, histogram in series.items()]
+        timings.sort(reverse=True)
+        for total, count, name, label_key in timings[:limit]:
+            lines.append(f"{name}{format_labels(label_key)} 次数{count} 合计{total * 1000:.1f}ms 平均{total / count * 1000:.2f}ms")
+        return lines
+
+
+METRICS = MetricsRegistry()
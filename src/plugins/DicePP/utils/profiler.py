@@ -0,0 +1,120 @@
+"""
+采样分析器, 在后台线程中定期读取所有线程的调用栈, 只统计core与module中的函数
+结果为collapsed stack格式(每行为"线程;函数;函数... 次数"), 可以直接用flamegraph.pl或speedscope打开
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_INTERVAL = 0.01  # 采样间隔, 单位为秒
+PROFILE_MAX_DEPTH = 128  # 每个调用栈最多记录多少层
+PROFILE_DIRS = ("core", "module")  # 只统计这些文件夹中的函数
+
+
+class SamplingProfiler:
+    """
+    用线程定期读取sys._current_frames(), 信号只能在主线程中处理且无法看到指令线程池中的线程, 所以不使用信号
+    采样线程只在读取调用栈时持有GIL, 开销与线程数和调用栈深度成正比
+    """
+    def __init__(self, root_path: str, interval: float = PROFILE_INTERVAL):
+        """
+        Args:
+            root_path: 代码根目录, 即core与module所在的文件夹
+            interval: 采样间隔, 单位为秒
+        """
+        self.root_path = os.path.abspath(root_path)
+        self.root_dirs: Tuple[str, ...] = tuple(os.path.join(self.root_path, name) + os.sep for name in PROFILE_DIRS)
+        self.interval = interval
+        self.stacks: Counter = Counter()  # collapsed stack -> 采样次数
+        self.sample_count: int = 0
+        self.begin_time: float = 0
+        self.end_time: float = 0
+        self.code_labels: Dict[CodeType, Optional[str]] = {}  # 函数 -> 显示的名字, 不在统计范围内的为None
+        self.thread_names: Dict[int, str] = {}
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.begin_time = time.monotonic()
+        self.thread = threading.Thread(target=self.__run, name="DiceProfiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.end_time = time.monotonic()
+
+    def __run(self) -> None:
+        self_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            self.sample(self_ident)
+
+    def sample(self, ignore_ident: int = 0) -> None:
+        """读取一次所有线程的调用栈"""
+        for ident, frame in sys._current_frames().items():
+            if ident == ignore_ident:
+                continue
+            labels: List[str] = []
+            depth = 0
+            while frame is not None and depth < PROFILE_MAX_DEPTH:
+                label = self.__get_code_label(frame.f_code)
+                if label:
+                    labels.append(label)
+                frame = frame.f_back
+                depth += 1
+            if not labels:  # 没有经过core与module的调用栈(空闲的线程等)不统计
+                continue
+            labels.append(self.__get_thread_name(ident))
+            self.stacks[";".join(reversed(labels))] += 1
+        self.sample_count += 1
+
+    def __get_code_label(self, code: CodeType) -> Optional[str]:
+        try:
+            return self.code_labels[code]
+        except KeyError:
+            pass
+        label = None
+        if code.co_filename.startswith(self.root_dirs):
+            rel_path = os.path.relpath(code.co_filename, self.root_path).replace(os.sep, "/")
+            label = f"{rel_path}:{code.co_name}"
+        self.code_labels[code] = label
+        return label
+
+    def __get_thread_name(self, ident: int) -> str:
+        if ident not in self.thread_names:
+            self.thread_names = {thread.ident: thread.name for thread in threading.enumerate() if thread.ident}
+        return self.thread_names.get(ident, f"Thread-{ident}")
+
+    def dump(self) -> str:
+        """返回collapsed stack格式的结果"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, path: str) -> str:
+        """将结果保存到文件, 返回文件的绝对路径"""
+        path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.dump())
+        return path
+
+    def get_top_functions(self, num: int) -> List[Tuple[str, int]]:
+        """返回采样时最常位于调用栈顶端的函数及其次数"""
+        leaf_counter: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaf_counter[stack.rsplit(";", 1)[-1]] += count
+        return leaf_counter.most_common(num)
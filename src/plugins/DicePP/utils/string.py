@@ -1,26 +1,18 @@
 from typing import List, Iterable
 
 
+# 全角空格变普通空格, 中文句号变英文句号, 剩下的全角火星文全部位移回半角
+ENGLISH_STR_TABLE = {12288: 32, 12290: 46, **{code: code - 65248 for code in range(65281, 65375)}}
+
+
 def to_english_str(input_str: str) -> str:
     """
     将字符串中的中文符号与全角字符转为英文
+    。，＋－＝＃：；（）ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｙｗｘｙｚ等
     """
     if type(input_str) != str:
         raise ValueError(f'ChineseToEnglishSymbol: Input {input_str} must be str type')
-    output_str = ""
-    for character in input_str:
-        code: int = ord(character)
-        if code == 12288: # 全角空格 变 普通空格
-            code = 32
-        elif code == 12290: # 中文句号 变 英文句号
-            code = 46
-        elif code >= 65281 and code <= 65374: # 剩下的全角火星文全部位移回半角
-            code -= 65248
-        output_str += chr(code)
-    """
-    。，＋－＝＃：；（）ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｙｗｘｙｚ等
-    """
-    return output_str
+    return input_str.translate(ENGLISH_STR_TABLE)
 
 
 def match_substring(substring: str, str_list: Iterable[str]) -> List[str]:
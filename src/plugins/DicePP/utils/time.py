@@ -96,3 +96,26 @@ def datetime_to_str_month(input_datetime: datetime) -> str:
     将datetime转换为字符串, 字符串格式由DATE_STR_FORMAT_MONTH定义, 默认是%Y_%m
     """
     return input_datetime.strftime(DATE_STR_FORMAT_MONTH)
+
+
+def get_current_day_ordinal() -> int:
+    """
+    返回当前北京时间的日期序号(date.toordinal), 方便按天比较和做区间运算
+    """
+    return get_current_date_raw().date().toordinal()
+
+
+def day_ordinal_to_str(day: int) -> str:
+    """
+    将日期序号转换为字符串, 格式为%Y/%m/%d
+    """
+    return datetime.date.fromordinal(day).strftime("%Y/%m/%d")
+
+
+def int_to_day_ordinal(timestamp: int) -> int:
+    """
+    将int时间戳转换为北京时间的日期序号, 为0代表从未记录, 返回0
+    """
+    if timestamp <= 0:
+        return 0
+    return int_to_datetime(timestamp).date().toordinal()
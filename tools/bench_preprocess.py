@@ -0,0 +1,102 @@
+"""Throughput benchmark for core.communication.preprocess_msg.
+
+Replays a chat corpus (one message per line, UTF-8) through the legacy
+normalisation pipeline and the current one, checks that both produce the same
+output for every message and prints messages/sec for each.
+
+Usage:
+    python tools/bench_preprocess.py [--corpus chat.txt] [--repeat 20]
+
+Without --corpus a small built-in sample of typical commands and chat lines is
+used, which is enough to compare the two pipelines but not representative of a
+real group's traffic.
+"""
+import argparse
+import html
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src" / "plugins" / "DicePP"))
+
+from zhconv import convert  # noqa: E402
+from core.communication import process  # noqa: E402
+
+SAMPLE_CORPUS = [
+    ".r", ".rd20", ".r 1d20+5", ".rh", ".r3#d20+4 攻击", ".rd20优势+2", ".ra 侦查", ".rc 聆听 50",
+    ".init", ".ri+3", ".ri 哥布林", ".st 力量18 敏捷14 体质12", ".coc", ".dnd5", ".help", ".help r",
+    ".bot on", ".nn 测试角色", ".查询 火球术", ".draw 塔罗牌", ".jrrp", ".send 你好",
+    "今天我们来跑团吧，先投个骰子看看先攻。", "这个角色的力量是十八，敏捷是十四",
+    "我們今天繼續團嗎？", "ＨＩ", "ｈｅｌｌｏ　ｗｏｒｌｄ", "好的", "哈哈哈哈", "[CQ:face,id=178]",
+    "&#91;CQ:image&#93;", "主持人什么时候开团", "回覆一下", "DM: 你们进入了一个黑暗的地下城, 四周很安静",
+]
+
+
+def legacy_to_english_str(input_str: str) -> str:
+    output_str = ""
+    for character in input_str:
+        code: int = ord(character)
+        if code == 12288:
+            code = 32
+        elif code == 12290:
+            code = 46
+        elif 65281 <= code <= 65374:
+            code -= 65248
+        output_str += chr(code)
+    return output_str
+
+
+def legacy_preprocess_msg(msg_str: str) -> str:
+    msg_str = legacy_to_english_str(msg_str)
+    msg_str = msg_str.lower().strip()
+    msg_str = html.unescape(msg_str)
+    msg_str = convert(msg_str, 'zh-cn')
+    return msg_str
+
+
+def run(func, corpus, repeat: int) -> float:
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        for msg in corpus:
+            func(msg)
+    return len(corpus) * repeat / (time.perf_counter() - begin)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="chat corpus, one message per line")
+    parser.add_argument("--repeat", type=int, default=20, help="how many times to replay the corpus")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            corpus = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        corpus = SAMPLE_CORPUS
+    print(f"corpus: {args.corpus or 'built-in sample'}, {len(corpus)} messages x {args.repeat}")
+
+    legacy_preprocess_msg(corpus[0])  # load zhconv dictionary before timing
+    process.preprocess_msg_raw(corpus[0])
+
+    mismatch = [msg for msg in corpus if legacy_preprocess_msg(msg) != process.preprocess_msg_raw(msg)]
+    for msg in mismatch[:10]:
+        print(f"MISMATCH: {msg!r} -> {legacy_preprocess_msg(msg)!r} / {process.preprocess_msg_raw(msg)!r}")
+
+    skipped = sum(1 for msg in corpus if not process.need_zh_convert(msg))
+    print(f"zhconv skipped for {skipped}/{len(corpus)} messages")
+
+    legacy_rate = run(legacy_preprocess_msg, corpus, args.repeat)
+    raw_rate = run(process.preprocess_msg_raw, corpus, args.repeat)
+    process.preprocess_msg_cached.cache_clear()
+    cached_rate = run(process.preprocess_msg, corpus, args.repeat)
+    print(f"legacy:         {legacy_rate:12.0f} msgs/sec")
+    print(f"current (raw):  {raw_rate:12.0f} msgs/sec  x{raw_rate / legacy_rate:.1f}")
+    print(f"current (memo): {cached_rate:12.0f} msgs/sec  x{cached_rate / legacy_rate:.1f}")
+    print(f"memo cache: {process.preprocess_msg_cached.cache_info()}")
+    return 1 if mismatch else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
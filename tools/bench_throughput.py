@@ -0,0 +1,399 @@
+"""End-to-end throughput benchmark for Bot.process_message.
+
+Builds a Bot the same way core/command/unit_test.py does, with a client proxy
+that routes every message through the real InboundDispatcher and every reply
+through the real OutboundDispatcher (rate limits off, nothing is actually
+sent), then replays a weighted synthetic workload of group and private
+messages from thousands of simulated users and groups:
+
+    roll        .r / .rd20+5 / .rh ...
+    multi_roll  .r5#d20+3
+    check       .ra 侦查 / .rd20+3 力量检定
+    query       .q 火球术 against a generated fixture database
+    draw        .draw 塔罗牌 against a generated fixture deck
+    chat        plain chat lines, recorded by the session log in logging groups
+    macro       a macro defined during setup for a subset of users
+    variable    .set / .r 1d20+%var% for the same subset
+    misc        .jrrp / .nn / .help
+
+Every tenth group runs with a session log open (.log new), and messages sent
+back to groups are mirrored into the log the way the NoneBot adapter does. The
+log database, the query database and the deck live in a temporary directory.
+
+Reported: messages/sec, p50/p99 latency overall and per kind, memory allocated
+per message (tracemalloc, measured in a separate pass so it does not distort
+the timings) and process RSS. Results are compared against a stored baseline;
+a metric that is worse than the baseline by more than --tolerance is reported
+as a regression and the exit code is 1. Per-kind latencies are printed but not
+compared: each kind only has a few hundred samples and their p50 moves by more
+than any useful tolerance between runs. The baseline depends on the machine, so
+regenerate it with --save-baseline before comparing on a new one.
+
+Usage:
+    python tools/bench_throughput.py [--messages 5000] [--users 5000] [--groups 500]
+    python tools/bench_throughput.py --save-baseline
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src" / "plugins" / "DicePP"))
+
+from adapter import ClientProxy  # noqa: E402
+from adapter.inbound import InboundDispatcher, INBOUND_WORKER_LIMIT  # noqa: E402
+from adapter.outbound import OutboundDispatcher  # noqa: E402
+from core.bot import Bot  # noqa: E402
+from core.command import BotSendMsgCommand  # noqa: E402
+from core.communication import MessageMetaData, MessageSender, GroupInfo, GroupMemberInfo  # noqa: E402
+from core.config import ConfigItem  # noqa: E402
+from utils.logger import set_log_levels  # noqa: E402
+from module.common import log_db  # noqa: E402
+from module.common.log_command import append_log_record, flush_log_records  # noqa: E402
+from module.query import create_empty_sqlite_database, QUERY_DATA_FIELD_LIST  # noqa: E402
+from module.query.query_command import CFG_QUERY_DATA_PATH, CFG_QUERY_PRIVATE_DATABASE  # noqa: E402
+from module.deck.deck_command import CFG_DECK_DATA_PATH, DECK_ITEM_FIELD  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "bench_throughput_baseline.json"
+
+ROLLS = [".r", ".rd20", ".r 1d20+5 攻击", ".rh", ".rd20优势+2", ".r 2d6+3 伤害", ".rd100"]
+CHECKS = [".ra 侦查", ".ra 聆听", ".rd20+3 力量检定", ".rd20-1 敏捷豁免", ".ra 图书馆使用"]
+QUERIES = [".q 火球术", ".查询 长剑", ".q 法师", ".q 护甲等级"]
+DRAWS = [".draw 塔罗牌", ".draw 2#塔罗牌"]
+CHATS = [
+    "今天我们来跑团吧，先投个骰子看看先攻。", "好的", "哈哈哈哈", "我們今天繼續團嗎？", "[CQ:face,id=178]",
+    "DM: 你们进入了一个黑暗的地下城, 四周很安静", "主持人什么时候开团", "这个角色的力量是十八，敏捷是十四",
+]
+MISC = [".jrrp", ".nn 测试角色", ".help r"]
+
+MACRO_NAME = "长剑攻击"
+MACRO_USER_RATIO = 10  # 每多少个用户中有一个定义了宏与变量
+LOG_GROUP_RATIO = 10  # 每多少个群中有一个开着日志
+PRIVATE_RATIO = 0.1  # 私聊消息的比例
+LATENCY_SLACK_MS = 0.05  # 比较延迟时忽略小于这个值的差异, 避免计时精度带来的误报
+INBOUND_WINDOW = INBOUND_WORKER_LIMIT * 4  # 接收队列中最多积压多少条, 避免超过上限后被丢弃
+DRAIN_TIMEOUT = 60  # 每一轮结束时最多等待多少秒让发送队列清空
+
+FIXTURE_DATABASE = "DND5E2024"  # 测试用查询数据库的名字, 与默认模式使用的数据库相同
+FIXTURE_QUERY_ITEMS = ["火球术", "长剑", "法师", "护甲等级"]
+FIXTURE_QUERY_FILLER = 500  # 额外生成的条目数量, 让模糊查询有一定的工作量
+FIXTURE_DECK = "塔罗牌"
+FIXTURE_DECK_ITEMS = 22
+
+Generator = Callable[[random.Random], str]
+
+# (类型, 权重, 生成消息的函数)
+WORKLOAD: List[Tuple[str, int, Generator]] = [
+    ("roll", 30, lambda rng: rng.choice(ROLLS)),
+    ("multi_roll", 8, lambda rng: f".r{rng.randint(2, 8)}#d20+{rng.randint(0, 6)}"),
+    ("check", 10, lambda rng: rng.choice(CHECKS)),
+    ("query", 5, lambda rng: rng.choice(QUERIES)),
+    ("draw", 4, lambda rng: rng.choice(DRAWS)),
+    ("chat", 25, lambda rng: rng.choice(CHATS)),
+    ("macro", 6, lambda rng: MACRO_NAME),
+    ("variable", 6, lambda rng: rng.choice([".r 1d20+%生命%", ".set 生命-1", ".set 生命+1"])),
+    ("misc", 6, lambda rng: rng.choice(MISC)),
+]
+NEED_SETUP_KINDS = {"macro", "variable"}
+
+Message = Tuple[str, str, str, str]  # (类型, 消息, 用户, 群号), 群号为空代表私聊
+
+
+class BenchProxy(ClientProxy):
+    """与NoneBotClientProxy一样经过接收队列与发送队列, 发送时只把发到群里的消息记录到日志中"""
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.inbound = InboundDispatcher()
+        self.outbound = OutboundDispatcher(self.process_bot_command)
+
+    async def process_bot_command(self, command):
+        if isinstance(command, BotSendMsgCommand):
+            for target in command.targets:
+                if target.group_id:
+                    append_log_record(self.bot, target.group_id, self.bot.account, None, command.msg)
+
+    async def process_bot_command_list(self, command_list):
+        self.outbound.submit(command_list)
+
+    def set_send_rate_limit(self, global_rate, global_burst, group_rate, group_burst):
+        pass  # 不限流, 测的是处理能力而不是配置的发送频率
+
+    async def drain(self, timeout):
+        return await self.outbound.drain(timeout)
+
+    async def get_group_list(self): return []
+    async def get_group_info(self, group_id): return GroupInfo(group_id)
+    async def get_group_member_list(self, group_id): return []
+    async def get_group_member_info(self, group_id, user_id): return GroupMemberInfo(group_id, user_id)
+
+
+def generate_messages(rng: random.Random, count: int, users: int, groups: int) -> List[Message]:
+    kinds = [kind for kind, _, _ in WORKLOAD]
+    weights = [weight for _, weight, _ in WORKLOAD]
+    generators = {kind: generator for kind, _, generator in WORKLOAD}
+    messages: List[Message] = []
+    for kind in rng.choices(kinds, weights, k=count):
+        if kind in NEED_SETUP_KINDS:
+            user_index = rng.randrange(0, users, MACRO_USER_RATIO)
+        else:
+            user_index = rng.randrange(users)
+        group_id = "" if rng.random() < PRIVATE_RATIO else f"bench_group{rng.randrange(groups)}"
+        messages.append((kind, generators[kind](rng), f"bench_user{user_index}", group_id))
+    return messages
+
+
+def generate_setup(users: int, groups: int) -> List[Message]:
+    messages: List[Message] = []
+    for group_index in range(0, groups, LOG_GROUP_RATIO):
+        messages.append(("setup", ".log new bench", "bench_user0", f"bench_group{group_index}"))
+    for user_index in range(0, users, MACRO_USER_RATIO):
+        user_id = f"bench_user{user_index}"
+        messages.append(("setup", f".define {MACRO_NAME} .rd20+4 攻击检定", user_id, ""))
+        messages.append(("setup", ".set 生命=20", user_id, ""))
+    return messages
+
+
+def create_fixture(fixture_dir: str) -> Tuple[str, str]:
+    """生成查询数据库与牌库, 返回(查询数据目录, 牌库目录)"""
+    import sqlite3
+    import openpyxl
+    query_dir = os.path.join(fixture_dir, "QueryData")
+    deck_dir = os.path.join(fixture_dir, "DeckData")
+    os.makedirs(query_dir)
+    os.makedirs(deck_dir)
+
+    db_path = os.path.join(query_dir, f"{FIXTURE_DATABASE}.db")
+    create_empty_sqlite_database(db_path)
+    rows = [(name, f"bench {name}", "BENCH", "法术" if index % 2 else "物品", "测试", f"{name}的说明。" * 20)
+            for index, name in enumerate(FIXTURE_QUERY_ITEMS)]
+    rows += [(f"测试条目{index}", f"bench item {index}", "BENCH", "杂项", "测试", "填充用的条目。" * 10)
+             for index in range(FIXTURE_QUERY_FILLER)]
+    conn = sqlite3.connect(db_path)
+    conn.executemany(f"INSERT INTO data ({','.join(QUERY_DATA_FIELD_LIST)}) VALUES (?, ?, ?, ?, ?, ?);", rows)
+    conn.commit()
+    conn.close()
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = FIXTURE_DECK
+    sheet.append(DECK_ITEM_FIELD)
+    for index in range(FIXTURE_DECK_ITEMS):
+        sheet.append([f"第{index}号牌", 1, 1, 0])
+    workbook.save(os.path.join(deck_dir, "bench.xlsx"))
+    workbook.close()
+    return query_dir, deck_dir
+
+
+async def replay(proxy: BenchProxy, bot: Bot, messages: List[Message],
+                 latency: Optional[Dict[str, List[float]]] = None) -> None:
+    """按来源放入接收队列, 等待全部处理完成且发送队列清空; latency记录每条消息的处理耗时"""
+    async def handle(kind: str, msg: str, meta: MessageMetaData) -> None:
+        begin_time = time.perf_counter()
+        await bot.process_message(msg, meta)
+        if latency is not None:
+            latency.setdefault(kind, []).append(time.perf_counter() - begin_time)
+
+    for kind, msg, user_id, group_id in messages:
+        while proxy.inbound.total_depth >= INBOUND_WINDOW:
+            await asyncio.sleep(0)
+        meta = MessageMetaData(msg, msg, MessageSender(user_id, "测试"), group_id, False)
+        port = f"group:{group_id}" if group_id else f"private:{user_id}"
+        proxy.inbound.submit(port, functools.partial(handle, kind, msg, meta))
+    while proxy.inbound.workers:
+        await asyncio.sleep(0)
+    await proxy.outbound.drain(DRAIN_TIMEOUT)
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * ratio), len(values) - 1)]
+
+
+def get_rss_kb() -> Tuple[Optional[int], Optional[int]]:
+    """返回当前与峰值RSS(KB), 不支持的平台返回None"""
+    current, peak = None, None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak //= 1024
+    except ImportError:
+        pass
+    if current is not None and peak is not None:
+        peak = max(peak, current)  # 两者的统计方式不同, 峰值可能略小于刚读到的当前值
+    return current, peak
+
+
+def run_benchmark(args, fixture_dir: str) -> Dict:
+    rng = random.Random(args.seed)
+    random.seed(args.seed)  # 掷骰结果也固定下来, 让每次运行的工作量一致
+    setup = generate_setup(args.users, args.groups)
+    warmup = generate_messages(rng, args.warmup, args.users, args.groups)
+    timed = generate_messages(rng, args.messages, args.users, args.groups)
+    alloc = generate_messages(rng, args.alloc_messages, args.users, args.groups)
+
+    query_dir, deck_dir = create_fixture(fixture_dir)
+    bot = Bot("bench_bot")
+    proxy = BenchProxy(bot)
+    bot.set_client_proxy(proxy)
+    bot.cfg_helper.all_configs[CFG_QUERY_DATA_PATH] = ConfigItem(CFG_QUERY_DATA_PATH, query_dir)
+    bot.cfg_helper.all_configs[CFG_QUERY_PRIVATE_DATABASE] = ConfigItem(CFG_QUERY_PRIVATE_DATABASE, FIXTURE_DATABASE)
+    bot.cfg_helper.all_configs[CFG_DECK_DATA_PATH] = ConfigItem(CFG_DECK_DATA_PATH, deck_dir)
+    bot.delay_init_debug()
+    set_log_levels(["WARNING"])  # 每条消息都输出日志的话测出来的主要是控制台的速度
+    loop = asyncio.get_event_loop()
+    latency: Dict[str, List[float]] = {}
+    try:
+        loop.run_until_complete(replay(proxy, bot, setup))
+        loop.run_until_complete(replay(proxy, bot, warmup))
+        flush_log_records()
+
+        begin_time = time.perf_counter()
+        loop.run_until_complete(replay(proxy, bot, timed, latency))
+        flush_log_records()
+        elapsed = time.perf_counter() - begin_time
+
+        tracemalloc.start()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):  # 3.9+; 更早的版本刚开始追踪时峰值本来就是从0算起
+            tracemalloc.reset_peak()
+        loop.run_until_complete(replay(proxy, bot, alloc))
+        flush_log_records()
+        end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_kb, rss_peak_kb = get_rss_kb()
+    finally:
+        bot.shutdown_debug()
+        shutil.rmtree(bot.data_path, ignore_errors=True)
+
+    all_latency = [value for values in latency.values() for value in values]
+    return {
+        "python": platform.python_version(),
+        "messages": args.messages,
+        "users": args.users,
+        "groups": args.groups,
+        "seed": args.seed,
+        "msgs_per_sec": round(args.messages / elapsed, 1),
+        "p50_ms": round(percentile(all_latency, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(all_latency, 0.99) * 1000, 3),
+        "kinds": {
+            kind: {
+                "count": len(values),
+                "mean_ms": round(statistics.fmean(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            }
+            for kind, values in sorted(latency.items())
+        },
+        "alloc_peak_kb": round((peak_bytes - start_bytes) / 1024, 1),
+        "alloc_retained_bytes_per_msg": round((end_bytes - start_bytes) / max(args.alloc_messages, 1), 1),
+        "rss_kb": rss_kb,
+        "rss_peak_kb": rss_peak_kb,
+    }
+
+
+def print_result(result: Dict) -> None:
+    print(f"messages: {result['messages']}, users: {result['users']}, groups: {result['groups']}, "
+          f"seed: {result['seed']}, python {result['python']}")
+    print(f"throughput: {result['msgs_per_sec']:.1f} msgs/sec, p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms")
+    print(f"{'kind':<12}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for kind, info in result["kinds"].items():
+        print(f"{kind:<12}{info['count']:>8}{info['mean_ms']:>10.3f}{info['p50_ms']:>10.3f}{info['p99_ms']:>10.3f}")
+    print(f"tracemalloc: peak {result['alloc_peak_kb']:.1f} KB, retained {result['alloc_retained_bytes_per_msg']:.1f} B/msg")
+    print(f"rss: {result['rss_kb']} KB, peak {result['rss_peak_kb']} KB")
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """返回比基准差超过tolerance的指标"""
+    regressions: List[str] = []
+
+    def check(name: str, current: Optional[float], base: Optional[float], higher_is_better: bool = False,
+              slack: float = 0) -> None:
+        if current is None or base is None:
+            return
+        if higher_is_better:
+            worse = current < base * (1 - tolerance)
+        else:
+            worse = current > base * (1 + tolerance) + slack
+        if worse:
+            regressions.append(f"{name}: {base} -> {current}")
+
+    check("msgs_per_sec", result["msgs_per_sec"], baseline.get("msgs_per_sec"), higher_is_better=True)
+    check("p50_ms", result["p50_ms"], baseline.get("p50_ms"), slack=LATENCY_SLACK_MS)
+    check("p99_ms", result["p99_ms"], baseline.get("p99_ms"), slack=LATENCY_SLACK_MS)
+    # 每类消息只有几百条, 两次运行之间的p50波动超过任何有意义的余量, 只打印不比较
+    check("alloc_peak_kb", result["alloc_peak_kb"], baseline.get("alloc_peak_kb"))
+    # 每条消息保留的内存在几十字节内波动, 给一个固定的余量
+    check("alloc_retained_bytes_per_msg", result["alloc_retained_bytes_per_msg"],
+          baseline.get("alloc_retained_bytes_per_msg"), slack=256)
+    check("rss_peak_kb", result["rss_peak_kb"], baseline.get("rss_peak_kb"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000, help="messages in the timed pass")
+    parser.add_argument("--warmup", type=int, default=500, help="messages replayed before timing")
+    parser.add_argument("--alloc-messages", type=int, default=1000, help="messages in the tracemalloc pass")
+    parser.add_argument("--users", type=int, default=5000, help="simulated users")
+    parser.add_argument("--groups", type=int, default=500, help="simulated groups")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the workload and dice")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline json to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--output", help="also write this run's result to a json file")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix="dicepp_bench_")
+    log_db.LOG_DIR = os.path.join(temp_dir, "log")  # 不写入真正的日志数据库
+    log_db.LOG_DB_PATH = os.path.join(log_db.LOG_DIR, "log.db")
+    try:
+        result = run_benchmark(args, os.path.join(temp_dir, "fixture"))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    print_result(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"baseline saved: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if (baseline.get("messages"), baseline.get("users"), baseline.get("groups"), baseline.get("seed")) != \
+            (result["messages"], result["users"], result["groups"], result["seed"]):
+        print("WARNING: baseline was recorded with a different workload, comparison may be meaningless")
+    regressions = compare(result, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"no regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
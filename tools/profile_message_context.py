@@ -0,0 +1,99 @@
+"""Count DataManager and config lookups made while processing one message.
+
+Builds a Bot with a throw-away data directory, replays a small workload of
+group and private messages through Bot.process_message and wraps
+DataManager.get_data/set_data/delete_data/get_keys and
+ConfigManager.get_config to count calls per message. The caller of each
+lookup is recorded so the report shows which commands do the reading.
+
+Usage:
+    python tools/profile_message_context.py [--repeat 20] [--top 15]
+"""
+import argparse
+import asyncio
+import collections
+import shutil
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src" / "plugins" / "DicePP"))
+
+from adapter import ClientProxy  # noqa: E402
+from core.bot import Bot  # noqa: E402
+from core.communication import MessageMetaData, MessageSender, GroupInfo, GroupMemberInfo  # noqa: E402
+from core.config import ConfigManager  # noqa: E402
+from core.data import DataManager  # noqa: E402
+
+WORKLOAD = [
+    ".r", ".rd20", ".r 1d20+5 攻击", ".rh", ".ra 侦查", ".jrrp", ".nn 测试角色", ".help",
+    "今天我们来跑团吧", "好的", "哈哈哈哈", "你好", ".draw 塔罗牌", ".init", ".bot",
+    ".rd20 \\\\ .rd20 \\\\ .rd20", ".r 攻击 \\\\ .r 伤害",
+]
+PROFILED_METHODS = [
+    (DataManager, "get_data"), (DataManager, "set_data"), (DataManager, "delete_data"),
+    (DataManager, "get_keys"), (ConfigManager, "get_config"),
+]
+
+
+class ProfileProxy(ClientProxy):
+    async def process_bot_command(self, command): pass
+    async def process_bot_command_list(self, command_list): pass
+    async def get_group_list(self): return []
+    async def get_group_info(self, group_id): return GroupInfo(group_id)
+    async def get_group_member_list(self, group_id): return []
+    async def get_group_member_info(self, group_id, user_id): return GroupMemberInfo(group_id, user_id)
+
+
+def install_counters(counter: collections.Counter, callers: collections.Counter):
+    for cls, name in PROFILED_METHODS:
+        func = getattr(cls, name)
+
+        def wrapper(*args, __func=func, __name=f"{cls.__name__}.{name}", **kwargs):
+            counter[__name] += 1
+            frame = sys._getframe(1)
+            callers[f"{__name} <- {Path(frame.f_code.co_filename).stem}.{frame.f_code.co_name}"] += 1
+            return __func(*args, **kwargs)
+        setattr(cls, name, wrapper)
+
+
+async def replay(bot: Bot, repeat: int):
+    for _ in range(repeat):
+        for index, msg in enumerate(WORKLOAD):
+            group_id = "" if index % 5 == 4 else f"group{index % 3}"
+            meta = MessageMetaData(msg, msg, MessageSender(f"user{index % 4}", "测试"), group_id, False)
+            await bot.process_message(msg, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="how many times to replay the workload")
+    parser.add_argument("--top", type=int, default=15, help="how many call sites to list")
+    args = parser.parse_args()
+
+    bot = Bot("profile_bot")
+    bot.set_client_proxy(ProfileProxy())
+    bot.delay_init_debug()
+    try:
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(replay(bot, 1))  # 先跑一轮, 让默认数据都创建好
+        counter, callers = collections.Counter(), collections.Counter()
+        install_counters(counter, callers)
+        loop.run_until_complete(replay(bot, args.repeat))
+        loop.close()
+    finally:
+        bot.shutdown_debug()
+        shutil.rmtree(bot.data_path, ignore_errors=True)
+
+    msg_count = args.repeat * len(WORKLOAD)
+    print(f"messages: {msg_count}")
+    for name, count in sorted(counter.items()):
+        print(f"{name:<24} {count / msg_count:6.2f} per message")
+    print(f"{'total':<24} {sum(counter.values()) / msg_count:6.2f} per message")
+    print("\ntop call sites (per message):")
+    for name, count in callers.most_common(args.top):
+        print(f"  {count / msg_count:6.2f}  {name}")
+
+
+if __name__ == "__main__":
+    main()